@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+import pymysql
+
+from database import Audit, Pool, Service
+
+# 로컬 HTTP 로 투표 기능을 제공하는 헤드리스 서버
+#   POST /login                 {"username", "password"}  -> 계정 정보와 "token"
+#   GET  /polls                 ?after=<poll_id>&limit=<n>&status=active|upcoming|closed
+#   GET  /polls/active
+#   GET  /polls/closed          ?since=<YYYY-MM-DD[ HH:MM:SS]>
+#   POST /polls                 {"start_date", "end_date", "question", "items", "ranked", "seats"}
+#   GET  /polls/<id>/items
+#   GET  /polls/<id>/changes        ?since=<version> 이후 득표 수가 바뀐 항목만
+#   POST /polls/<id>/vote       {"item_id"}
+#   POST /polls/<id>/ballot     {"ranking": [item_id, ...]}     순위 투표
+# POST /polls, vote, ballot 은 로그인 때 받은 토큰을 "Authorization: Bearer <token>" 으로 보내야 하고,
+# 투표하거나 만드는 계정은 토큰의 계정이다.
+#   GET  /polls/<id>/runoff         순위 투표의 라운드별 결과
+#   GET  /polls/<id>/tally          ?source=log 이면 투표 기록으로 다시 계산
+
+MAX_BODY = 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class VoteServer:
+    def __init__(self, service, workers):
+        self.service = service
+        # DB 작업은 커넥션 풀 크기만큼의 스레드에서만 실행한다.
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='VoteServer')
+        # (메서드, 경로, 처리 함수, 로그인 필요 여부) - 로그인이 필요한 처리 함수는 계정을 두 번째 인자로 받는다.
+        self.routes = [
+            ('POST', re.compile(r'^/login$'), self.login, False),
+            ('GET', re.compile(r'^/polls$'), self.list_polls, False),
+            ('POST', re.compile(r'^/polls$'), self.create_poll, True),
+            ('GET', re.compile(r'^/polls/active$'), self.active_polls, False),
+            ('GET', re.compile(r'^/polls/closed$'), self.closed_polls, False),
+            ('GET', re.compile(r'^/polls/(\d+)/items$'), self.get_items, False),
+            ('GET', re.compile(r'^/polls/(\d+)/changes$'), self.item_changes, False),
+            ('POST', re.compile(r'^/polls/(\d+)/vote$'), self.vote, True),
+            ('POST', re.compile(r'^/polls/(\d+)/ballot$'), self.ballot, True),
+            ('GET', re.compile(r'^/polls/(\d+)/runoff$'), self.runoff, False),
+            ('GET', re.compile(r'^/polls/(\d+)/tally$'), self.tally, False),
+        ]
+
+    async def run_db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def login(self, body):
+        try:
+            account = await self.run_db(self.service.login, body.get('username'), body.get('password'))
+        except Service.LoginFailed as e:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, str(e))
+        return dict(account, token=self.service.sessions.issue(account))
+
+    def authenticate(self, headers):
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        account = self.service.sessions.lookup(token.strip()) if scheme.lower() == 'bearer' else None
+        if account is None:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, 'a valid "Authorization: Bearer <token>" from /login is required')
+        return account
+
+    async def list_polls(self, body):
+        if not body:
+            return await self.run_db(self.service.list_polls)
+        limit = min(int(body.get('limit', 100)), 1000)
+        return await self.run_db(self.service.poll_page, int(body.get('after', 0)), limit, body.get('status'))
+
+    async def active_polls(self, body):
+        return await self.run_db(self.service.active_polls)
+
+    async def closed_polls(self, body):
+        if 'since' not in body:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'since' is required")
+        return await self.run_db(self.service.closed_polls, datetime.fromisoformat(body['since']))
+
+    async def create_poll(self, body, account):
+        poll_id = await self.run_db(
+            self.service.create_poll, account['account_id'], body.get('start_date'),
+            body.get('end_date'), body.get('question'), body.get('items') or (),
+            bool(body.get('ranked')), int(body.get('seats', 1)))
+        return {'poll_id': poll_id}
+
+    async def get_items(self, body, poll_id):
+        return await self.run_db(self.service.get_items, int(poll_id))
+
+    async def item_changes(self, body, poll_id):
+        since = int(body['since']) if body.get('since') is not None else None
+        return await self.run_db(self.service.item_changes, int(poll_id), since)
+
+    async def vote(self, body, account, poll_id):
+        if body.get('item_id') is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'item_id' is required")
+        # 투표는 VoteQueue 의 배치 스레드가 처리하므로 executor 스레드를 점유하지 않는다.
+        future = self.service.submit_vote(int(poll_id), int(body['item_id']), account['account_id'])
+        result = await asyncio.wrap_future(future)
+        return {'accepted': result.accepted, 'reason': result.reason}
+
+    async def ballot(self, body, account, poll_id):
+        result = await self.run_db(self.service.rank_vote, int(poll_id), body.get('ranking'), account['account_id'])
+        return {'accepted': result.accepted, 'reason': result.reason}
+
+    async def runoff(self, body, poll_id):
+        return await self.run_db(self.service.runoff, int(poll_id))
+
+    async def tally(self, body, poll_id):
+        if body.get('source') == 'log':
+            return await self.run_db(self.service.rebuild_tally, int(poll_id))
+        return await self.run_db(self.service.tally, int(poll_id))
+
+    async def dispatch(self, method, path, headers, body):
+        allowed = False
+        for route_method, pattern, handler, authenticated in self.routes:
+            match = pattern.match(path)
+            if match:
+                allowed = True
+                if route_method == method:
+                    if authenticated:
+                        return await handler(body, self.authenticate(headers), *match.groups())
+                    return await handler(body, *match.groups())
+        if allowed:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {path}")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"{path} not found")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'malformed request line'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                path, _, query = target.partition('?')
+                status, payload = await self.process(method, path, query, headers, reader)
+                if status == HTTPStatus.REQUEST_ENTITY_TOO_LARGE:
+                    # 읽지 않은 본문이 남아 있으므로 연결을 끊는다.
+                    keep_alive = False
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def process(self, method, path, query, headers, reader):
+        try:
+            length = int(headers.get('content-length', '0'))
+            if length > MAX_BODY:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'request body too large')
+            # GET 요청은 쿼리 문자열을 본문 대신 사용한다.
+            body = dict(parse_qsl(query)) if method == 'GET' else {}
+            if length:
+                try:
+                    body = json.loads(await reader.readexactly(length))
+                except json.JSONDecodeError:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, 'request body is not valid JSON')
+                if not isinstance(body, dict):
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, 'request body must be a JSON object')
+            return HTTPStatus.OK, await self.dispatch(method, path, headers, body)
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except (ValueError, TypeError) as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        except pymysql.MySQLError as e:
+            print(f"Database error: {e}")
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': 'database error'}
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # 클라이언트가 끊은 경우는 handle 이 연결을 닫는다.
+            raise
+        except Exception as e:
+            # 처리 함수의 버그나 닫힌 VoteQueue 등: 연결을 그냥 끊지 않고 500 으로 응답한다.
+            print(f"Unexpected error on {method} {path}: {e!r}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'internal server error'}
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(host, port, compact_interval=None):
+    Audit.start()
+    pool = Pool.get_pool()
+    service = Service.VotingService(pool, compact_interval)
+    server = VoteServer(service, pool.max_size)
+    listener = await asyncio.start_server(server.handle, host, port, backlog=1024)
+    print(f"Voting service listening on http://{host}:{port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        service.close()
+        server.executor.shutdown()
+        Pool.close_pool()
+        Audit.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless voting service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--compact-interval', type=float, default=5.0,
+                        help='seconds between folding counter shards into ITEM.VOTE_COUNT (0 disables)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.compact_interval or None))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,211 @@
+import time
+# --profile-startup 은 이 파일을 읽기 시작한 시점부터 잰다.
+IMPORT_STARTED = time.perf_counter()
+
+import argparse
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QListWidget, QMessageBox, QVBoxLayout, QLabel, QPushButton, QLineEdit, QTextEdit, QComboBox, QMainWindow, QFormLayout, QDialog, QDesktopWidget, QDateTimeEdit
-from PyQt5.QtCore import Qt
-import pymysql
+from PyQt5.QtWidgets import QApplication, QFileDialog, QWidget, QListView, QListWidget, QListWidgetItem, QMessageBox, QVBoxLayout, QLabel, QPushButton, QLineEdit, QTextEdit, QComboBox, QMainWindow, QFormLayout, QDialog, QDesktopWidget, QDateTimeEdit, QCheckBox, QSpinBox, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, QObject, QRunnable, QThreadPool, QEvent, pyqtSignal
+from PyQt5.QtGui import QFontDatabase
 from datetime import datetime
-from database import Query
-import logging
+# 로그인 화면을 그리는 데 필요한 것만 여기서 읽는다. (Config, Audit 는 표준 라이브러리만 쓴다)
+# pymysql 과 나머지 database 모듈은 작업 스레드의 open_database 가 처음 읽고,
+# 그 뒤에 쓰는 함수들은 이미 읽힌 모듈을 다시 가져오기만 한다.
+from database import Audit, Config
 
-class ManagePollItemsWindow(QDialog):
-    def __init__(self, parent, poll_id):
+
+class TaskSignals(QObject):
+    # (result, error) - error is None when the call succeeded
+    finished = pyqtSignal(object, object)
+
+
+class Task(QRunnable):
+    """One blocking call run on a QThreadPool worker.
+
+    The outcome is sent back to the GUI thread through ``signals``. A task
+    cancelled before a worker picks it up never calls ``func``.
+    """
+
+    def __init__(self, func, args, kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.signals = TaskSignals()
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            result, error = self.func(*self.args, **self.kwargs), None
+        except Exception as e:
+            result, error = None, e
+        self.signals.finished.emit(result, error)
+
+
+class TaskRunner(QObject):
+    """Database calls started by one window, run off the GUI thread.
+
+    Callbacks run on the GUI thread. ``busy`` is emitted with True when the
+    first call starts and with False when the last one finishes, so the
+    window can show a loading state. ``cancel()`` drops the results of
+    every call still in flight; the window calls it when it closes.
+    """
+
+    busy = pyqtSignal(bool)
+
+    def __init__(self, thread_pool, parent=None):
+        super().__init__(parent)
+        self.thread_pool = thread_pool
+        self.tasks = set()
+
+    def run(self, func, *args, on_result=None, on_error=None, **kwargs):
+        task = Task(func, args, kwargs)
+        task.signals.finished.connect(
+            lambda result, error: self._finished(task, result, error, on_result, on_error))
+        if not self.tasks:
+            self.busy.emit(True)
+        self.tasks.add(task)
+        self.thread_pool.start(task)
+        return task
+
+    def _finished(self, task, result, error, on_result, on_error):
+        if task not in self.tasks:
+            # cancel() 로 취소된 호출
+            return
+        self.tasks.discard(task)
+        if not self.tasks:
+            self.busy.emit(False)
+        if error is None:
+            if on_result is not None:
+                on_result(result)
+        elif on_error is not None:
+            on_error(error)
+        else:
+            report_error(error)
+
+    def cancel(self):
+        # 이미 실행 중인 쿼리는 끝까지 돌지만 결과는 버린다.
+        for task in self.tasks:
+            task.cancelled = True
+        if self.tasks:
+            self.tasks.clear()
+            self.busy.emit(False)
+
+
+class NotPermitted(Exception):
+    pass
+
+
+def permitted(service, account_id, poll_id, message, func, *args, **kwargs):
+    # 권한 확인도 DB 를 읽을 수 있으므로 작업과 같은 스레드에서 한다.
+    if not service.can_modify_poll(account_id, poll_id):
+        raise NotPermitted(message)
+    return func(*args, **kwargs)
+
+
+def report_error(error):
+    import pymysql
+    if isinstance(error, pymysql.MySQLError):
+        print(f"Database error: {error}")
+    elif isinstance(error, NotPermitted):
+        print(error)
+    else:
+        sys.excepthook(type(error), error, error.__traceback__)
+
+
+class StartupProfile(QObject):
+    """Startup timeline printed by ``--profile-startup``.
+
+    Times are measured from the moment VotingSystem.py started importing.
+    Marks from the GUI thread and from the background database start are
+    merged into one list. The time is taken where ``mark`` is called, but
+    the list is only touched on the GUI thread: worker marks arrive through
+    the queued ``marked`` signal. The report is printed once the window has
+    painted and the database start has finished.
+    """
+
+    FINISHED = ('ready', 'database failed')
+
+    # (name, seconds, thread)
+    marked = pyqtSignal(str, float, str)
+
+    def __init__(self, started):
+        super().__init__()
+        self.started = started
+        self.marks = []  # (name, seconds, thread)
+        self.printed = False
+        self.marked.connect(self.add_mark)
+
+    def mark(self, name, thread='gui'):
+        self.marked.emit(name, time.perf_counter() - self.started, thread)
+
+    def add_mark(self, name, seconds, thread):
+        self.marks.append((name, seconds, thread))
+        names = {mark[0] for mark in self.marks}
+        if 'first paint' in names and names.intersection(self.FINISHED) and not self.printed:
+            self.printed = True
+            print(self.report())
+
+    def watch(self, app):
+        # The first paint of any widget counts as the first frame
+        app.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            QApplication.instance().removeEventFilter(self)
+            self.mark('first paint')
+        return False
+
+    def report(self):
+        lines = ['Startup profile (ms since VotingSystem.py started importing)']
+        previous = 0.0
+        for name, seconds, thread in sorted(self.marks, key=lambda mark: mark[1]):
+            lines.append(f"  {name:<20} {thread:<6} {seconds * 1000:8.1f} ms  +{(seconds - previous) * 1000:.1f}")
+            previous = seconds
+        times = {name: seconds for name, seconds, _ in self.marks}
+        lines.append(f"Time to first paint: {times['first paint'] * 1000:.0f} ms")
+        if 'ready' in times:
+            lines.append(f"Time to ready: {times['ready'] * 1000:.0f} ms")
+        return '\n'.join(lines)
+
+
+class TaskDialog(QDialog):
+    """Dialog whose database calls run on the main window's thread pool.
+
+    While a call is in flight ``loading_label`` is shown and the widgets in
+    ``busy_widgets`` are disabled. Calls still pending when the dialog
+    closes are cancelled.
+    """
+
+    def __init__(self, parent):
         super().__init__()
         self.parent = parent
+        self.busy_widgets = []
+        self.loading_label = QLabel('Loading...', self)
+        self.loading_label.hide()
+        self.tasks = TaskRunner(parent.thread_pool, self)
+        self.tasks.busy.connect(self.set_loading)
+
+    def set_loading(self, busy):
+        self.loading_label.setVisible(busy)
+        for widget in self.busy_widgets:
+            widget.setEnabled(not busy)
+
+    def run_permitted(self, poll_id, message, func, *args, on_result=None, **kwargs):
+        # func runs only if the user is an admin or created the poll; otherwise message is printed
+        return self.tasks.run(permitted, self.parent.service, self.parent.user_id, poll_id, message, func, *args,
+                              on_result=on_result, **kwargs)
+
+    def done(self, result):
+        self.tasks.cancel()
+        super().done(result)
+
+
+class ManagePollItemsWindow(TaskDialog):
+    def __init__(self, parent, poll_id):
+        super().__init__(parent)
         self.poll_id = poll_id
         self.init_ui()
 
@@ -19,7 +215,6 @@ class ManagePollItemsWindow(QDialog):
         
         # List of poll items
         self.items_list = QListWidget(self)
-        self.load_items()
         self.layout.addWidget(self.items_list)
 
         # Input for adding or editing items
@@ -36,73 +231,75 @@ class ManagePollItemsWindow(QDialog):
         self.layout.addWidget(self.add_item_button)
         self.layout.addWidget(self.edit_item_button)
         self.layout.addWidget(self.delete_item_button)
+        self.layout.addWidget(self.loading_label)
+        self.busy_widgets = [self.add_item_button, self.edit_item_button, self.delete_item_button]
 
         self.setLayout(self.layout)
+        self.load_items()
 
     def load_items(self):
-        try:
-            with self.parent.connection.cursor() as cursor:
-                cursor.execute("SELECT ITEM_ID, ITEM_TEXT FROM ITEM WHERE POLL_ID = %s", (self.poll_id,))
-                for item in cursor.fetchall():
-                    self.items_list.addItem(f"{item['ITEM_TEXT']}")
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
+        self.tasks.run(self.parent.service.get_items, self.poll_id, on_result=self.show_items)
+
+    def show_items(self, items):
+        for item in items:
+            list_item = QListWidgetItem(f"{item['ITEM_TEXT']}")
+            list_item.setData(Qt.UserRole, item['ITEM_ID'])
+            self.items_list.addItem(list_item)
     
+    def run_permitted(self, func, *args, on_result=None, **kwargs):
+        return super().run_permitted(self.poll_id, "You do not have permission to manage items for this poll.",
+                                     func, *args, on_result=on_result, **kwargs)
+
     def add_item(self):
         item_text = self.item_input.text()
         if item_text:
-            try:
-                with self.parent.connection.cursor() as cursor:
-                    # Insert new item into the ITEM table
-                    insert_query = "INSERT INTO ITEM (POLL_ID, ITEM_TEXT, VOTE_COUNT) VALUES (%s, %s, 0)"
-                    cursor.execute(insert_query, (self.poll_id, item_text))
-                    self.parent.connection.commit()
-                    print(f"Item '{item_text}' added to poll ID {self.poll_id}")
-
-                    # Update UI
-                    self.items_list.addItem(item_text)
-                    self.item_input.clear()
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
+            # Insert new item into the ITEM table
+            self.run_permitted(self.parent.service.add_items, self.poll_id, [item_text], user_id=self.parent.user_id,
+                               on_result=lambda item_ids: self.item_added(item_text, item_ids[0]))
+
+    def item_added(self, item_text, item_id):
+        print(f"Item '{item_text}' added to poll ID {self.poll_id}")
+
+        # Update UI
+        list_item = QListWidgetItem(item_text)
+        list_item.setData(Qt.UserRole, item_id)
+        self.items_list.addItem(list_item)
+        self.item_input.clear()
 
     def edit_item(self):
         selected_item = self.items_list.currentItem()
         if selected_item:
             new_text = self.item_input.text()
             if new_text:
-                try:
-                    with self.parent.connection.cursor() as cursor:
-                        # Update the selected item
-                        update_query = "UPDATE ITEM SET ITEM_TEXT = %s WHERE ITEM_ID = %s AND POLL_ID = %s"
-                        cursor.execute(update_query, (new_text, selected_item.data(Qt.UserRole), self.poll_id))
-                        self.parent.connection.commit()
-                        print(f"Item ID {selected_item.data(Qt.UserRole)} updated in poll ID {self.poll_id}")
-
-                        # Update UI
-                        selected_item.setText(new_text)
-                except pymysql.MySQLError as e:
-                    print(f"Database error: {e}")
+                # Update the selected item
+                item_id = selected_item.data(Qt.UserRole)
+                self.run_permitted(self.parent.service.rename_item, self.poll_id, item_id, new_text,
+                                   user_id=self.parent.user_id,
+                                   on_result=lambda _: self.item_renamed(selected_item, item_id, new_text))
+
+    def item_renamed(self, selected_item, item_id, new_text):
+        print(f"Item ID {item_id} updated in poll ID {self.poll_id}")
+
+        # Update UI
+        selected_item.setText(new_text)
 
     def delete_item(self):
         selected_item = self.items_list.currentItem()
         if selected_item:
-            try:
-                with self.parent.connection.cursor() as cursor:
-                    # Delete the selected item
-                    delete_query = "DELETE FROM ITEM WHERE ITEM_ID = %s AND POLL_ID = %s"
-                    cursor.execute(delete_query, (selected_item.data(Qt.UserRole), self.poll_id))
-                    self.parent.connection.commit()
-                    print(f"Item ID {selected_item.data(Qt.UserRole)} deleted from poll ID {self.poll_id}")
-
-                    # Update UI
-                    self.items_list.takeItem(self.items_list.row(selected_item))
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
-
-class CreatePollWindow(QDialog):
+            # Delete the selected item
+            item_id = selected_item.data(Qt.UserRole)
+            self.run_permitted(self.parent.service.delete_item, self.poll_id, item_id, user_id=self.parent.user_id,
+                               on_result=lambda _: self.item_deleted(selected_item, item_id))
+
+    def item_deleted(self, selected_item, item_id):
+        print(f"Item ID {item_id} deleted from poll ID {self.poll_id}")
+
+        # Update UI
+        self.items_list.takeItem(self.items_list.row(selected_item))
+
+class CreatePollWindow(TaskDialog):
     def __init__(self, parent):
-        super().__init__()
-        self.parent = parent
+        super().__init__(parent)
         self.init_ui()
 
     def init_ui(self):
@@ -117,9 +314,18 @@ class CreatePollWindow(QDialog):
         self.layout.addRow('End Date:', self.end_date_input)
         self.layout.addRow('Question:', self.question_input)
 
+        # Ranked polls are counted by instant runoff (one seat) or STV (several seats)
+        self.ranked_input = QCheckBox('Ranked choice', self)
+        self.seats_input = QSpinBox(self)
+        self.seats_input.setRange(1, 99)
+        self.layout.addRow('Voting:', self.ranked_input)
+        self.layout.addRow('Seats:', self.seats_input)
+
         self.create_poll_button = QPushButton('Create Poll', self)
         self.create_poll_button.clicked.connect(self.create_poll)
         self.layout.addWidget(self.create_poll_button)
+        self.layout.addWidget(self.loading_label)
+        self.busy_widgets = [self.create_poll_button]
 
         self.setLayout(self.layout)
 
@@ -129,34 +335,22 @@ class CreatePollWindow(QDialog):
         question = self.question_input.text()
 
         if start_date and end_date and question:
-            try:
-                with self.parent.connection.cursor() as cursor:
-                    poll_insert_query = """
-                    INSERT INTO POLL (START_DATE, END_DATE, QUESTION, ITEMCOUNT, POLLTOTAL, REGDATE, CREATED_BY) 
-                    VALUES (%s, %s, %s, 0, 0, %s, %s)
-                    """
-                    cursor.execute(poll_insert_query, (start_date, end_date, question, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), self.parent.user_id))
-                    self.parent.connection.commit()
-
-                    # Get the ID of the created poll
-                    cursor.execute("SELECT LAST_INSERT_ID()")
-                    poll_id = cursor.fetchone()['LAST_INSERT_ID()']
-
-                    # Open the AddPollItemsWindow
-                    add_items_window = AddPollItemsWindow(self.parent, poll_id)
-                    add_items_window.exec_()
-
-                    print(f"Poll created with question: '{question}'")
-
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
+            self.tasks.run(self.parent.service.create_poll, self.parent.user_id, start_date, end_date, question,
+                           ranked=self.ranked_input.isChecked(), seats=self.seats_input.value(),
+                           on_result=lambda poll_id: self.poll_created(poll_id, question))
         else:
             print("Please enter start date, end date, and question.")
+
+    def poll_created(self, poll_id, question):
+        # Open the AddPollItemsWindow
+        add_items_window = AddPollItemsWindow(self.parent, poll_id)
+        add_items_window.exec_()
+
+        print(f"Poll created with question: '{question}'")
             
-class AddPollItemsWindow(QDialog):
+class AddPollItemsWindow(TaskDialog):
     def __init__(self, parent, poll_id):
-        super().__init__()
-        self.parent = parent
+        super().__init__(parent)
         self.poll_id = poll_id
         self.init_ui()
 
@@ -172,6 +366,8 @@ class AddPollItemsWindow(QDialog):
         self.add_items_button = QPushButton('Add Items', self)
         self.add_items_button.clicked.connect(self.add_poll_items)
         self.layout.addWidget(self.add_items_button)
+        self.layout.addWidget(self.loading_label)
+        self.busy_widgets = [self.add_items_button]
 
         self.setLayout(self.layout)
 
@@ -180,77 +376,145 @@ class AddPollItemsWindow(QDialog):
         items = [item.strip() for item in items_text.split(',') if item.strip()]  # Split items by comma and remove empty strings
 
         if items:
-            try:
-                with self.parent.connection.cursor() as cursor:
-                    # For each item, determine the next ITEM_ID for the current POLL_ID
-                    for item in items:
-                        cursor.execute("SELECT MAX(ITEM_ID) as max_id FROM ITEM WHERE POLL_ID = %s", (self.poll_id,))
-                        result = cursor.fetchone()
-                        next_item_id = 1 if result['max_id'] is None else result['max_id'] + 1
-
-                        # Insert item into ITEM table with the calculated ITEM_ID
-                        item_insert_query = "INSERT INTO ITEM (ITEM_ID, POLL_ID, ITEM_TEXT, VOTE_COUNT) VALUES (%s, %s, %s, 0)"
-                        cursor.execute(item_insert_query, (next_item_id, self.poll_id, item))
-
-                    # Commit the transaction
-                    self.parent.connection.commit()
-                    print(f"Items added to poll (ID: {self.poll_id}): {items}")
-
-                    # Close the current window
-                    self.close()
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
+            self.tasks.run(self.parent.service.add_items, self.poll_id, items, user_id=self.parent.user_id,
+                           on_result=lambda _: self.items_added(items))
         else:
             print("Please enter poll items.")
 
+    def items_added(self, items):
+        print(f"Items added to poll (ID: {self.poll_id}): {items}")
+
+        # Close the current window
+        self.close()
+
+
+class PollListModel(QAbstractListModel):
+    PAGE_SIZE = 100
+
+    def __init__(self, service, tasks, status=None, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.tasks = tasks
+        self.status = status
+        self.polls = []
+        self.exhausted = False
+        self.loading = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.polls)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        poll = self.polls[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{poll['QUESTION']} ({poll['STATUS'].capitalize()})"
+        if role == Qt.UserRole:
+            return poll['POLL_ID']
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        # 화면 아래까지 스크롤하면 다음 페이지를 POLL_ID 기준으로 가져옵니다.
+        # 페이지는 백그라운드에서 읽고, 읽는 동안에는 다음 요청을 보내지 않습니다.
+        if parent.isValid() or self.exhausted or self.loading:
+            return
+        after_id = self.polls[-1]['POLL_ID'] if self.polls else 0
+        self.loading = True
+        self.tasks.run(self.service.poll_page, after_id, self.PAGE_SIZE, self.status,
+                       on_result=self.page_loaded, on_error=self.page_failed)
+
+    def page_failed(self, error):
+        report_error(error)
+        self.loading = False
+        self.exhausted = True
+
+    def page_loaded(self, page):
+        self.loading = False
+        if len(page) < self.PAGE_SIZE:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.polls), len(self.polls) + len(page) - 1)
+            self.polls.extend(page)
+            self.endInsertRows()
+
+    def set_status(self, status):
+        # 이전 필터로 읽던 페이지는 버립니다.
+        self.tasks.cancel()
+        self.loading = False
+        self.beginResetModel()
+        self.status = status
+        self.polls = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+
+class ViewPollsWindow(TaskDialog):
+    STATUS_FILTERS = [('All', None), ('Active', 'active'), ('Upcoming', 'upcoming'), ('Closed', 'closed')]
 
-class ViewPollsWindow(QDialog):
     def __init__(self, parent):
-        super().__init__()
-        self.parent = parent
+        super().__init__(parent)
         self.init_ui()
 
     def init_ui(self):
         self.setWindowTitle('View Polls and Vote')
         self.layout = QVBoxLayout()
 
-        current_datetime = datetime.now()
+        self.status_combo_box = QComboBox(self)
+        for label, status in self.STATUS_FILTERS:
+            self.status_combo_box.addItem(label, status)
+        self.status_combo_box.currentIndexChanged.connect(self.change_status)
+        self.layout.addWidget(self.status_combo_box)
+
+        # Only the first page is loaded; the view asks for more while scrolling
+        # and only paints the rows that are visible
+        # Pages are read in the background; the list keeps scrolling meanwhile
+        self.page_tasks = TaskRunner(self.parent.thread_pool, self)
+        self.page_tasks.busy.connect(self.set_loading)
+        self.poll_model = PollListModel(self.parent.service, self.page_tasks, parent=self)
+        self.poll_view = QListView(self)
+        self.poll_view.setUniformItemSizes(True)
+        self.poll_view.setModel(self.poll_model)
+        self.poll_view.clicked.connect(lambda index: self.show_vote_items(index.data(Qt.UserRole)))
+        self.layout.addWidget(self.poll_view)
+        self.layout.addWidget(self.loading_label)
+        self.poll_model.fetchMore()
 
-        try:
-            with self.parent.connection.cursor() as cursor:
-                # Retrieve all polls
-                poll_query = "SELECT * FROM POLL"
-                cursor.execute(poll_query)
-                polls = cursor.fetchall()
+        self.setLayout(self.layout)
 
-                for poll in polls:
-                    poll_id = poll['POLL_ID']
-                    question = poll['QUESTION']
-                    end_date = datetime.strptime(poll['END_DATE'], '%Y-%m-%d %H:%M:%S')
+    def change_status(self, index):
+        self.poll_model.set_status(self.status_combo_box.itemData(index))
 
-                    status = " (Active)" if current_datetime < end_date else " (Closed)"
-                    poll_button = QPushButton(question + status, self)
-                    poll_button.clicked.connect(lambda _, pid=poll_id: self.show_vote_items(pid))
-                    self.layout.addWidget(poll_button)
+    def show_vote_items(self, poll_id):
+        # 한 번에 한 투표만 연다. (읽는 중에 다시 누르면 무시)
+        if self.tasks.tasks:
+            return
+        self.tasks.run(load_vote_items, self.parent.service, poll_id,
+                       on_result=lambda loaded: open_vote_window(self.parent, poll_id, *loaded))
 
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
+    def done(self, result):
+        self.page_tasks.cancel()
+        super().done(result)
 
-        self.setLayout(self.layout)
 
-    def show_vote_items(self, poll_id):
-        try:
-            with self.parent.connection.cursor() as cursor:
-                # Retrieve items for the selected poll
-                item_query = "SELECT * FROM ITEM WHERE POLL_ID = %s"
-                cursor.execute(item_query, (poll_id,))
-                items = cursor.fetchall()
-
-                # Display the items in a new window
-                vote_item_window = VoteItemWindow(self.parent, items, poll_id)
-                vote_item_window.exec_()
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
+def load_vote_items(service, poll_id):
+    # Items for the selected poll with the version they were read at, and the poll type
+    return service.item_changes(poll_id), service.get_poll(poll_id)
+
+
+def open_vote_window(parent, poll_id, feed, poll):
+    from database import Ranked
+    if poll is not None and poll['POLL_TYPE'] == Ranked.RANKED:
+        ranked_vote_window = RankedVoteWindow(parent, feed['items'], poll_id)
+        ranked_vote_window.exec_()
+        return
+
+    # Display the items in a new window
+    vote_item_window = VoteItemWindow(parent, feed['items'], poll_id, feed['version'])
+    vote_item_window.exec_()
 '''
 class VotePollWindow(QDialog):
     def __init__(self, parent, items, poll_id):
@@ -314,92 +578,265 @@ class VotePollWindow(QDialog):
 '''
         
 
-class VoteItemWindow(QDialog):
-    def __init__(self, parent, items, poll_id):
-        super().__init__()
-        self.parent = parent
+class VoteItemWindow(TaskDialog):
+    # 열려 있는 동안 이 간격으로 바뀐 득표 수를 확인한다. (ms)
+    REFRESH_INTERVAL = 1000
+
+    def __init__(self, parent, items, poll_id, version=None):
+        super().__init__(parent)
         self.items = items
         self.poll_id = poll_id
+        self.version = version
+        self.buttons = {}
         self.init_ui()
 
+        # Other users' votes show up while the window is open. The periodic
+        # check runs in the background without the loading state
+        self.refresh_tasks = TaskRunner(self.parent.thread_pool, self)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh_items)
+        self.refresh_timer.start(self.REFRESH_INTERVAL)
+
     def init_ui(self):
         self.setWindowTitle('Vote Poll')
         self.layout = QVBoxLayout()
+        self.layout.addWidget(self.loading_label)
+        self.build_buttons()
+        self.setLayout(self.layout)
 
+    def set_loading(self, busy):
+        # 버튼은 다시 만들어질 수 있으므로 그때그때 모은다.
+        self.busy_widgets = list(self.buttons.values())
+        super().set_loading(busy)
+
+    def build_buttons(self):
+        self.texts = {}
         for item in self.items:
             item_id = item['ITEM_ID']
-            item_text = item['ITEM_TEXT']
-            vote_count = item['VOTE_COUNT']
+            self.texts[item_id] = item['ITEM_TEXT']
 
-            item_button = QPushButton(f"Item ID: {item_id}, Item Text: {item_text}, Vote Count: {vote_count}", self)
+            item_button = QPushButton(self.button_label(item_id, item['VOTE_COUNT']), self)
             item_button.clicked.connect(lambda _, iid=item_id: self.vote_for_item(iid))
+            item_button.setEnabled(not self.tasks.tasks)
             self.layout.addWidget(item_button)
+            self.buttons[item_id] = item_button
 
-        self.setLayout(self.layout)
+    def button_label(self, item_id, vote_count):
+        return f"Item ID: {item_id}, Item Text: {self.texts[item_id]}, Vote Count: {vote_count}"
 
     def vote_for_item(self, item_id):
-        # Check if the user has already voted in this poll
-        if self.has_user_voted(self.poll_id):
-            QMessageBox.information(self, "Already Voted", "You have already voted in this poll.")
+        # The vote queue checks for a previous vote, records the vote and
+        # updates the counter in the same batched transaction
+        self.tasks.run(self.parent.service.vote, self.poll_id, item_id, self.parent.user_id,
+                       on_result=lambda result: self.vote_recorded(item_id, result))
+
+    def vote_recorded(self, item_id, result):
+        from database import VoteQueue
+        if not result.accepted:
+            if result.reason == VoteQueue.ALREADY_VOTED:
+                QMessageBox.information(self, "Already Voted", "You have already voted in this poll.")
+            else:
+                print(f"Vote rejected for Item ID {item_id}: {result.reason}")
             return
 
-        try:
-            with self.parent.connection.cursor() as cursor:
-                # Update vote count for the specified item
-                update_vote_query = "UPDATE ITEM SET VOTE_COUNT = VOTE_COUNT + 1 WHERE ITEM_ID = %s"
-                cursor.execute(update_vote_query, (item_id,))
+        print(f"Vote recorded for Item ID: {item_id}")
 
-                # Record the user's vote in USER_VOTE table
-                record_user_vote_query = "INSERT INTO USER_VOTE (POLL_ID, USER_ID) VALUES (%s, %s)"
-                cursor.execute(record_user_vote_query, (self.poll_id, self.parent.user_id))
+        # Refresh the items in the current window
+        self.refresh_items()
 
-                # Commit the transaction
-                self.parent.connection.commit()
-                print(f"Vote recorded for Item ID: {item_id}")
+    def refresh_items(self):
+        # 마지막으로 본 버전 이후 득표 수가 바뀐 항목의 글자만 고칩니다.
+        # 앞의 확인이 아직 끝나지 않았으면 이번 확인은 건너뜁니다.
+        if self.refresh_tasks.tasks:
+            return
+        self.refresh_tasks.run(self.parent.service.item_changes, self.poll_id, self.version,
+                               on_result=self.apply_changes)
+
+    def apply_changes(self, changes):
+        self.version = changes['version']
+        if changes['full']:
+            self.items = changes['items']
+            if [item['ITEM_ID'] for item in self.items] != list(self.buttons) or \
+                    any(self.texts[item['ITEM_ID']] != item['ITEM_TEXT'] for item in self.items):
+                # 항목이 추가/삭제/수정된 경우에만 버튼을 다시 만듭니다.
+                self.rebuild_buttons()
+                return
+        for item in changes['items']:
+            button = self.buttons.get(item['ITEM_ID'])
+            if button is not None:
+                button.setText(self.button_label(item['ITEM_ID'], item['VOTE_COUNT']))
+
+    def rebuild_buttons(self):
+        for button in self.buttons.values():
+            button.setParent(None)
+        self.buttons = {}
+        self.build_buttons()
+
+    def done(self, result):
+        self.refresh_timer.stop()
+        self.refresh_tasks.cancel()
+        super().done(result)
+
+
+class RankedVoteWindow(TaskDialog):
+    def __init__(self, parent, items, poll_id):
+        super().__init__(parent)
+        self.items = items
+        self.poll_id = poll_id
+        self.init_ui()
 
-                # Refresh the items in the current window
-                self.refresh_items()
+    def init_ui(self):
+        self.setWindowTitle('Rank Poll Items')
+        self.layout = QVBoxLayout()
 
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
+        self.layout.addWidget(QLabel('Drag the items into your order of preference:'))
+        self.ranking_list = QListWidget(self)
+        self.ranking_list.setDragDropMode(QAbstractItemView.InternalMove)
+        for item in self.items:
+            list_item = QListWidgetItem(item['ITEM_TEXT'])
+            list_item.setData(Qt.UserRole, item['ITEM_ID'])
+            self.ranking_list.addItem(list_item)
+        self.layout.addWidget(self.ranking_list)
+
+        self.submit_button = QPushButton('Submit Ranking', self)
+        self.submit_button.clicked.connect(self.submit_ranking)
+        self.layout.addWidget(self.submit_button)
+
+        self.results_button = QPushButton('Show Runoff', self)
+        self.results_button.clicked.connect(self.show_results)
+        self.layout.addWidget(self.results_button)
+
+        self.results_text = QTextEdit(self)
+        self.results_text.setReadOnly(True)
+        self.results_text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.layout.addWidget(self.results_text)
+        self.layout.addWidget(self.loading_label)
+        self.busy_widgets = [self.submit_button, self.results_button]
 
-    def has_user_voted(self, poll_id):
-        try:
-            with self.parent.connection.cursor() as cursor:
-                vote_check_query = "SELECT COUNT(*) FROM USER_VOTE WHERE POLL_ID = %s AND USER_ID = %s"
-                cursor.execute(vote_check_query, (poll_id, self.parent.user_id))
-                result = cursor.fetchone()
-                return result['COUNT(*)'] > 0
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
-            return False
-        
-    def refresh_items(self):
-        # 현재 표시된 항목들을 제거합니다.
-        for i in reversed(range(self.layout.count())): 
-            widgetToRemove = self.layout.itemAt(i).widget()
-            # 위젯이 있으면 제거합니다.
-            if widgetToRemove is not None:
-                widgetToRemove.setParent(None)
-
-        # 최신 투표 항목 데이터를 불러옵니다.
-        try:
-            with self.parent.connection.cursor() as cursor:
-                cursor.execute("SELECT * FROM ITEM WHERE POLL_ID = %s", (self.poll_id,))
-                self.items = cursor.fetchall()
+        self.setLayout(self.layout)
 
-                for item in self.items:
-                    item_id = item['ITEM_ID']
-                    item_text = item['ITEM_TEXT']
-                    vote_count = item['VOTE_COUNT']
+    def submit_ranking(self):
+        ranking = [self.ranking_list.item(row).data(Qt.UserRole) for row in range(self.ranking_list.count())]
+        self.tasks.run(self.parent.service.rank_vote, self.poll_id, ranking, self.parent.user_id,
+                       on_result=lambda result: self.ranking_recorded(ranking, result))
+
+    def ranking_recorded(self, ranking, result):
+        from database import VoteQueue
+        if not result.accepted:
+            if result.reason == VoteQueue.ALREADY_VOTED:
+                QMessageBox.information(self, "Already Voted", "You have already voted in this poll.")
+            else:
+                print(f"Ballot rejected for poll {self.poll_id}: {result.reason}")
+            return
 
-                    # 갱신된 정보로 버튼을 다시 만듭니다.
-                    item_button = QPushButton(f"Item ID: {item_id}, Item Text: {item_text}, Vote Count: {vote_count}", self)
-                    item_button.clicked.connect(lambda _, iid=item_id: self.vote_for_item(iid))
-                    self.layout.addWidget(item_button)
+        print(f"Ranked ballot recorded for poll {self.poll_id}: {ranking}")
+        self.show_results()
+
+    def show_results(self):
+        # Round by round counts with the votes transferred from each eliminated item
+        self.tasks.run(self.parent.service.runoff, self.poll_id, on_result=self.show_runoff)
+
+    def show_runoff(self, result):
+        from database import Ranked
+        names = {item['ITEM_ID']: item['ITEM_TEXT'] for item in self.items}
+        self.results_text.setPlainText(Ranked.format_runoff(result, names))
+
+
+def analytics_report(pool):
+    # Runs on a worker thread, so the first report also pays for importing numpy there
+    from database import Analytics
+    return Analytics.format_report(Analytics.report(Analytics.load(pool)))
 
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
+
+class AnalyticsWindow(TaskDialog):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle('Poll Statistics')
+        self.resize(720, 640)
+        self.layout = QVBoxLayout()
+
+        self.report_text = QTextEdit(self)
+        self.report_text.setReadOnly(True)
+        self.report_text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.layout.addWidget(self.report_text)
+
+        self.refresh_button = QPushButton('Refresh', self)
+        self.refresh_button.clicked.connect(self.load_report)
+        self.layout.addWidget(self.refresh_button)
+        self.layout.addWidget(self.loading_label)
+        self.busy_widgets = [self.refresh_button]
+
+        self.setLayout(self.layout)
+        self.load_report()
+
+    def load_report(self):
+        # Participation, margins, share distribution and voter overlap for all polls
+        self.tasks.run(analytics_report, self.parent.pool,
+                       on_result=self.report_text.setPlainText)
+
+
+class DiagnosticsWindow(QDialog):
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle('Query Diagnostics')
+        self.resize(900, 640)
+        self.layout = QVBoxLayout()
+
+        self.report_text = QTextEdit(self)
+        self.report_text.setReadOnly(True)
+        self.report_text.setLineWrapMode(QTextEdit.NoWrap)
+        self.report_text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.layout.addWidget(self.report_text)
+
+        self.refresh_button = QPushButton('Refresh', self)
+        self.refresh_button.clicked.connect(self.load_report)
+        self.layout.addWidget(self.refresh_button)
+
+        self.reset_button = QPushButton('Reset', self)
+        self.reset_button.clicked.connect(self.reset)
+        self.layout.addWidget(self.reset_button)
+
+        self.export_button = QPushButton('Export Prometheus File', self)
+        self.export_button.clicked.connect(self.export)
+        self.layout.addWidget(self.export_button)
+
+        self.setLayout(self.layout)
+        self.load_report()
+
+    def load_report(self):
+        # Statements ordered by total time, with their call sites and the recent slow queries
+        from database import Metrics
+        metrics = self.parent.pool.metrics
+        if metrics is None:
+            self.report_text.setPlainText('Query metrics are disabled (VOTING_QUERY_METRICS=0).')
+            return
+        pool = self.parent.pool.stats()
+        self.report_text.setPlainText(
+            f"Pool: {pool['in_use']} in use, {pool['idle']} idle of {pool['max_size']}, "
+            f"{pool['waits']} waits, {pool['timeouts']} timeouts\n\n" + Metrics.format_report(metrics.snapshot()))
+
+    def reset(self):
+        if self.parent.pool.metrics is not None:
+            self.parent.pool.metrics.reset()
+        self.load_report()
+
+    def export(self):
+        if self.parent.pool.metrics is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, 'Export Prometheus File', 'voting.prom')
+        if path:
+            try:
+                self.parent.pool.metrics.write(path, self.parent.pool.stats())
+                print(f"Query metrics written to {path}")
+            except OSError as e:
+                print(f"Metrics export error: {e}")
 
 
 class LoginScreen(QWidget):
@@ -428,16 +865,32 @@ class LoginScreen(QWidget):
 
         self.setLayout(self.layout)
 
+    def show_connecting(self):
+        self.login_button.setEnabled(False)
+        self.login_result_label.setText("Connecting to database...")
+
+    def show_ready(self):
+        self.login_button.setEnabled(True)
+        self.login_result_label.setText("")
+
+    def show_connect_failed(self):
+        self.login_button.setEnabled(True)
+        self.login_result_label.setText("Database unavailable, press Login to retry")
+
+    def show_logging_in(self):
+        self.login_button.setEnabled(False)
+        self.login_result_label.setText("Logging in...")
+
     def show_login_result(self, success):
+        self.login_button.setEnabled(True)
         if success:
             self.login_result_label.setText("Login successful")
         else:
             self.login_result_label.setText("Login failed")
             
-class VotePollWindow(QDialog):
+class VotePollWindow(TaskDialog):
     def __init__(self, parent, polls):
-        super().__init__()
-        self.parent = parent
+        super().__init__(parent)
         self.polls = polls
         self.init_ui()
 
@@ -454,29 +907,20 @@ class VotePollWindow(QDialog):
             poll_button = QPushButton(question, self)
             poll_button.clicked.connect(lambda _, pid=poll['POLL_ID']: self.show_vote_items(pid))
             self.layout.addWidget(poll_button)
+            self.busy_widgets.append(poll_button)
+        self.layout.addWidget(self.loading_label)
 
         self.setLayout(self.layout)
 
     def show_vote_items(self, poll_id):
-        try:
-            with self.parent.connection.cursor() as cursor:
-                # Retrieve items for the selected poll
-                item_query = "SELECT * FROM ITEM WHERE POLL_ID = %s"
-                cursor.execute(item_query, (poll_id,))
-                items = cursor.fetchall()
-
-                # Display the items in a new window
-                vote_item_window = VoteItemWindow(self.parent, items, poll_id)
-                vote_item_window.exec_()
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
+        self.tasks.run(load_vote_items, self.parent.service, poll_id,
+                       on_result=lambda loaded: open_vote_window(self.parent, poll_id, *loaded))
             
     
 
-class DeletePollWindow(QDialog):
+class DeletePollWindow(TaskDialog):
     def __init__(self, parent):
-        super().__init__()
-        self.parent = parent
+        super().__init__(parent)
         self.init_ui()
 
     def init_ui(self):
@@ -484,54 +928,40 @@ class DeletePollWindow(QDialog):
         self.layout = QVBoxLayout()
 
         self.poll_combo_box = QComboBox(self)
-        self.load_polls()
         self.layout.addWidget(self.poll_combo_box)
 
         self.delete_button = QPushButton('Delete Poll', self)
         self.delete_button.clicked.connect(self.delete_poll)
         self.layout.addWidget(self.delete_button)
+        self.layout.addWidget(self.loading_label)
+        self.busy_widgets = [self.poll_combo_box, self.delete_button]
 
         self.setLayout(self.layout)
+        self.load_polls()
 
     def load_polls(self):
-        try:
-            with self.parent.connection.cursor() as cursor:
-                cursor.execute("SELECT POLL_ID, QUESTION FROM POLL")
-                for poll in cursor.fetchall():
-                    self.poll_combo_box.addItem(f"{poll['QUESTION']}", poll['POLL_ID'])
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
+        self.tasks.run(self.parent.service.list_polls, on_result=self.show_polls)
+
+    def show_polls(self, polls):
+        for poll in polls:
+            self.poll_combo_box.addItem(f"{poll['QUESTION']}", poll['POLL_ID'])
 
     def delete_poll(self):
         poll_id = self.poll_combo_box.currentData()
-        if self.can_modify_or_delete(poll_id):
-            try:
-                with self.parent.connection.cursor() as cursor:
-                    cursor.execute("DELETE FROM ITEM WHERE POLL_ID = %s", (poll_id,))
-                    cursor.execute("DELETE FROM POLL WHERE POLL_ID = %s", (poll_id,))
-                    self.parent.connection.commit()
-                    print(f"Poll ID {poll_id} deleted successfully")
-                    self.poll_combo_box.removeItem(self.poll_combo_box.currentIndex())
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
-        else:
-            print("You do not have permission to delete this poll.")
+        if poll_id is None:
+            return
+        self.run_permitted(poll_id, "You do not have permission to delete this poll.",
+                           self.parent.service.delete_poll, poll_id, user_id=self.parent.user_id,
+                           on_result=lambda _: self.poll_deleted(poll_id))
+
+    def poll_deleted(self, poll_id):
+        print(f"Poll ID {poll_id} deleted successfully")
+        self.poll_combo_box.removeItem(self.poll_combo_box.findData(poll_id))
 
-    def can_modify_or_delete(self, poll_id):
-        try:
-            with self.parent.connection.cursor() as cursor:
-                cursor.execute("SELECT CREATED_BY FROM POLL WHERE POLL_ID = %s", (poll_id,))
-                poll = cursor.fetchone()
-                return self.parent.user_is_admin or (poll and poll['CREATED_BY'] == self.parent.user_id)
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
-            return False
-        
 
-class ModifyPollWindow(QDialog):
+class ModifyPollWindow(TaskDialog):
     def __init__(self, parent):
-        super().__init__()
-        self.parent = parent
+        super().__init__(parent)
         self.init_ui()
 
     def init_ui(self):
@@ -541,7 +971,6 @@ class ModifyPollWindow(QDialog):
         form_layout = QFormLayout()
 
         self.poll_combo_box = QComboBox(self)
-        self.load_polls()
         form_layout.addRow('Select Poll:', self.poll_combo_box)
 
         self.start_date_input = QDateTimeEdit(self)
@@ -561,17 +990,18 @@ class ModifyPollWindow(QDialog):
         
         self.layout.addWidget(self.save_changes_button)
         self.layout.addWidget(self.manage_items_button)
+        self.layout.addWidget(self.loading_label)
+        self.busy_widgets = [self.poll_combo_box, self.save_changes_button, self.manage_items_button]
 
         self.setLayout(self.layout)
+        self.load_polls()
 
     def load_polls(self):
-        try:
-            with self.parent.connection.cursor() as cursor:
-                cursor.execute("SELECT POLL_ID, QUESTION FROM POLL")
-                for poll in cursor.fetchall():
-                    self.poll_combo_box.addItem(f"{poll['QUESTION']}", poll['POLL_ID'])
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
+        self.tasks.run(self.parent.service.list_polls, on_result=self.show_polls)
+
+    def show_polls(self, polls):
+        for poll in polls:
+            self.poll_combo_box.addItem(f"{poll['QUESTION']}", poll['POLL_ID'])
 
     def save_changes(self):
         poll_id = self.poll_combo_box.currentData()
@@ -579,35 +1009,24 @@ class ModifyPollWindow(QDialog):
         end_date = self.end_date_input.dateTime().toString("yyyy-MM-dd hh:mm:ss")
         question = self.question_input.text()
 
-        if self.can_modify_or_delete(poll_id):
-            try:
-                with self.parent.connection.cursor() as cursor:
-                    update_query = "UPDATE POLL SET START_DATE = %s, END_DATE = %s, QUESTION = %s WHERE POLL_ID = %s"
-                    cursor.execute(update_query, (start_date, end_date, question, poll_id))
-                    self.parent.connection.commit()
-                    print(f"Poll ID {poll_id} updated successfully")
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
-        else:
-            print("You do not have permission to modify this poll.")
+        if poll_id is None:
+            return
+        self.run_permitted(poll_id, "You do not have permission to modify this poll.",
+                           self.parent.service.update_poll, poll_id, start_date, end_date, question,
+                           user_id=self.parent.user_id,
+                           on_result=lambda _: print(f"Poll ID {poll_id} updated successfully"))
 
     def manage_items(self):
         poll_id = self.poll_combo_box.currentData()
-        if self.can_modify_or_delete(poll_id):
-            manage_items_window = ManagePollItemsWindow(self.parent, poll_id)
-            manage_items_window.exec_()
-        else:
-            print("You do not have permission to manage items for this poll.")
+        if poll_id is None:
+            return
+        self.run_permitted(poll_id, "You do not have permission to manage items for this poll.", lambda: None,
+                           on_result=lambda _: self.open_manage_items(poll_id))
+
+    def open_manage_items(self, poll_id):
+        manage_items_window = ManagePollItemsWindow(self.parent, poll_id)
+        manage_items_window.exec_()
 
-    def can_modify_or_delete(self, poll_id):
-        try:
-            with self.parent.connection.cursor() as cursor:
-                cursor.execute("SELECT CREATED_BY FROM POLL WHERE POLL_ID = %s", (poll_id,))
-                poll = cursor.fetchone()
-                return self.parent.user_is_admin or (poll and poll['CREATED_BY'] == self.parent.user_id)
-        except pymysql.MySQLError as e:
-            print(f"Database error: {e}")
-            return False
 
 class MainMenu(QWidget):
     def __init__(self, parent):
@@ -640,6 +1059,14 @@ class MainMenu(QWidget):
         self.delete_poll_button.clicked.connect(self.show_delete_poll)
         self.layout.addWidget(self.delete_poll_button)
 
+        self.analytics_button = QPushButton('Poll Statistics', self)
+        self.analytics_button.clicked.connect(self.show_analytics)
+        self.layout.addWidget(self.analytics_button)
+
+        self.diagnostics_button = QPushButton('Query Diagnostics', self)
+        self.diagnostics_button.clicked.connect(self.show_diagnostics)
+        self.layout.addWidget(self.diagnostics_button)
+
 
         self.setLayout(self.layout)
 
@@ -659,6 +1086,14 @@ class MainMenu(QWidget):
         delete_poll_window = DeletePollWindow(self.parent)
         delete_poll_window.exec_()
 
+    def show_analytics(self):
+        analytics_window = AnalyticsWindow(self.parent)
+        analytics_window.exec_()
+
+    def show_diagnostics(self):
+        diagnostics_window = DiagnosticsWindow(self.parent)
+        diagnostics_window.exec_()
+
     # 변경: Vote 버튼 클릭 시 프로그램 종료
     def quit_program(self):
         self.parent.close()
@@ -696,24 +1131,23 @@ class AdditionalFields(QWidget):
         self.close()
 
 class VotingSystem(QMainWindow):
-    def __init__(self):
+    def __init__(self, profile=None):
         super().__init__()
+        self.profile = profile
         
-        # 로깅 설정
-        logging.basicConfig(filename='log.txt', level=logging.INFO, 
-                            format='%(asctime)s:%(levelname)s:%(message)s')
-
-        # Initialize database connection
-        self.connection = pymysql.connect(
-            host='127.0.0.1',
-            user='root',
-            password='qwer1234',
-            db='voting',
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        # Create tables if they don't exist
-        self.create_tables()
+        # 감사 로그는 백그라운드 스레드가 쓴다 (audit.log, JSON lines)
+        Audit.start()
+
+        # Database calls run on these threads so the window never waits for a query.
+        # One thread per pooled connection; more would only wait for a connection
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(Config.POOL_CONFIG['max_size'])
+        self.tasks = TaskRunner(self.thread_pool, self)
+
+        # Shared connection pool and voting operations (VoteServer.py uses the same service).
+        # Both are set by open_database once the database is reachable
+        self.pool = None
+        self.service = None
 
         # Current user ID (logged in user)
         self.user_id = None
@@ -723,97 +1157,51 @@ class VotingSystem(QMainWindow):
         
         # Initialize user admin status
         self.user_is_admin = False
-        
-    def create_tables(self):
-        try:
-            with self.connection.cursor() as cursor:
-                # Check if ACCOUNT table exists
-                cursor.execute("SHOW TABLES LIKE 'ACCOUNT'")
-                if not cursor.fetchone():
-                    # ACCOUNT table does not exist, create it
-                    self.create_account_table(cursor)
-
-                # Check if POLL table exists
-                cursor.execute("SHOW TABLES LIKE 'POLL'")
-                if not cursor.fetchone():
-                    # POLL table does not exist, create it
-                    self.create_poll_table(cursor)
-
-                # Check if ITEM table exists
-                cursor.execute("SHOW TABLES LIKE 'ITEM'")
-                if not cursor.fetchone():
-                    # ITEM table does not exist, create it
-                    self.create_item_table(cursor)
-                    
-                # ... existing code ...
-                cursor.execute("SHOW TABLES LIKE 'USER_VOTE'")
-                if not cursor.fetchone():
-                    self.create_user_vote_table(cursor)
-                # Commit the transaction
-
-                # Commit the transaction
-                self.connection.commit()
 
+        # Connect and check the schema in the background so the login screen paints right away
+        self.start_database()
+
+    def mark(self, name, thread='gui'):
+        if self.profile is not None:
+            self.profile.mark(name, thread)
+
+    def start_database(self):
+        self.login_screen.show_connecting()
+        self.tasks.run(self.open_database, on_result=self.database_ready, on_error=self.database_failed)
+
+    def open_database(self):
+        # Runs on a worker thread; this is where pymysql and the database modules are first imported
+        from database import Pool, Service
+        self.mark('database imported', 'worker')
+        pool = Pool.get_pool()
+        # Set here rather than in database_ready: closeEvent drops pending results,
+        # but still has to close a pool and a service that were started
+        self.pool = pool
+        self.mark('database connected', 'worker')
+        self.create_tables(pool)
+        self.mark('schema checked', 'worker')
+        self.service = Service.VotingService(pool)
+        self.mark('service started', 'worker')
+
+    def database_ready(self, _):
+        self.login_screen.show_ready()
+        self.mark('ready')
+
+    def database_failed(self, error):
+        self.login_screen.show_connect_failed()
+        self.mark('database failed')
+        report_error(error)
+
+    def create_tables(self, pool):
+        # Bring the schema up to date; a single query when nothing is pending
+        import pymysql
+        from database import Migration
+        try:
+            applied = Migration.migrate(pool)
+            if applied:
+                print(f"Applied schema migrations: {applied}")
         except pymysql.MySQLError as e:
             print(f"Database error: {e}")
-            
-    def create_user_vote_table(self, cursor):
-        query = '''
-        CREATE TABLE USER_VOTE (
-            VOTE_ID int(11) NOT NULL AUTO_INCREMENT,
-            POLL_ID int(11) NOT NULL,
-            USER_ID int(11) NOT NULL,
-            PRIMARY KEY (VOTE_ID),
-            FOREIGN KEY (POLL_ID) REFERENCES POLL(POLL_ID),
-            FOREIGN KEY (USER_ID) REFERENCES ACCOUNT(ACCOUNT_ID)
-        ) AUTO_INCREMENT=1
-        '''
-        cursor.execute(query)
-        
-    def create_item_table(self, cursor):
-        query = '''
-        CREATE TABLE ITEM (
-            ITEM_ID int(11) NOT NULL AUTO_INCREMENT,
-            POLL_ID int(11) NOT NULL,
-            ITEM_TEXT varchar(255) NOT NULL,
-            VOTE_COUNT int(11) NOT NULL DEFAULT 0,
-            PRIMARY KEY (ITEM_ID, POLL_ID),
-            FOREIGN KEY (POLL_ID) REFERENCES POLL(POLL_ID)
-        ) AUTO_INCREMENT=1
-        '''
-        cursor.execute(query)
-
-    def create_poll_table(self, cursor):
-        query = '''
-        CREATE TABLE POLL (
-            POLL_ID int(11) NOT NULL AUTO_INCREMENT,
-            START_DATE varchar(50) NOT NULL,
-            END_DATE varchar(50),
-            ITEMCOUNT int(11) NOT NULL DEFAULT 0,
-            QUESTION varchar(30),
-            POLLTOTAL int(11) NOT NULL DEFAULT 0,
-            REGDATE varchar(50),
-            CREATED_BY int(11),  # Adding the CREATED_BY column
-            PRIMARY KEY(POLL_ID),
-            FOREIGN KEY (CREATED_BY) REFERENCES ACCOUNT(ACCOUNT_ID)  # Setting up a foreign key reference
-        ) AUTO_INCREMENT=1
-        '''
-        cursor.execute(query)
-
-    def create_account_table(self, cursor):
-        query = '''
-        CREATE TABLE ACCOUNT (
-            ACCOUNT_ID int(11) NOT NULL AUTO_INCREMENT,
-            USERNAME varchar(20) NOT NULL,
-            PASSWORD varchar(20) NOT NULL,
-            IS_BANNED tinyint(1) NOT NULL DEFAULT '0',
-            SESSION_IP varchar(20),
-            IS_ADMIN tinyint(1) NOT NULL DEFAULT '0',  # New field for admin status
-            PRIMARY KEY(ACCOUNT_ID)
-        ) AUTO_INCREMENT=1
-        '''
-        cursor.execute(query)
-
 
     def init_ui(self):
         self.setWindowTitle('Seoultech Voting System')
@@ -844,137 +1232,131 @@ class VotingSystem(QMainWindow):
         self.move(qr.topLeft())
 
     def login(self):
+        if self.service is None:
+            # The last connection attempt failed; try again
+            if not self.tasks.tasks:
+                self.start_database()
+            return
+
         username = self.login_screen.login_text.text()
         password = self.login_screen.login_password.text()
 
         if username and password:
-            try:
-                with self.connection.cursor() as cursor:
-                    # Check if the user exists
-                    user_query = "SELECT * FROM ACCOUNT WHERE USERNAME = %s"
-                    cursor.execute(user_query, (username,))
-                    existing_user = cursor.fetchone()
-
-                    if existing_user:
-                        # User exists, check the password
-                        if existing_user['PASSWORD'] == password:
-                            self.user_id = existing_user['ACCOUNT_ID']
-                            self.user_is_admin = existing_user['IS_ADMIN'] == 1  # Set user admin status
-                            print(f"Login successful for user '{username}'")
-
-                            # Remove the login screen and show the main menu
-                            self.layout.removeWidget(self.login_screen)
-                            self.layout.addWidget(self.main_menu)
-                            self.login_screen.deleteLater()
-
-                            # Show login result on the login screen
-                            self.login_screen.show_login_result(True)
-                            
-                            logging.info(f"Login successful for user '{username}'")
-                            if existing_user['IS_ADMIN'] == 1:
-                                logging.info(f"Admin login successful for user '{username}'")
-                            else:
-                                logging.info(f"User login successful for user '{username}'")
-                        else:
-                            print(f"Login failed for user '{username}': Incorrect password")
-                            # Show login result on the login screen
-                            self.login_screen.show_login_result(False)
-                            logging.info(f"Login failed for user '{username}': Incorrect password")
-                            
-                        if existing_user['IS_ADMIN'] == 1:
-                            print(f"Admin login successful for user '{username}'")
-                        else:
-                            print(f"User login successful for user '{username}'")
-                    else:
-                        # User does not exist, create a new account
-                        create_account_query = "INSERT INTO ACCOUNT (USERNAME, PASSWORD) VALUES (%s, %s)"
-                        cursor.execute(create_account_query, (username, password))
-                        self.connection.commit()
-
-                        # Retrieve the newly created user
-                        cursor.execute(user_query, (username,))
-                        new_user = cursor.fetchone()
-
-                        self.user_id = new_user['ACCOUNT_ID']
-                        print(f"New account created and logged in for user '{username}'")
-
-                        # Remove the login screen and show the main menu
-                        self.layout.removeWidget(self.login_screen)
-                        self.layout.addWidget(self.main_menu)
-                        self.login_screen.deleteLater()
-
-                        # Show login result on the login screen
-                        self.login_screen.show_login_result(True)
-                        
-                        logging.info(f"New account created and logged in for user '{username}'")
-
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
+            if self.tasks.tasks:
+                return
+            # Existing users are checked, unknown users are registered
+            self.login_screen.show_logging_in()
+            self.tasks.run(self.service.login, username, password,
+                           on_result=lambda account: self.logged_in(username, account),
+                           on_error=lambda error: self.login_failed(username, error))
         else:
             print("Please enter both username and password.")
 
+    def login_failed(self, username, error):
+        from database import Service
+        if isinstance(error, Service.LoginFailed):
+            print(f"Login failed for user '{username}': Incorrect password")
+            # Show login result on the login screen
+            self.login_screen.show_login_result(False)
+            return
+        self.login_screen.show_login_result(False)
+        report_error(error)
+
+    def logged_in(self, username, account):
+        self.user_id = account['account_id']
+        self.user_is_admin = account['is_admin']  # Set user admin status
+
+        # Remove the login screen and show the main menu
+        self.layout.removeWidget(self.login_screen)
+        self.layout.addWidget(self.main_menu)
+        self.login_screen.deleteLater()
+
+        # Show login result on the login screen
+        self.login_screen.show_login_result(True)
+
+        if account['created']:
+            print(f"New account created and logged in for user '{username}'")
+        else:
+            print(f"Login successful for user '{username}'")
+
     def create_poll(self, question):
         if question and self.user_id:
-            try:
-                with self.connection.cursor() as cursor:
-                    # Get current date and time
-                    current_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-                    # Insert poll into database
-                    poll_insert_query = "INSERT INTO POLL (START_DATE, END_DATE, QUESTION, ITEMCOUNT, POLLTOTAL, REGDATE) VALUES (%s, %s, %s, 0, 0, %s)"
-                    cursor.execute(poll_insert_query, (current_datetime, current_datetime, question, current_datetime))
-
-                    # Commit the transaction
-                    self.connection.commit()
-                    print(f"Poll created with question: '{question}'")
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
+            self.tasks.run(self.insert_poll, question)
         else:
             print("Please enter a poll question and make sure you are logged in.")
 
+    def insert_poll(self, question):
+        # Runs on a worker thread
+        from database import Query
+        with self.pool.cursor() as cursor:
+            # Get current date and time
+            current_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+            # Insert poll into database
+            Query.POLL_INSERT(cursor, current_datetime, current_datetime, question, 0, 0, current_datetime, self.user_id)
+            Query.VERSION_BUMP(cursor, 'POLL')
+        self.service.repository.invalidate_catalog()
+        Audit.event('poll_create', user_id=self.user_id, question=question)
+        print(f"Poll created with question: '{question}'")
+
     def vote(self, item_text):
         if item_text and self.user_id:
-            try:
-                with self.connection.cursor() as cursor:
-                    # Check if the poll exists
-                    poll_query = "SELECT * FROM POLL WHERE QUESTION = %s"
-                    cursor.execute(poll_query, (item_text,))
-                    poll = cursor.fetchone()
-
-                    if poll:
-                        poll_id = poll['POLL_ID']
-
-                        # Insert the vote
-                        item_insert_query = "INSERT INTO ITEM (POLL_ID, ITEM_TEXT, VOTE_COUNT) VALUES (%s, %s, 1)"
-                        cursor.execute(item_insert_query, (poll_id, item_text))
-
-                        # Update the item count
-                        item_count_query = "UPDATE POLL SET ITEMCOUNT = (SELECT COUNT(*) FROM ITEM WHERE POLL_ID = %s) WHERE POLL_ID = %s"
-                        cursor.execute(item_count_query, (poll_id, poll_id))
-
-                        # Commit the transaction
-                        self.connection.commit()
-                        print(f"Vote recorded for '{item_text}' in poll '{item_text}'")
-                        
-                        logging.info(f"Vote recorded for '{item_text}' in poll '{item_text}'")
-                    else:
-                        print(f"Poll '{item_text}' not found.")
-                        logging.info(f"Poll '{item_text}' not found.")
-
-            except pymysql.MySQLError as e:
-                print(f"Database error: {e}")
+            self.tasks.run(self.insert_item_vote, item_text)
         else:
             print("Please enter both the poll question and your username.")
 
+    def insert_item_vote(self, item_text):
+        # Runs on a worker thread
+        from database import Query
+        with self.pool.cursor() as cursor:
+            # Check if the poll exists
+            poll = Query.POLL_SELECT_BY_QUESTION(cursor, item_text)
+
+            if poll:
+                poll_id = poll['POLL_ID']
+
+                # Insert the vote and update the item count
+                Query.ITEM_INSERT(cursor, poll_id, item_text, 1)
+                Query.VERSION_BUMP(cursor, 'POLL')
+                Query.VERSION_BUMP(cursor, 'ITEM', poll_id)
+                self.service.repository.invalidate_poll(poll_id)
+                print(f"Vote recorded for '{item_text}' in poll '{item_text}'")
+            else:
+                print(f"Poll '{item_text}' not found.")
+        # commit 된 뒤에 남긴다
+        if poll:
+            Audit.event('vote', poll_id=poll['POLL_ID'], user_id=self.user_id, text=item_text, accepted=True)
+
     def closeEvent(self, event):
-        # Close the database connection when the application is closed
-        if self.connection:
-            self.connection.close()
+        # Drop pending results and wait for queries that are already running
+        self.tasks.cancel()
+        self.thread_pool.waitForDone()
+        # Flush pending votes and close the database connections when the application is closed
+        if self.service is not None:
+            self.service.close()
+        if self.pool is not None:
+            from database import Pool
+            Pool.close_pool()
+        Audit.stop()
 
 def main():
-    app = QApplication(sys.argv)
-    window = VotingSystem()
+    parser = argparse.ArgumentParser(description='Seoultech Voting System')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print the time to first paint and to a usable login screen')
+    # 나머지 인자는 Qt 가 받는다 (-platform 등)
+    args, qt_args = parser.parse_known_args()
+
+    profile = StartupProfile(IMPORT_STARTED) if args.profile_startup else None
+    if profile is not None:
+        profile.mark('imports')
+    app = QApplication(sys.argv[:1] + qt_args)
+    if profile is not None:
+        profile.mark('QApplication')
+        profile.watch(app)
+    window = VotingSystem(profile)
     window.show()
+    if profile is not None:
+        profile.mark('window shown')
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
@@ -0,0 +1,289 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from argparse import Namespace
+from concurrent.futures import Future
+from datetime import datetime
+
+import pymysql
+
+import createtemp
+from database import Backend, Config, Pool, Query, Service
+
+# 데이터 접근 경로별 마이크로 벤치마크
+#   python benchmark.py --sizes small,medium --output result.json
+#   python benchmark.py --baseline result.json --threshold 0.15   기준보다 느려지면 종료 코드 1
+# 별도의 데이터베이스(--database, 기본 voting_bench)를 크기마다 다시 채우므로 운영 DB 는 건드리지 않는다.
+# 네트워크 없이 돌리려면 VOTING_DB_SOCKET 으로 로컬 서버의 유닉스 소켓을 지정하거나
+# --backend sqlite 로 같은 프로세스 안의 SQLite 파일(<database>.db)을 쓴다.
+
+SIZES = {
+    'small': dict(accounts=1000, polls=100, items_per_poll=5, votes=10000),
+    'medium': dict(accounts=10000, polls=1000, items_per_poll=5, votes=200000),
+    'large': dict(accounts=100000, polls=10000, items_per_poll=5, votes=2000000),
+}
+VOTE_BATCH = 100
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(operation, iterations, warmup, ops_per_call=1):
+    for _ in range(warmup):
+        operation()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter_ns()
+        operation()
+        latencies.append((time.perf_counter_ns() - begin) / 1e6)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_sec': iterations * ops_per_call / max(elapsed, 1e-9),
+        'p50_ms': percentile(latencies, 0.50),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+    }
+
+
+class Scenario:
+    """Timed operations against one seeded dataset.
+
+    Write benchmarks pair up so the dataset is left as it was seeded:
+    POLL_INSERT creates the polls POLL_DELETE_BY_ID removes, and likewise for
+    items. Votes go to scratch polls that are deleted at the end.
+    """
+
+    def __init__(self, pool, service, size, rng):
+        self.pool = pool
+        self.service = service
+        self.size = size
+        self.rng = rng
+        self.now = createtemp.BASE_DATE.replace(month=7)
+        self.new_polls = []
+        self.new_items = []
+        self.scratch_polls = []
+        self.next_voter = size['accounts'] + 1
+
+    def random_poll(self):
+        return self.rng.randint(1, self.size['polls'])
+
+    def random_account(self):
+        return self.rng.randint(1, self.size['accounts'])
+
+    def poll_insert(self):
+        with self.pool.cursor() as cursor:
+            stamp = self.now.strftime('%Y-%m-%d %H:%M:%S')
+            self.new_polls.append(Query.POLL_INSERT(cursor, stamp, stamp, "benchmark poll", 0, 0, stamp))
+
+    def poll_delete(self):
+        poll_id = self.new_polls.pop()
+        with self.pool.cursor() as cursor:
+            Query.POLL_DELETE_BY_ID(cursor, poll_id)
+
+    def item_insert(self):
+        poll_id = self.scratch_poll()
+        with self.pool.cursor() as cursor:
+            self.new_items.append((Query.ITEM_INSERT(cursor, poll_id, "benchmark item", 0), poll_id))
+
+    def item_delete(self):
+        item_id, poll_id = self.new_items.pop()
+        with self.pool.cursor() as cursor:
+            Query.ITEM_DELETE_BY_ID(cursor, item_id, poll_id)
+
+    def login(self):
+        account_id = self.random_account()
+        self.service.login(f"user{account_id:07d}", f"pw{account_id}")
+
+    def has_user_voted(self):
+        with self.pool.cursor() as cursor:
+            Query.USER_VOTE_EXISTS(cursor, self.random_poll(), self.random_account())
+
+    def vote(self, count=1):
+        batch = [(poll_id, 1, user_id, Future()) for poll_id, user_id in self.fresh_voters(count)]
+        with self.pool.cursor() as cursor:
+            self.service.vote_queue._write_batch(cursor, batch, {})
+
+    def vote_batch(self):
+        self.vote(VOTE_BATCH)
+
+    def poll_page(self):
+        self.service.poll_page(after_id=self.random_poll(), limit=100)
+
+    def active_polls(self):
+        with self.pool.cursor() as cursor:
+            Query.POLL_SELECT_ACTIVE(cursor, self.now)
+
+    def list_polls(self):
+        with self.pool.cursor() as cursor:
+            Query.POLL_SELECT_ALL(cursor)
+
+    def list_items(self):
+        with self.pool.cursor() as cursor:
+            Query.ITEM_SELECT_WITH_COUNTS(cursor, self.random_poll())
+
+    def list_items_cached(self):
+        self.service.get_items(self.random_poll())
+
+    def scratch_poll(self):
+        if not self.scratch_polls:
+            self.scratch_polls.append(self.service.create_poll(1, self.now, self.now, "benchmark scratch", ["A", "B"]))
+        return self.scratch_polls[-1]
+
+    def fresh_voters(self, count):
+        # 투표마다 한 사용자는 한 번만 투표할 수 있으므로 계정이 다 쓰이면 새 투표로 넘어간다.
+        pairs = []
+        for _ in range(count):
+            if self.next_voter > self.size['accounts']:
+                self.scratch_polls.append(self.service.create_poll(1, self.now, self.now, "benchmark scratch", ["A", "B"]))
+                self.next_voter = 1
+            pairs.append((self.scratch_polls[-1], self.next_voter))
+            self.next_voter += 1
+        return pairs
+
+    def cleanup(self):
+        with self.pool.cursor() as cursor:
+            for poll_id in self.scratch_polls:
+                Query.POLL_DELETE_BY_ID(cursor, poll_id)
+        self.scratch_polls = []
+
+
+def operations(scenario):
+    # (이름, 함수, 한 번 호출에 처리하는 작업 수) - 쓰기 짝은 순서가 중요하다.
+    return [
+        ('POLL_INSERT', scenario.poll_insert, 1),
+        ('POLL_DELETE_BY_ID', scenario.poll_delete, 1),
+        ('ITEM_INSERT', scenario.item_insert, 1),
+        ('ITEM_DELETE_BY_ID', scenario.item_delete, 1),
+        ('login', scenario.login, 1),
+        ('has_user_voted', scenario.has_user_voted, 1),
+        ('vote', scenario.vote, 1),
+        (f'vote_batch_{VOTE_BATCH}', scenario.vote_batch, VOTE_BATCH),
+        ('poll_page', scenario.poll_page, 1),
+        ('active_polls', scenario.active_polls, 1),
+        ('list_polls', scenario.list_polls, 1),
+        ('list_items', scenario.list_items, 1),
+        ('list_items_cached', scenario.list_items_cached, 1),
+    ]
+
+
+def ensure_database(name):
+    if Config.BACKEND == 'sqlite':
+        Config.SQLITE_PATH = f"{name}.db"
+        return
+    server = {key: value for key, value in Config.DB_CONFIG.items() if key != 'db'}
+    connection = pymysql.connect(**server)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{name}` CHARACTER SET utf8mb4")
+    finally:
+        connection.close()
+    Config.DB_CONFIG['db'] = name
+
+
+def run_size(name, args):
+    size = SIZES[name]
+    print(f"== {name}: {size}")
+    if not args.skip_load:
+        createtemp.generate(Namespace(zipf=1.2, seed=args.seed, chunk_size=5000, load_data=False, reset=True, **size))
+
+    pool = Pool.ConnectionPool(min_size=1, max_size=2, backend=Backend.get_backend())
+    service = Service.VotingService(pool)
+    scenario = Scenario(pool, service, size, random.Random(args.seed))
+    selected = set(args.only.split(',')) if args.only else None
+    results = {}
+    try:
+        for op_name, operation, ops_per_call in operations(scenario):
+            if selected and op_name not in selected:
+                continue
+            iterations = max(1, args.iterations // ops_per_call)
+            warmup = 0 if op_name.endswith('DELETE_BY_ID') else max(0, args.warmup // ops_per_call)
+            if op_name.endswith('DELETE_BY_ID'):
+                # 앞의 INSERT 벤치마크가 만든 행만큼만 지운다.
+                iterations = len(scenario.new_polls if op_name.startswith('POLL') else scenario.new_items)
+                if not iterations:
+                    continue
+            result = measure(operation, iterations, warmup, ops_per_call)
+            results[op_name] = result
+            print(f"{op_name:<20} {result['ops_per_sec']:>10,.0f} ops/s  p50 {result['p50_ms']:7.3f} ms  p99 {result['p99_ms']:7.3f} ms")
+    finally:
+        scenario.cleanup()
+        service.close()
+        pool.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for size, ops in results.items():
+        for op_name, current in ops.items():
+            previous = baseline.get('results', {}).get(size, {}).get(op_name)
+            if previous is None:
+                continue
+            if current['ops_per_sec'] < previous['ops_per_sec'] * (1 - threshold):
+                regressions.append(f"{size}/{op_name}: {previous['ops_per_sec']:,.0f} -> {current['ops_per_sec']:,.0f} ops/s")
+            if current['p99_ms'] > previous['p99_ms'] * (1 + threshold):
+                regressions.append(f"{size}/{op_name}: p99 {previous['p99_ms']:.3f} -> {current['p99_ms']:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the voting system data access paths')
+    parser.add_argument('--sizes', default='small', help=f"comma separated dataset sizes ({', '.join(SIZES)})")
+    parser.add_argument('--only', help='comma separated operation names to run')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=2023)
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], default=Config.BACKEND)
+    parser.add_argument('--database', default='voting_bench', help='database to seed and benchmark (will be truncated)')
+    parser.add_argument('--skip-load', action='store_true', help='reuse the data already in the benchmark database')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against a previous JSON result')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown before failing (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(',')
+    unknown = [name for name in sizes if name not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    Config.BACKEND = args.backend
+    ensure_database(args.database)
+    results = {name: run_size(name, args) for name in sizes}
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'backend': Config.BACKEND,
+            'host': Config.SQLITE_PATH if Config.BACKEND == 'sqlite' else Config.DB_CONFIG.get('unix_socket') or Config.DB_CONFIG['host'],
+            'iterations': args.iterations,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,241 @@
-import pymysql
+import argparse
+import math
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
 import numpy as np
 import PyQt5
-from database import Query
+from database import Backend, Migration, Pool, Query
+
+# python createtemp.py             예제 데이터 (관리자 1명, 투표 2개, 항목 7개)
+# python createtemp.py generate --accounts 100000 --polls 1000 --items-per-poll 5 --votes 2000000 --seed 1 --reset
+#   같은 seed 와 파라미터면 항상 같은 DB 가 만들어진다.
+
+TABLES = ['VOTE_SNAPSHOT', 'VOTE_EVENT', 'ITEM_COUNTER_SHARD', 'RANKED_VOTE', 'USER_VOTE', 'ITEM', 'POLL', 'ACCOUNT', 'DATA_VERSION']
+BASE_DATE = datetime(2023, 1, 1)
+
+
+def seed_sample():
+    Migration.migrate()
+
+    with Query.transaction() as cursor:
+        Query.ACCOUNT_INSERT(cursor, "admin", "admin", 0, "127.0.0.1")
+
+        Query.POLL_INSERT(cursor, "2023-12-08", "2023-12-12", "동아리 종강총회", 0, 0, "2023-12-08")
+        Query.POLL_INSERT(cursor, "2023-12-09", "2023-12-11", "동아리 종강회식", 0, 0, "2023-12-08")
+
+        Query.ITEM_INSERT_BULK(cursor, 1, ["12/15", "12/16", "12/17"])
+        Query.ITEM_INSERT_BULK(cursor, 2, ["12/15", "12/16", "12/17", "12/18"])
+
+    Pool.close_pool()
+
+
+def zipf_weights(count, skew):
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+def build_dataset(args):
+    # 모든 난수는 seed 하나에서 나온다.
+    rng = np.random.default_rng(args.seed)
+    polls, items_per_poll, accounts = args.polls, args.items_per_poll, args.accounts
+
+    # 투표마다 시작일은 BASE_DATE 부터 1년 안, 기간은 1~14일
+    start_offsets = rng.integers(0, 365 * 24 * 3600, polls)
+    durations = rng.integers(1, 15, polls) * 24 * 3600
+
+    # 투표별 투표자 수 (한 사용자는 한 투표에 한 번만 투표할 수 있다)
+    per_poll = np.minimum(rng.multinomial(args.votes, np.full(polls, 1.0 / polls)), accounts)
+
+    # 항목 인기도는 Zipf 분포이고 1위 항목은 투표마다 다르다.
+    weights = zipf_weights(items_per_poll, args.zipf)
+    vote_polls, vote_users, vote_items = [], [], []
+    tallies = np.zeros((polls, items_per_poll), dtype=np.int64)
+    for poll in range(polls):
+        count = int(per_poll[poll])
+        if count == 0:
+            continue
+        # offset + i * stride (stride 와 accounts 가 서로소) 는 서로 다른 사용자를 고른다.
+        stride = int(rng.integers(1, accounts)) if accounts > 1 else 1
+        while math.gcd(stride, accounts) != 1:
+            stride = int(rng.integers(1, accounts))
+        offset = int(rng.integers(0, accounts))
+        users = (offset + np.arange(count, dtype=np.int64) * stride) % accounts + 1
+        ranks = rng.permutation(items_per_poll)
+        items = ranks[rng.choice(items_per_poll, size=count, p=weights)] + 1
+        tallies[poll] = np.bincount(items - 1, minlength=items_per_poll)
+        vote_polls.append(np.full(count, poll + 1, dtype=np.int64))
+        vote_users.append(users)
+        vote_items.append(items)
+
+    empty = np.zeros(0, dtype=np.int64)
+    vote_polls = np.concatenate(vote_polls) if vote_polls else empty
+    # 투표 기록의 시각은 투표 기간 안에서 고른다.
+    vote_times = start_offsets[vote_polls - 1] + (rng.random(len(vote_polls)) * durations[vote_polls - 1]).astype(np.int64)
+    return {
+        'start_offsets': start_offsets,
+        'durations': durations,
+        'per_poll': per_poll,
+        'tallies': tallies,
+        'vote_polls': vote_polls,
+        'vote_users': np.concatenate(vote_users) if vote_users else empty,
+        'vote_items': np.concatenate(vote_items) if vote_items else empty,
+        'vote_times': vote_times,
+    }
+
+
+def account_rows(accounts):
+    for account_id in range(1, accounts + 1):
+        yield (account_id, f"user{account_id:07d}", f"pw{account_id}", 0, '127.0.0.1', 1 if account_id == 1 else 0)
+
+
+def poll_rows(data):
+    for index, (offset, duration, total) in enumerate(zip(data['start_offsets'].tolist(), data['durations'].tolist(), data['per_poll'].tolist())):
+        start = BASE_DATE + timedelta(seconds=offset)
+        end = start + timedelta(seconds=duration)
+        yield (index + 1, start, end, data['tallies'].shape[1], f"Poll {index + 1}", total, start, 1)
+
+
+def item_rows(data):
+    for poll_index, counts in enumerate(data['tallies'].tolist()):
+        for item_index, count in enumerate(counts):
+            yield (item_index + 1, poll_index + 1, f"Option {item_index + 1}", count)
+
+
+def vote_rows(data):
+    return zip(data['vote_polls'].tolist(), data['vote_users'].tolist())
+
+
+def event_rows(data):
+    for poll_id, item_id, user_id, offset in zip(data['vote_polls'].tolist(), data['vote_items'].tolist(),
+                                                 data['vote_users'].tolist(), data['vote_times'].tolist()):
+        yield (poll_id, item_id, user_id, BASE_DATE + timedelta(seconds=offset))
+
+
+TABLE_COLUMNS = {
+    'ACCOUNT': ['ACCOUNT_ID', 'USERNAME', 'PASSWORD', 'IS_BANNED', 'SESSION_IP', 'IS_ADMIN'],
+    'POLL': ['POLL_ID', 'START_DATE', 'END_DATE', 'ITEMCOUNT', 'QUESTION', 'POLLTOTAL', 'REGDATE', 'CREATED_BY'],
+    'ITEM': ['ITEM_ID', 'POLL_ID', 'ITEM_TEXT', 'VOTE_COUNT'],
+    'USER_VOTE': ['POLL_ID', 'USER_ID'],
+    'VOTE_EVENT': ['POLL_ID', 'ITEM_ID', 'USER_ID', 'CREATED_AT'],
+}
+
+
+def insert_chunks(connection, table, rows, chunk_size):
+    # executemany 가 chunk_size 행씩 다중 행 INSERT 로 보낸다.
+    columns = TABLE_COLUMNS[table]
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    total = 0
+    chunk = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                cursor.executemany(query, chunk)
+                connection.commit()
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            cursor.executemany(query, chunk)
+            connection.commit()
+            total += len(chunk)
+    return total
+
+
+def load_data(connection, table, rows, chunk_size):
+    # LOAD DATA LOCAL INFILE 로 탭 구분 파일을 한 번에 읽어 들인다.
+    columns = TABLE_COLUMNS[table]
+    total = 0
+    fd, path = tempfile.mkstemp(suffix='.tsv')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write('\t'.join(r'\N' if value is None else str(value) for value in row) + '\n')
+                total += 1
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)})", (path,))
+        connection.commit()
+    finally:
+        os.remove(path)
+    return total
 
-db = pymysql.connect(host='127.0.0.1', port=3306, user="root", password='qwer1234', db='voting', charset='utf8')
 
-cursor = db.cursor()
+def generate(args):
+    if args.accounts < 1 or args.polls < 1 or args.items_per_poll < 1:
+        raise SystemExit("accounts, polls and items per poll must be at least 1")
+    Migration.migrate()
+    Pool.close_pool()
 
-Query.ACCOUNT_CREATE(cursor)
-Query.ACCOUNT_INSERT(cursor, "admin", "admin", 0, "127.0.0.1")
+    started = time.perf_counter()
+    data = build_dataset(args)
+    print(f"Generated dataset in memory in {time.perf_counter() - started:.1f}s")
 
+    backend = Backend.get_backend()
+    sqlite = backend.name == 'sqlite'
+    if args.load_data and sqlite:
+        raise SystemExit("--load-data needs the MySQL backend")
+    connection = backend.connect(local_infile=True) if args.load_data else backend.connect()
+    try:
+        with connection.cursor() as cursor:
+            # 대량 적재 동안 세션 단위로 검사를 끈다. (데이터는 생성 단계에서 일관성이 보장된다)
+            if sqlite:
+                cursor.execute("PRAGMA foreign_keys = OFF")
+            else:
+                cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+            if args.reset:
+                for table in TABLES:
+                    cursor.execute(f"DELETE FROM {table}" if sqlite else f"TRUNCATE TABLE {table}")
+                connection.commit()
+            else:
+                for table in TABLE_COLUMNS:
+                    cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+                    if cursor.fetchone():
+                        raise SystemExit(f"{table} is not empty; use --reset to replace the existing data")
 
-Query.POLL_CREATE(cursor)
+        write = load_data if args.load_data else insert_chunks
+        for table, rows in [('ACCOUNT', account_rows(args.accounts)), ('POLL', poll_rows(data)),
+                            ('ITEM', item_rows(data)), ('USER_VOTE', vote_rows(data)),
+                            ('VOTE_EVENT', event_rows(data))]:
+            table_started = time.perf_counter()
+            count = write(connection, table, rows, args.chunk_size)
+            elapsed = time.perf_counter() - table_started
+            print(f"{table:<10} {count:>10} rows in {elapsed:6.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
 
-Query.POLL_INSERT(cursor, "2023-12-08", "2023-12-12", "동아리 종강총회", 0, 0, "2023-12-08")
-Query.POLL_INSERT(cursor, "2023-12-09", "2023-12-11", "동아리 종강회식", 0, 0, "2023-12-08")
+        with connection.cursor() as cursor:
+            if sqlite:
+                cursor.execute("PRAGMA foreign_keys = ON")
+            else:
+                cursor.execute("SET unique_checks = 1, foreign_key_checks = 1")
+        connection.commit()
+    finally:
+        connection.close()
+    print(f"Done in {time.perf_counter() - started:.1f}s (seed {args.seed})")
 
-Query.ITEM_CREATE(cursor)
 
-Query.ITEM_INSERT(cursor, 1, "12/15", 0)
-Query.ITEM_INSERT(cursor, 1, "12/16", 0)
-Query.ITEM_INSERT(cursor, 1, "12/17", 0)
-Query.ITEM_INSERT(cursor, 2, "12/15", 0)
-Query.ITEM_INSERT(cursor, 2, "12/16", 0)
-Query.ITEM_INSERT(cursor, 2, "12/17", 0)
-Query.ITEM_INSERT(cursor, 2, "12/18", 0)
+def main():
+    parser = argparse.ArgumentParser(description='Seed the voting database')
+    commands = parser.add_subparsers(dest='command')
+    gen = commands.add_parser('generate', help='generate a large reproducible dataset')
+    gen.add_argument('--accounts', type=int, default=10000)
+    gen.add_argument('--polls', type=int, default=100)
+    gen.add_argument('--items-per-poll', type=int, default=5)
+    gen.add_argument('--votes', type=int, default=100000)
+    gen.add_argument('--zipf', type=float, default=1.2, help='item popularity skew (0 = uniform)')
+    gen.add_argument('--seed', type=int, default=2023)
+    gen.add_argument('--chunk-size', type=int, default=5000, help='rows per multi-row INSERT')
+    gen.add_argument('--load-data', action='store_true', help='use LOAD DATA LOCAL INFILE instead of INSERT')
+    gen.add_argument('--reset', action='store_true', help='truncate existing tables first')
+    args = parser.parse_args()
 
-db.commit()
+    if args.command == 'generate':
+        generate(args)
+    else:
+        seed_sample()
 
-db.close()
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+import pymysql
+
+from database import Export, Pool, Query
+
+# 여러 투표에 걸친 참여율 / 득표 차 / 득표율 분포 / 투표자 중복 통계.
+# ITEM 과 USER_VOTE 를 chunk 단위로 한 번씩만 읽어서 NumPy 배열에 담고, 통계는 투표별 쿼리나
+# 행 단위 파이썬 반복 없이 배열 연산으로 계산한다.
+#   python -m database.Analytics
+#   python -m database.Analytics --top 20 --json report.json
+
+SHARE_BINS = 10
+OVERLAP_TOP = 10
+
+
+class Dataset:
+    """Vote data of every poll as flat NumPy arrays.
+
+    Polls are addressed by their position in ``poll_ids`` (sorted), so the
+    per-item and per-ballot arrays carry a small ``*_poll`` index instead of
+    the POLL_ID itself and can be reduced with ``np.bincount``.
+    """
+
+    def __init__(self, poll_ids, questions, accounts, item_poll, item_ids, item_counts, ballot_poll, ballot_users):
+        self.poll_ids = poll_ids
+        self.questions = questions
+        self.accounts = accounts
+        self.item_poll = item_poll
+        self.item_ids = item_ids
+        self.item_counts = item_counts
+        self.ballot_poll = ballot_poll
+        self.ballot_users = ballot_users
+
+    @property
+    def poll_count(self):
+        return len(self.poll_ids)
+
+
+def _columns(connection, query, dtypes, chunk_rows):
+    # 결과를 chunk 마다 배열로 바꿔서 모은다. 파이썬 튜플은 chunk 하나만큼만 메모리에 있다.
+    chunks = [[] for _ in dtypes]
+    for rows in Export.stream(connection, query, chunk_rows=chunk_rows):
+        for index, (values, dtype) in enumerate(zip(zip(*rows), dtypes)):
+            chunks[index].append(np.array(values, dtype=dtype))
+    return [np.concatenate(parts) if parts else np.zeros(0, dtype=dtype) for parts, dtype in zip(chunks, dtypes)]
+
+
+def load(pool=None, chunk_rows=Export.CHUNK_ROWS):
+    pool = pool or Pool.get_pool()
+    with pool.connection() as connection:
+        with connection.cursor() as cursor:
+            accounts = Query.ACCOUNT_COUNT(cursor)
+            polls = Query.POLL_QUESTIONS(cursor)
+        # 분산 카운터 SLOT 까지 합친 득표 수
+        item_polls, item_ids, item_counts = _columns(
+            connection, Query.ITEM_COUNTS_STREAM, (np.int64, np.int64, np.int64), chunk_rows)
+        ballot_polls, ballot_users = _columns(
+            connection, Query.USER_VOTE_STREAM, (np.int64, np.int64), chunk_rows)
+        connection.commit()
+
+    poll_ids = np.array([row['POLL_ID'] for row in polls], dtype=np.int64)
+    item_poll, known = _positions(poll_ids, item_polls)
+    ballot_poll, voted = _positions(poll_ids, ballot_polls)
+    return Dataset(poll_ids, [row['QUESTION'] for row in polls], accounts,
+                   item_poll[known], item_ids[known], item_counts[known],
+                   ballot_poll[voted], ballot_users[voted])
+
+
+def _positions(poll_ids, values):
+    # POLL_ID -> poll_ids 안의 위치. 지워진 투표를 가리키는 행은 mask 가 False 다.
+    if not len(poll_ids):
+        return np.zeros(len(values), dtype=np.int32), np.zeros(len(values), dtype=bool)
+    index = np.minimum(np.searchsorted(poll_ids, values), len(poll_ids) - 1)
+    return index.astype(np.int32), poll_ids[index] == values
+
+
+def participation(data):
+    # 투표별 투표자 수와 전체 계정 대비 비율
+    voters = np.bincount(data.ballot_poll, minlength=data.poll_count)
+    rate = voters / data.accounts if data.accounts else np.zeros(data.poll_count)
+    return voters, rate
+
+
+def totals(data):
+    return np.bincount(data.item_poll, weights=data.item_counts, minlength=data.poll_count).astype(np.int64)
+
+
+def margins(data):
+    # 1위와 2위의 득표 차 (표 수, 전체 대비 비율). 항목이 하나면 2위는 0표로 본다.
+    order = np.lexsort((data.item_counts, data.item_poll))
+    polls = data.item_poll[order]
+    counts = data.item_counts[order]
+    first = np.zeros(data.poll_count, dtype=np.int64)
+    second = np.zeros(data.poll_count, dtype=np.int64)
+    if len(polls):
+        # 정렬된 배열에서 투표별 마지막 자리가 1위, 그 앞자리가 같은 투표면 2위다.
+        last = np.flatnonzero(np.append(polls[1:] != polls[:-1], True))
+        first[polls[last]] = counts[last]
+        runner_up = last[last > 0]
+        runner_up = runner_up[polls[runner_up - 1] == polls[runner_up]]
+        second[polls[runner_up]] = counts[runner_up - 1]
+    votes = first - second
+    total = totals(data)
+    share = np.divide(votes, total, out=np.zeros(data.poll_count), where=total > 0)
+    return votes, share
+
+
+def share_distribution(data, bins=SHARE_BINS):
+    # 표가 있는 투표의 항목별 득표율 히스토그램과 분위수
+    total = totals(data)
+    counted = total[data.item_poll] > 0
+    shares = data.item_counts[counted] / total[data.item_poll][counted]
+    histogram, edges = np.histogram(shares, bins=bins, range=(0.0, 1.0))
+    quantiles = np.quantile(shares, [0.1, 0.25, 0.5, 0.75, 0.9]) if len(shares) else np.zeros(5)
+    return histogram, edges, quantiles
+
+
+def overlap(data, top=OVERLAP_TOP):
+    # 투표자가 많은 top 개 투표끼리 겹치는 투표자 수와 Jaccard 지수
+    voters, _ = participation(data)
+    chosen = np.argsort(voters, kind='stable')[::-1][:top]
+    chosen = chosen[voters[chosen] > 0]
+    column = np.full(data.poll_count, -1, dtype=np.int64)
+    column[chosen] = np.arange(len(chosen))
+    picked = column[data.ballot_poll] >= 0
+    users, user_index = np.unique(data.ballot_users[picked], return_inverse=True)
+    # 사용자 x 투표 0/1 행렬을 곱하면 두 투표에 모두 참여한 사용자 수가 된다.
+    membership = np.zeros((len(users), len(chosen)), dtype=np.float32)
+    membership[user_index, column[data.ballot_poll[picked]]] = 1.0
+    shared = (membership.T @ membership).round().astype(np.int64)
+    sizes = np.diag(shared)
+    union = sizes[:, None] + sizes[None, :] - shared
+    jaccard = np.divide(shared, union, out=np.zeros(shared.shape), where=union > 0)
+    return chosen, shared, jaccard
+
+
+def report(data, top=OVERLAP_TOP, bins=SHARE_BINS):
+    voters, rate = participation(data)
+    margin_votes, margin_share = margins(data)
+    histogram, edges, quantiles = share_distribution(data, bins)
+    chosen, shared, jaccard = overlap(data, top)
+    # 한 표 차가 가장 작은 투표부터 (표가 있는 투표만)
+    contested = np.flatnonzero(voters > 0)
+    contested = contested[np.argsort(margin_share[contested], kind='stable')][:top]
+    busiest = np.argsort(voters, kind='stable')[::-1][:top]
+    return {
+        'accounts': int(data.accounts),
+        'polls': data.poll_count,
+        'ballots': int(len(data.ballot_poll)),
+        'participation': {
+            'mean': float(rate.mean()) if data.poll_count else 0.0,
+            'median': float(np.median(rate)) if data.poll_count else 0.0,
+            'max': float(rate.max()) if data.poll_count else 0.0,
+            'no_votes': int((voters == 0).sum()),
+            'top': [{'poll_id': int(data.poll_ids[i]), 'question': data.questions[i], 'voters': int(voters[i]),
+                     'rate': float(rate[i])} for i in busiest],
+        },
+        'margins': {
+            'mean_share': float(margin_share[voters > 0].mean()) if (voters > 0).any() else 0.0,
+            'ties': int(((margin_votes == 0) & (voters > 0)).sum()),
+            'closest': [{'poll_id': int(data.poll_ids[i]), 'question': data.questions[i], 'votes': int(margin_votes[i]),
+                         'share': float(margin_share[i])} for i in contested],
+        },
+        'shares': {
+            'bins': [[float(low), float(high), int(count)] for low, high, count in zip(edges[:-1], edges[1:], histogram)],
+            'quantiles': dict(zip(['p10', 'p25', 'p50', 'p75', 'p90'], (float(value) for value in quantiles))),
+        },
+        'overlap': {
+            'poll_ids': [int(data.poll_ids[i]) for i in chosen],
+            'shared_voters': shared.tolist(),
+            'jaccard': jaccard.round(4).tolist(),
+        },
+    }
+
+
+def format_report(result):
+    lines = [f"{result['polls']} polls, {result['ballots']:,} ballots, {result['accounts']:,} accounts", '']
+    part = result['participation']
+    lines.append(f"Participation: mean {part['mean']:.1%}, median {part['median']:.1%}, max {part['max']:.1%}, "
+                 f"{part['no_votes']} polls without votes")
+    for row in part['top']:
+        lines.append(f"  poll {row['poll_id']:>6} {row['voters']:>8,} voters {row['rate']:7.1%}  {row['question']}")
+    lines.append('')
+    margin = result['margins']
+    lines.append(f"Margin of victory: mean {margin['mean_share']:.1%} of the votes, {margin['ties']} ties")
+    for row in margin['closest']:
+        lines.append(f"  poll {row['poll_id']:>6} {row['votes']:>8,} votes {row['share']:7.1%}  {row['question']}")
+    lines.append('')
+    shares = result['shares']
+    lines.append('Item share distribution: ' + ', '.join(f"{name} {value:.1%}" for name, value in shares['quantiles'].items()))
+    peak = max((count for _, _, count in shares['bins']), default=0)
+    for low, high, count in shares['bins']:
+        bar = '#' * (round(count / peak * 40) if peak else 0)
+        lines.append(f"  {low:4.0%}-{high:4.0%} {count:>8,} {bar}")
+    lines.append('')
+    poll_ids = result['overlap']['poll_ids']
+    lines.append('Voter overlap (Jaccard) between the busiest polls')
+    lines.append('  ' + ' ' * 6 + ''.join(f"{poll_id:>7}" for poll_id in poll_ids))
+    for poll_id, row in zip(poll_ids, result['overlap']['jaccard']):
+        lines.append(f"  {poll_id:>6}" + ''.join(f"{value:7.2f}" for value in row))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Turnout and result statistics across all polls')
+    parser.add_argument('--top', type=int, default=OVERLAP_TOP, help='polls listed per section and in the overlap matrix')
+    parser.add_argument('--bins', type=int, default=SHARE_BINS)
+    parser.add_argument('--json', help='also write the report as JSON to this file')
+    args = parser.parse_args()
+
+    try:
+        result = report(load(), args.top, args.bins)
+    except pymysql.MySQLError as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        Pool.close_pool()
+    print(format_report(result))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
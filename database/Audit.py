@@ -0,0 +1,144 @@
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from database import Config
+
+# 로그인, 투표, 투표 생성/수정/삭제, DB 오류를 한 줄에 JSON 하나씩 남기는 감사 로그.
+# 호출한 스레드는 레코드를 큐에 넣기만 하고, 포맷, 파일 쓰기, 회전, 압축은 백그라운드 스레드가 한다.
+#   {"time": "2023-12-08T10:00:00.123", "level": "INFO", "event": "vote", "poll_id": 3, "item_id": 1, ...}
+# 회전된 파일은 audit.log.1.gz, audit.log.2.gz ... 로 남는다.
+
+LOGGER_NAME = 'voting.audit'
+
+_logger = logging.getLogger(LOGGER_NAME)
+_logger.setLevel(logging.INFO)
+_logger.propagate = False
+# start() 전이나 감사 로그를 쓰지 않는 도구에서는 레코드를 버린다. (stderr 로 새지 않게)
+_logger.addHandler(logging.NullHandler())
+_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'event': record.msg,
+        }
+        entry.update(getattr(record, 'audit', None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of high-volume events.
+
+    ``rates`` maps an event name to the fraction kept (missing names keep
+    everything). Kept records of a sampled event carry ``sample_rate`` so
+    counts can be scaled back when the log is analysed. Errors are never
+    dropped.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record):
+        rate = self.rates.get(record.msg, 1.0)
+        if rate >= 1.0 or record.levelno >= logging.ERROR:
+            return True
+        if random.random() >= rate:
+            return False
+        record.audit = dict(record.audit, sample_rate=rate)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # 기본 구현은 호출한 스레드에서 메시지를 포맷한다. 포맷은 기록 스레드에서 하므로 그대로 넘긴다.
+        return record
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates the log when it reaches ``max_bytes`` or ``max_age`` seconds.
+
+    Rotated files are gzip-compressed and at most ``backups`` of them are
+    kept. Rotation runs on the writer thread, never on the caller's.
+    """
+
+    def __init__(self, path, max_bytes, max_age, backups):
+        super().__init__(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+        self.max_age = max_age
+        self.opened_at = time.time()
+        self.namer = lambda name: name + '.gz'
+        self.rotator = _compress
+
+    def shouldRollover(self, record):
+        if self.max_age and time.time() - self.opened_at >= self.max_age \
+                and os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.opened_at = time.time()
+
+
+def _compress(source, destination):
+    with open(source, 'rb') as plain, gzip.open(destination, 'wb') as compressed:
+        shutil.copyfileobj(plain, compressed)
+    os.remove(source)
+
+
+def start(path=None, max_bytes=None, max_age=None, backups=None, sample=None):
+    # 프로세스마다 한 번. 이미 시작했으면 아무것도 하지 않는다.
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is not None:
+            return
+        handler = CompressingRotatingFileHandler(
+            path or Config.AUDIT_LOG,
+            Config.AUDIT_MAX_BYTES if max_bytes is None else max_bytes,
+            Config.AUDIT_MAX_AGE if max_age is None else max_age,
+            Config.AUDIT_BACKUPS if backups is None else backups)
+        handler.setFormatter(JSONFormatter())
+        # SimpleQueue 는 크기 제한이 없어서 put 이 기다리는 일이 없다.
+        records = queue.SimpleQueue()
+        _queue_handler = _QueueHandler(records)
+        _queue_handler.addFilter(SamplingFilter(Config.AUDIT_SAMPLE if sample is None else sample))
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        _logger.addHandler(_queue_handler)
+
+
+def stop():
+    # 큐에 남은 레코드를 모두 쓴 뒤 파일을 닫는다.
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is None:
+            return
+        _logger.removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
+
+
+def event(name, **fields):
+    _logger.info(name, extra={'audit': fields})
+
+
+def failure(name, error, **fields):
+    code = error.args[0] if getattr(error, 'args', None) else None
+    _logger.error(name, extra={'audit': dict(fields, error=str(error), code=code)})
@@ -0,0 +1,181 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from database import Query
+
+
+class CredentialCache:
+    """Bounded LRU of recently verified logins.
+
+    Passwords are never stored: an entry keeps a keyed digest of the password
+    that was accepted, so a repeat login with the same credentials is answered
+    from memory until the entry is ``ttl`` seconds old. Any mismatch falls
+    back to the database.
+    """
+
+    def __init__(self, max_entries=4096, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()  # username -> (digest, account, verified_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _digest(self, password):
+        return hashlib.blake2b(password.encode('utf-8'), key=self._key, digest_size=32).digest()
+
+    def lookup(self, username, password):
+        digest = self._digest(password)
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and time.monotonic() - entry[2] >= self.ttl:
+                del self._entries[username]
+                entry = None
+            if entry is None or not hmac.compare_digest(entry[0], digest):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return dict(entry[1])
+
+    def store(self, username, password, account):
+        digest = self._digest(password)
+        with self._lock:
+            self._entries[username] = (digest, dict(account), time.monotonic())
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class SessionStore:
+    """Bearer tokens handed out at login by the HTTP server.
+
+    A token is a random string mapped to the account that logged in, so
+    later requests act as that account without resending the password.
+    Tokens expire ``ttl`` seconds after their last use; beyond
+    ``max_sessions`` the least recently used one is dropped.
+    """
+
+    def __init__(self, max_sessions=65536, ttl=8 * 3600.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # token -> (account, last_used)
+        self._lock = threading.Lock()
+
+    def issue(self, account):
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = (dict(account), time.monotonic())
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return token
+
+    def lookup(self, token):
+        # 모르는 토큰이나 만료된 토큰이면 None
+        if not token:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            if now - entry[1] >= self.ttl:
+                del self._sessions[token]
+                return None
+            self._sessions[token] = (entry[0], now)
+            self._sessions.move_to_end(token)
+            return dict(entry[0])
+
+    def revoke(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+
+class Authorization:
+    """Which polls each logged-in user may modify, answered from memory.
+
+    Admins may change every poll, other users only the polls they created.
+    A user's poll ids are loaded with one query at login and kept current by
+    the service as polls are created and deleted. Users not seen recently are
+    evicted beyond ``max_users`` and reloaded on their next check.
+    """
+
+    def __init__(self, pool, max_users=4096):
+        self.pool = pool
+        self.max_users = max_users
+        self._owned = OrderedDict()  # account_id -> set of POLL_ID
+        self._admins = set()
+        self._lock = threading.Lock()
+
+    def load(self, account_id, is_admin):
+        with self.pool.cursor() as cursor:
+            owned = set(Query.POLL_IDS_BY_OWNER(cursor, account_id))
+        with self._lock:
+            if is_admin:
+                self._admins.add(account_id)
+            else:
+                self._admins.discard(account_id)
+            self._owned[account_id] = owned
+            self._owned.move_to_end(account_id)
+            while len(self._owned) > self.max_users:
+                evicted, _ = self._owned.popitem(last=False)
+                self._admins.discard(evicted)
+
+    def is_loaded(self, account_id):
+        with self._lock:
+            return account_id in self._owned
+
+    def can_modify(self, account_id, poll_id):
+        if account_id is None or poll_id is None:
+            return False
+        with self._lock:
+            if account_id in self._admins:
+                return True
+            owned = self._owned.get(account_id)
+            if owned is not None:
+                self._owned.move_to_end(account_id)
+                return poll_id in owned
+        # 밀려난 사용자는 한 번 다시 읽는다. (관리자 여부는 DB 에서 확인)
+        with self.pool.cursor() as cursor:
+            is_admin = Query.ACCOUNT_IS_ADMIN(cursor, account_id)
+        if is_admin is None:
+            return False
+        self.load(account_id, is_admin)
+        return self.can_modify(account_id, poll_id)
+
+    def poll_created(self, poll_id, account_id):
+        with self._lock:
+            owned = self._owned.get(account_id)
+            if owned is not None:
+                owned.add(poll_id)
+
+    def poll_deleted(self, poll_id):
+        with self._lock:
+            for owned in self._owned.values():
+                owned.discard(poll_id)
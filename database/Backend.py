@@ -0,0 +1,38 @@
+import pymysql
+
+from database import Config, SQLite
+
+# Config.BACKEND 로 저장소를 고른다.
+#   mysql   Config.DB_CONFIG 의 MySQL/MariaDB 서버 (기본값)
+#   sqlite  Config.SQLITE_PATH 의 내장 SQLite 파일, 서버 없이 실행된다.
+
+
+class MySQLBackend:
+    name = 'mysql'
+
+    def __init__(self, **connect_args):
+        self.connect_args = dict(connect_args)
+        self.connect_args.setdefault('cursorclass', pymysql.cursors.DictCursor)
+
+    def connect(self, **overrides):
+        return pymysql.connect(**{**self.connect_args, **overrides})
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+
+    def connect(self):
+        return SQLite.connect(self.path, self.timeout)
+
+
+def get_backend(name=None):
+    name = (name or Config.BACKEND).lower()
+    if name == 'mysql':
+        return MySQLBackend(**Config.DB_CONFIG)
+    if name == 'sqlite':
+        return SQLiteBackend(Config.SQLITE_PATH, Config.POOL_CONFIG['timeout'])
+    raise ValueError(f"unknown database backend '{name}' (expected mysql or sqlite)")
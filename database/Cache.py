@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+
+from database import Query
+
+CATALOG = ('POLL', 0)
+
+
+class _Entry:
+    __slots__ = ('value', 'version', 'loaded_at', 'checked_at')
+
+    def __init__(self, value, version, now):
+        self.value = value
+        self.version = version
+        self.loaded_at = now
+        self.checked_at = now
+
+
+class PollRepository:
+    """In-process cache of the poll catalog and per-poll item tallies.
+
+    Entries expire after ``ttl`` seconds and are evicted least recently used
+    beyond ``max_entries``. Once an entry is older than ``check_interval`` it is
+    revalidated against DATA_VERSION with a single primary key lookup, which
+    picks up changes made by other clients.
+    """
+
+    def __init__(self, pool, max_entries=256, ttl=60.0, check_interval=1.0):
+        self.pool = pool
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.version_checks = 0
+
+    def polls(self):
+        return self._get(CATALOG, self._load_polls)[0]
+
+    def items(self, poll_id):
+        return self._get(('ITEM', poll_id), lambda cursor: self._load_items(cursor, poll_id))[0]
+
+    def versioned_items(self, poll_id):
+        # (DATA_VERSION 기준 버전, 항목 목록)
+        value, version = self._get(('ITEM', poll_id), lambda cursor: self._load_items(cursor, poll_id))
+        return version, value
+
+    def invalidate_catalog(self):
+        self._invalidate(CATALOG)
+
+    def invalidate_items(self, poll_id):
+        self._invalidate(('ITEM', poll_id))
+
+    def invalidate_poll(self, poll_id):
+        self._invalidate(CATALOG)
+        self._invalidate(('ITEM', poll_id))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'version_checks': self.version_checks,
+            }
+
+    def _get(self, key, load):
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.loaded_at >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now - entry.checked_at < self.check_interval:
+                    self.hits += 1
+                    return entry.value, entry.version
+
+        with self.pool.cursor() as cursor:
+            # 버전을 먼저 읽고 같은 트랜잭션에서 데이터를 읽는다.
+            version = Query.ITEM_VERSION_GET(cursor, key[1]) if key[0] == 'ITEM' else Query.VERSION_GET(cursor, *key)
+            if entry is not None:
+                with self._lock:
+                    self.version_checks += 1
+                    if version == entry.version:
+                        self.hits += 1
+                        entry.checked_at = time.monotonic()
+                        return entry.value, entry.version
+                    self.stale += 1
+            value = load(cursor)
+
+        with self._lock:
+            self.misses += 1
+            # 읽는 동안 무효화가 있었다면 오래된 값을 저장하지 않는다.
+            if generation == self._generation:
+                self._entries[key] = _Entry(value, version, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value, version
+
+    def _invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    @staticmethod
+    def _load_polls(cursor):
+        return Query.POLL_SELECT_ALL(cursor)
+
+    @staticmethod
+    def _load_items(cursor, poll_id):
+        # 분산 카운터 SLOT 까지 합친 득표 수
+        return Query.ITEM_SELECT_WITH_COUNTS(cursor, poll_id)
+
+
+class ChangeFeed:
+    """Item count changes per poll for clients that keep a poll open.
+
+    A client sends the version it last saw and gets back only the items whose
+    count changed since then. Versions come from the repository, so many
+    watchers of one poll cost a single DATA_VERSION lookup per check interval.
+    The counts of the last ``history`` versions are kept per poll; a client
+    that is further behind, or whose items were added, removed or renamed,
+    gets the full item list instead.
+    """
+
+    def __init__(self, repository, history=16, max_polls=256):
+        self.repository = repository
+        self.history = history
+        self.max_polls = max_polls
+        self._polls = OrderedDict()  # poll_id -> OrderedDict(version -> (items shape, counts))
+        self._lock = threading.Lock()
+
+    def changes(self, poll_id, since=None):
+        version, items = self.repository.versioned_items(poll_id)
+        if since is not None and since == version:
+            return {'version': version, 'full': False, 'items': []}
+
+        shape = tuple((item['ITEM_ID'], item['ITEM_TEXT']) for item in items)
+        counts = {item['ITEM_ID']: item['VOTE_COUNT'] for item in items}
+        with self._lock:
+            versions = self._polls.get(poll_id)
+            if versions is None:
+                versions = self._polls[poll_id] = OrderedDict()
+                while len(self._polls) > self.max_polls:
+                    self._polls.popitem(last=False)
+            self._polls.move_to_end(poll_id)
+            if version not in versions:
+                versions[version] = (shape, counts)
+                while len(versions) > self.history:
+                    versions.popitem(last=False)
+            base = versions.get(since) if since is not None else None
+
+        if base is None or base[0] != shape:
+            return {'version': version, 'full': True, 'items': items}
+        changed = [{'ITEM_ID': item_id, 'VOTE_COUNT': count}
+                   for item_id, count in counts.items() if base[1].get(item_id) != count]
+        return {'version': version, 'full': False, 'items': changed}
+
+    def forget(self, poll_id):
+        with self._lock:
+            self._polls.pop(poll_id, None)
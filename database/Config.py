@@ -0,0 +1,44 @@
+import os
+
+# 저장소: 'mysql' 또는 서버 없이 파일 하나로 동작하는 'sqlite'
+BACKEND = os.environ.get('VOTING_DB_BACKEND', 'mysql')
+SQLITE_PATH = os.environ.get('VOTING_DB_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'voting.db'))
+
+# 접속 정보는 환경 변수로 바꿀 수 있다.
+DB_CONFIG = {
+    'host': os.environ.get('VOTING_DB_HOST', '127.0.0.1'),
+    'port': int(os.environ.get('VOTING_DB_PORT', '3306')),
+    'user': os.environ.get('VOTING_DB_USER', 'root'),
+    'password': os.environ.get('VOTING_DB_PASSWORD', 'qwer1234'),
+    'db': os.environ.get('VOTING_DB_NAME', 'voting'),
+    'charset': 'utf8mb4',
+}
+
+# 같은 서버라면 TCP 대신 유닉스 소켓으로 접속할 수 있다.
+if os.environ.get('VOTING_DB_SOCKET'):
+    DB_CONFIG['unix_socket'] = os.environ['VOTING_DB_SOCKET']
+
+POOL_CONFIG = {
+    'min_size': int(os.environ.get('VOTING_POOL_MIN', '1')),
+    'max_size': int(os.environ.get('VOTING_POOL_MAX', '10')),
+    'timeout': float(os.environ.get('VOTING_POOL_TIMEOUT', '5')),
+    'ping_interval': float(os.environ.get('VOTING_POOL_PING_INTERVAL', '1')),
+}
+
+# 감사 로그 (database/Audit.py). 크기나 나이 중 먼저 넘는 쪽에서 회전하고 gzip 으로 압축한다.
+AUDIT_LOG = os.environ.get('VOTING_AUDIT_LOG', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'audit.log'))
+AUDIT_MAX_BYTES = int(os.environ.get('VOTING_AUDIT_MAX_BYTES', str(10 * 1024 * 1024)))
+AUDIT_MAX_AGE = float(os.environ.get('VOTING_AUDIT_MAX_AGE', str(24 * 3600)))
+AUDIT_BACKUPS = int(os.environ.get('VOTING_AUDIT_BACKUPS', '14'))
+# 이벤트별로 남길 비율, 예: VOTING_AUDIT_SAMPLE="vote=0.1,login=0.5" (없는 이벤트는 모두 남긴다)
+AUDIT_SAMPLE = {
+    name.strip(): float(rate)
+    for name, _, rate in (pair.partition('=') for pair in os.environ.get('VOTING_AUDIT_SAMPLE', '').split(',') if pair.strip())
+}
+
+# 문장별 지연 시간 측정 (database/Metrics.py). 0 이면 연결을 감싸지 않는다.
+QUERY_METRICS = os.environ.get('VOTING_QUERY_METRICS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('VOTING_SLOW_QUERY_MS', '100'))
+# 지정하면 METRICS_INTERVAL 초마다 Prometheus 텍스트 파일로 내보낸다.
+METRICS_FILE = os.environ.get('VOTING_METRICS_FILE')
+METRICS_INTERVAL = float(os.environ.get('VOTING_METRICS_INTERVAL', '15'))
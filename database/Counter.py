@@ -0,0 +1,105 @@
+import argparse
+import threading
+
+from database import Pool, Query
+
+# 투표별로 켜는 분산 카운터. POLL.COUNTER_SHARDS 가 N (>0) 이면 표를 ITEM 행 대신
+# ITEM_COUNTER_SHARD 의 SLOT N 개 중 하나에 더하고, 읽을 때는 합쳐서 읽는다.
+#   python -m database.Counter --enable 3 --shards 16
+#   python -m database.Counter --disable 3
+#   python -m database.Counter --compact          SLOT 값을 ITEM.VOTE_COUNT 로 합친다
+
+MAX_SHARDS = 1024
+
+
+def fold(cursor, poll_id):
+    # SLOT 행을 잠그고 그 값을 ITEM 에 더한 만큼 SLOT 에서 뺀다. 보이는 합은 바뀌지 않는다.
+    rows = Query.COUNTER_SHARD_SELECT_PENDING(cursor, poll_id)
+    if not rows:
+        return 0
+    totals = {}
+    for row in rows:
+        totals[row['ITEM_ID']] = totals.get(row['ITEM_ID'], 0) + row['VOTE_COUNT']
+    for item_id, total in totals.items():
+        Query.ITEM_VOTE_ADD(cursor, poll_id, item_id, total)
+    Query.COUNTER_SHARD_SUBTRACT_BULK(cursor, poll_id, [(row['ITEM_ID'], row['SLOT'], row['VOTE_COUNT']) for row in rows])
+    return sum(totals.values())
+
+
+def pending_polls(cursor):
+    return Query.COUNTER_SHARD_PENDING_POLLS(cursor)
+
+
+def compact(pool=None):
+    pool = pool or Pool.get_pool()
+    with pool.cursor() as cursor:
+        poll_ids = pending_polls(cursor)
+    folded = 0
+    # 투표마다 짧은 트랜잭션으로 나눠서 투표 쓰기를 오래 막지 않는다.
+    for poll_id in poll_ids:
+        with pool.cursor() as cursor:
+            folded += fold(cursor, poll_id)
+    return folded
+
+
+def set_shards(cursor, poll_id, shards):
+    if not 0 <= shards <= MAX_SHARDS:
+        raise ValueError(f"shards must be between 0 and {MAX_SHARDS}")
+    Query.POLL_SET_COUNTER_SHARDS(cursor, poll_id, shards)
+    if shards == 0:
+        # 끄면 남은 SLOT 값을 바로 합친다.
+        fold(cursor, poll_id)
+    Query.VERSION_BUMP(cursor, 'POLL')
+
+
+class ShardCompactor:
+    """Background thread that folds shard rows back into ITEM.VOTE_COUNT."""
+
+    def __init__(self, pool, interval=5.0):
+        self.pool = pool
+        self.interval = interval
+        self.runs = 0
+        self.folded = 0
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='ShardCompactor', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.folded += compact(self.pool)
+                self.runs += 1
+            except Exception as e:
+                print(f"Database error: {e}")
+
+    def close(self):
+        self._stop.set()
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage sharded vote counters')
+    parser.add_argument('--enable', type=int, metavar='POLL_ID', help='spread the votes of this poll over --shards slots')
+    parser.add_argument('--shards', type=int, default=16)
+    parser.add_argument('--disable', type=int, metavar='POLL_ID', help='write this poll to ITEM.VOTE_COUNT again')
+    parser.add_argument('--compact', action='store_true', help='fold every shard back into ITEM.VOTE_COUNT')
+    args = parser.parse_args()
+
+    pool = Pool.get_pool()
+    try:
+        if args.enable is not None:
+            with pool.cursor() as cursor:
+                set_shards(cursor, args.enable, args.shards)
+            print(f"Poll {args.enable} uses {args.shards} counter shards")
+        if args.disable is not None:
+            with pool.cursor() as cursor:
+                set_shards(cursor, args.disable, 0)
+            print(f"Poll {args.disable} no longer uses counter shards")
+        if args.compact:
+            print(f"Folded {compact(pool)} votes")
+    finally:
+        Pool.close_pool()
+
+
+if __name__ == '__main__':
+    main()
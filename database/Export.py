@@ -0,0 +1,154 @@
+import argparse
+import csv
+import json
+import sys
+import time
+
+import pymysql
+
+from database import Pool, Query
+
+# 득표 결과와 투표 기록을 파일로 내보낸다. 결과 집합을 한 번에 읽지 않고 서버 쪽 커서(SSCursor)로
+# CHUNK_ROWS 행씩 읽어서 바로 쓰므로 행 수와 상관없이 메모리 사용량이 일정하다.
+#   python -m database.Export results --format csv --output results.csv
+#   python -m database.Export ballots --format jsonl --output ballots.jsonl --poll 3
+#   python -m database.Export events --format parquet --output events.parquet     (pyarrow 필요)
+
+CHUNK_ROWS = 50000
+WRITE_BUFFER = 1024 * 1024
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+# 이름: (열 목록 [(이름, 형식)], 전체 조회, 투표 하나 조회) - SQL 은 database/Query.py 에 있다.
+DATASETS = {
+    'results': (
+        [('POLL_ID', 'int'), ('QUESTION', 'str'), ('ITEM_ID', 'int'), ('ITEM_TEXT', 'str'), ('VOTE_COUNT', 'int')],
+        Query.RESULTS_EXPORT_STREAM,
+        Query.RESULTS_POLL_FILTER,
+    ),
+    'ballots': (
+        [('VOTE_ID', 'int'), ('POLL_ID', 'int'), ('USER_ID', 'int')],
+        Query.BALLOTS_EXPORT_STREAM,
+        Query.POLL_FILTER,
+    ),
+    'events': (
+        [('EVENT_ID', 'int'), ('POLL_ID', 'int'), ('ITEM_ID', 'int'), ('USER_ID', 'int'), ('CREATED_AT', 'datetime')],
+        Query.EVENTS_EXPORT_STREAM,
+        Query.POLL_FILTER,
+    ),
+}
+
+
+class CSVWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JSONLinesWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER)
+        self.names = [name for name, _ in columns]
+
+    def write(self, rows):
+        encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+        names = self.names
+        self.file.write(''.join(encode(dict(zip(names, row))) + '\n' for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes each chunk as one Parquet row group with a fixed schema."""
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("the parquet format requires pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        types = {'int': pyarrow.int64(), 'str': pyarrow.string(), 'datetime': pyarrow.timestamp('s')}
+        self.schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        # 행 단위 chunk 를 열 단위로 뒤집는다.
+        arrays = [self.pa.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'csv': CSVWriter, 'jsonl': JSONLinesWriter, 'parquet': ParquetWriter}
+
+
+def stream(connection, query, args=None, chunk_rows=CHUNK_ROWS):
+    # 서버 쪽 커서는 결과를 끝까지 읽거나 닫기 전까지 같은 연결에서 다른 쿼리를 실행할 수 없다.
+    cursor = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(query, args)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def export(dataset, fmt, path, poll_id=None, pool=None, chunk_rows=CHUNK_ROWS):
+    # 내보낸 행 수를 돌려준다.
+    columns, query, poll_filter = DATASETS[dataset]
+    query = query.format(where=poll_filter if poll_id is not None else '')
+    args = (poll_id,) if poll_id is not None else None
+
+    pool = pool or Pool.get_pool()
+    writer = WRITERS[fmt](path, columns)
+    exported = 0
+    try:
+        with pool.connection() as connection:
+            for rows in stream(connection, query, args, chunk_rows):
+                writer.write(rows)
+                exported += len(rows)
+            connection.commit()
+    finally:
+        writer.close()
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export poll results and votes without loading them into memory')
+    parser.add_argument('dataset', choices=list(DATASETS))
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--poll', type=int, help='export only this poll')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    pool = Pool.get_pool()
+    started = time.perf_counter()
+    try:
+        exported = export(args.dataset, args.format, args.output, args.poll, pool, args.chunk_rows)
+    except pymysql.MySQLError as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        Pool.close_pool()
+    elapsed = time.perf_counter() - started
+    print(f"Exported {exported:,} {args.dataset} rows to {args.output} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from database import Audit, Config
+
+# 실행된 SQL 마다 지연 시간과 돌려준 행 수를 문장별 히스토그램에 모은다.
+# 풀이 만든 연결을 InstrumentedConnection 으로 감싸므로 Query.py 와 창 코드는 그대로다.
+# SLOW_QUERY_MS 를 넘는 문장은 감사 로그에 slow_query 로 남기고, 모은 값은 Prometheus 텍스트 형식으로 내보낸다.
+#   VOTING_METRICS_FILE=/var/lib/node_exporter/voting.prom python VoteServer.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 호출 위치를 찾을 때 건너뛰는 SQL 도우미 모듈. Query 함수가 아니라 그것을 부른 코드가 호출 위치다.
+HELPERS = frozenset(os.path.join(ROOT, 'database', name) for name in ('Query.py', 'Metrics.py'))
+# 초 단위 지연 시간 / 행 수 버킷 (마지막 버킷은 +Inf)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+SLOW_HISTORY = 100
+NORMALIZED_CACHE = 4096
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ROWS = re.compile(r'(\(\?(?:, \.\.\.)?\))(?:\s*,\s*\(\?(?:, \.\.\.)?\))+')
+
+
+def normalize(sql):
+    # 값과 자리 표시자를 ? 로, 길이가 달라지는 목록(IN, 여러 행 VALUES)을 하나로 접는다.
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(?, ...)', sql)
+    sql = _ROWS.sub(r'\1, ...', sql)
+    return ' '.join(sql.split())
+
+
+class Statement:
+    """Counters and histograms of one normalized statement."""
+
+    __slots__ = ('sql', 'calls', 'errors', 'seconds', 'max_seconds', 'rows', 'latency', 'row_counts', 'sites')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.row_counts = [0] * (len(ROW_BUCKETS) + 1)
+        self.sites = {}
+
+    def add(self, other):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.seconds += other.seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+        self.rows += other.rows
+        self.latency = [a + b for a, b in zip(self.latency, other.latency)]
+        self.row_counts = [a + b for a, b in zip(self.row_counts, other.row_counts)]
+        for site, calls in list(other.sites.items()):
+            self.sites[site] = self.sites.get(site, 0) + calls
+
+    def quantile(self, q):
+        # 히스토그램으로 추정한 분위수. Prometheus 의 histogram_quantile 처럼 버킷 안에서 선형 보간한다.
+        if not self.calls:
+            return 0.0
+        target = q * self.calls
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(LATENCY_BUCKETS, self.latency):
+            if count and seen + count >= target:
+                return min(lower + (bound - lower) * (target - seen) / count, self.max_seconds)
+            seen += count
+            lower = bound
+        return self.max_seconds
+
+    def summary(self):
+        return {
+            'sql': self.sql,
+            'calls': self.calls,
+            'errors': self.errors,
+            'seconds': self.seconds,
+            'mean_ms': self.seconds / self.calls * 1000 if self.calls else 0.0,
+            'p50_ms': self.quantile(0.5) * 1000,
+            'p95_ms': self.quantile(0.95) * 1000,
+            'p99_ms': self.quantile(0.99) * 1000,
+            'max_ms': self.max_seconds * 1000,
+            'rows': self.rows,
+            'sites': sorted(self.sites.items(), key=lambda site: -site[1]),
+        }
+
+
+class Registry:
+    """Per-statement latency and row histograms shared by every connection.
+
+    Each thread records into its own shard without taking a lock; readers
+    (snapshot, prometheus) merge the shards. Only slow queries, which are
+    rare, go through the shared lock.
+    """
+
+    def __init__(self, slow_ms=None):
+        self.slow_seconds = (Config.SLOW_QUERY_MS if slow_ms is None else slow_ms) / 1000
+        self.started = time.time()
+        self.slow = deque(maxlen=SLOW_HISTORY)
+        self.slow_total = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        # 원문 SQL -> 정규화한 SQL. 같은 문자열 상수로 반복 실행되므로 정규화는 처음 한 번만 한다.
+        self._normalized = {}
+        self._sites = {}
+        self._helpers = {}
+
+    def _shard(self):
+        shard = self._local.statements = {}
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def _key(self, sql):
+        key = self._normalized.get(sql)
+        if key is None:
+            if len(self._normalized) >= NORMALIZED_CACHE:
+                self._normalized.clear()
+            key = self._normalized[sql] = normalize(sql)
+        return key
+
+    def _helper(self, code):
+        helper = self._helpers.get(code.co_filename)
+        if helper is None:
+            helper = self._helpers[code.co_filename] = os.path.abspath(code.co_filename) in HELPERS
+        return helper
+
+    def site(self, frame):
+        # Query.py 의 도우미 함수를 지나 그것을 부른 프레임까지 올라간다.
+        while frame.f_back is not None and self._helper(frame.f_code):
+            frame = frame.f_back
+        # 코드 객체의 hash 와 f_lineno 는 계산이 비싸므로 id 와 명령어 위치로 찾는다.
+        # (모듈 함수의 코드 객체는 프로세스가 끝날 때까지 남는다)
+        key = (id(frame.f_code), frame.f_lasti)
+        site = self._sites.get(key)
+        if site is None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(ROOT):
+                filename = os.path.relpath(filename, ROOT)
+            site = self._sites[key] = f"{filename}:{frame.f_lineno} {frame.f_code.co_name}"
+        return site
+
+    def record(self, sql, site, seconds, rows, failed=False):
+        try:
+            shard = self._local.statements
+        except AttributeError:
+            shard = self._shard()
+        key = self._key(sql)
+        statement = shard.get(key)
+        if statement is None:
+            statement = shard[key] = Statement(key)
+        statement.calls += 1
+        statement.seconds += seconds
+        if seconds > statement.max_seconds:
+            statement.max_seconds = seconds
+        statement.latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        statement.sites[site] = statement.sites.get(site, 0) + 1
+        if failed:
+            statement.errors += 1
+        else:
+            statement.rows += rows
+            statement.row_counts[bisect_left(ROW_BUCKETS, rows)] += 1
+        if seconds >= self.slow_seconds:
+            with self._lock:
+                self.slow_total += 1
+                self.slow.append({'time': time.time(), 'sql': key, 'site': site, 'ms': seconds * 1000, 'rows': rows})
+            # 파라미터는 남기지 않는다. (비밀번호가 들어 있을 수 있다)
+            Audit.event('slow_query', sql=key, site=site, ms=round(seconds * 1000, 3), rows=rows, failed=failed)
+
+    def statements(self):
+        # 스레드별 값을 합친 사본. 쓰는 중인 스레드가 있어도 dict 를 통째로 복사하므로 안전하다.
+        with self._lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            for statement in list(shard.values()):
+                total = merged.get(statement.sql)
+                if total is None:
+                    total = merged[statement.sql] = Statement(statement.sql)
+                total.add(statement)
+        return list(merged.values())
+
+    def snapshot(self):
+        statements = [statement.summary() for statement in self.statements()]
+        statements.sort(key=lambda statement: -statement['seconds'])
+        with self._lock:
+            slow = list(self.slow)
+        return {'since': self.started, 'statements': statements, 'slow': slow, 'slow_total': self.slow_total,
+                'slow_ms': self.slow_seconds * 1000}
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+            self.slow.clear()
+            self.slow_total = 0
+            self.started = time.time()
+
+    def prometheus(self, pool_stats=None):
+        statements = self.statements()
+        lines = [
+            '# HELP voting_query_duration_seconds Statement latency, including fetching the rows.',
+            '# TYPE voting_query_duration_seconds histogram',
+        ]
+        for statement in statements:
+            lines.extend(_histogram('voting_query_duration_seconds', statement.sql, LATENCY_BUCKETS, statement.latency,
+                                    statement.seconds, statement.calls))
+        lines += [
+            '# HELP voting_query_rows Rows returned (SELECT) or affected (other statements) per call.',
+            '# TYPE voting_query_rows histogram',
+        ]
+        for statement in statements:
+            lines.extend(_histogram('voting_query_rows', statement.sql, ROW_BUCKETS, statement.row_counts,
+                                    statement.rows, sum(statement.row_counts)))
+        lines += [
+            '# HELP voting_query_errors_total Statements that raised a database error.',
+            '# TYPE voting_query_errors_total counter',
+        ]
+        lines.extend(f'voting_query_errors_total{{statement="{_label(statement.sql)}"}} {statement.errors}'
+                     for statement in statements)
+        lines += [
+            '# HELP voting_query_calls_total Executions per statement and call site.',
+            '# TYPE voting_query_calls_total counter',
+        ]
+        for statement in statements:
+            lines.extend(f'voting_query_calls_total{{statement="{_label(statement.sql)}",site="{_label(site)}"}} {count}'
+                         for site, count in statement.sites.items())
+        lines += [
+            '# HELP voting_slow_queries_total Statements slower than the slow query threshold.',
+            '# TYPE voting_slow_queries_total counter',
+            f'voting_slow_queries_total {self.slow_total}',
+        ]
+        for name, value in (pool_stats or {}).items():
+            lines += [f'# TYPE voting_pool_{name} gauge', f'voting_pool_{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, pool_stats=None):
+        # node_exporter textfile collector 가 반쯤 쓴 파일을 읽지 않도록 바꿔치기한다.
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus(pool_stats))
+        os.replace(temporary, path)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram(name, sql, bounds, counts, total, calls):
+    label = _label(sql)
+    cumulative = 0
+    for bound, count in zip(bounds, counts):
+        cumulative += count
+        yield f'{name}_bucket{{statement="{label}",le="{bound}"}} {cumulative}'
+    yield f'{name}_bucket{{statement="{label}",le="+Inf"}} {calls}'
+    yield f'{name}_sum{{statement="{label}"}} {total}'
+    yield f'{name}_count{{statement="{label}"}} {calls}'
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that times each statement until its rows are read.
+
+    A statement is recorded when the next one starts or the cursor closes,
+    so the latency includes fetching (server-side cursors return from
+    execute before any row is read) and ``rows`` is what the caller fetched.
+    """
+
+    def __init__(self, cursor, registry):
+        self._cursor = cursor
+        self._registry = registry
+        self._pending = None  # [sql, site, seconds, rows]
+
+    def _flush(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            self._registry.record(*pending)
+
+    def execute(self, query, args=None):
+        self._flush()
+        site = self._registry.site(sys._getframe(1))
+        started = time.perf_counter()
+        try:
+            result = self._cursor.execute(query, args)
+        except Exception:
+            self._registry.record(query, site, time.perf_counter() - started, 0, failed=True)
+            raise
+        elapsed = time.perf_counter() - started
+        # SELECT 는 읽어 간 행 수를, 나머지는 바뀐 행 수를 센다.
+        self._pending = [query, site, elapsed, 0 if self._cursor.description else max(self._cursor.rowcount, 0)]
+        return result
+
+    def executemany(self, query, args):
+        self._flush()
+        site = self._registry.site(sys._getframe(1))
+        started = time.perf_counter()
+        try:
+            result = self._cursor.executemany(query, args)
+        except Exception:
+            self._registry.record(query, site, time.perf_counter() - started, 0, failed=True)
+            raise
+        self._registry.record(query, site, time.perf_counter() - started, max(self._cursor.rowcount, 0))
+        return result
+
+    def _fetched(self, started, rows):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - started
+            pending[3] += rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def close(self):
+        self._flush()
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    def __init__(self, connection, registry):
+        self._connection = connection
+        self._registry = registry
+
+    def cursor(self, cursor=None):
+        raw = self._connection.cursor(cursor) if cursor is not None else self._connection.cursor()
+        return InstrumentedCursor(raw, self._registry)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class Exporter:
+    """Background thread that rewrites the Prometheus text file every ``interval`` seconds."""
+
+    def __init__(self, registry, path, interval=15.0, pool=None):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.pool = pool
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='MetricsExporter', daemon=True)
+        self.thread.start()
+
+    def export(self):
+        try:
+            self.registry.write(self.path, self.pool.stats() if self.pool else None)
+        except OSError as e:
+            print(f"Metrics export error: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def close(self):
+        self._stop.set()
+        self.thread.join()
+        # 종료 직전 값까지 남긴다.
+        self.export()
+
+
+def format_report(snapshot, top=20):
+    since = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot['since']))
+    statements = snapshot['statements']
+    lines = [f"{sum(s['calls'] for s in statements):,} statements since {since}, "
+             f"{snapshot['slow_total']:,} slower than {snapshot['slow_ms']:g} ms", '',
+             f"{'total':>9} {'calls':>9} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'rows':>9} (ms)"]
+    for statement in statements[:top]:
+        lines.append(f"{statement['seconds'] * 1000:9.1f} {statement['calls']:9,} {statement['mean_ms']:8.2f} "
+                     f"{statement['p50_ms']:8.2f} {statement['p95_ms']:8.2f} {statement['p99_ms']:8.2f} "
+                     f"{statement['max_ms']:8.2f} {statement['rows']:9,}")
+        lines.append(f"    {statement['sql']}")
+        for site, calls in statement['sites'][:3]:
+            lines.append(f"      {calls:>9,}  {site}")
+        if statement['errors']:
+            lines.append(f"      {statement['errors']:>9,}  errors")
+    if snapshot['slow']:
+        lines += ['', 'Recent slow queries']
+        for entry in reversed(snapshot['slow']):
+            stamp = time.strftime('%H:%M:%S', time.localtime(entry['time']))
+            lines.append(f"  {stamp} {entry['ms']:9.2f} ms {entry['rows']:>8,} rows  {entry['site']}")
+            lines.append(f"    {entry['sql']}")
+    return '\n'.join(lines)
+
+
+registry = Registry()
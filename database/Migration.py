@@ -0,0 +1,182 @@
+import argparse
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+
+import pymysql
+
+from database import Pool, Query, migrations
+
+LOCK_NAME = 'voting_schema_migration'
+LOCK_TIMEOUT = 60
+ER_NO_SUCH_TABLE = 1146
+
+# 마이그레이션 스크립트는 database/migrations/v<번호>_<이름>.py 이고
+# upgrade(cursor) 함수를 가진다. 번호 순서대로 한 번씩만 실행된다.
+
+
+def discover():
+    found = []
+    for module in pkgutil.iter_modules(migrations.__path__):
+        match = re.match(r'^v(\d+)_(\w+)$', module.name)
+        if match:
+            found.append((int(match.group(1)), match.group(2), f"{migrations.__name__}.{module.name}"))
+    found.sort()
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"duplicate migration versions in {migrations.__name__}")
+    return found
+
+
+def latest_version():
+    found = discover()
+    return found[-1][0] if found else 0
+
+
+def current_version(cursor):
+    try:
+        cursor.execute("SELECT MAX(VERSION) AS VERSION FROM SCHEMA_VERSION")
+    except pymysql.err.ProgrammingError as e:
+        if e.args[0] == ER_NO_SUCH_TABLE:
+            return 0
+        raise
+    row = cursor.fetchone()
+    return row['VERSION'] or 0
+
+
+def migrate(pool=None, target=None):
+    pool = pool or Pool.get_pool()
+    target = latest_version() if target is None else target
+
+    # 빠른 경로: 이미 최신이면 쿼리 한 번으로 끝난다.
+    with pool.cursor() as cursor:
+        if current_version(cursor) >= target:
+            return []
+
+    applied = []
+    with pool.connection() as connection:
+        with connection.cursor() as cursor:
+            sqlite = Query.dialect(cursor) == 'sqlite'
+            # 여러 클라이언트가 동시에 시작해도 한 곳에서만 마이그레이션을 실행한다.
+            # SQLite 는 DDL 도 트랜잭션에 묶이므로 쓰기 잠금을 잡은 트랜잭션 하나로 전부 적용한다.
+            if sqlite:
+                cursor.execute("BEGIN IMMEDIATE")
+            else:
+                cursor.execute("SELECT GET_LOCK(%s, %s) AS LOCKED", (LOCK_NAME, LOCK_TIMEOUT))
+                if cursor.fetchone()['LOCKED'] != 1:
+                    raise pymysql.err.OperationalError(f"could not acquire the {LOCK_NAME} lock")
+            try:
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS SCHEMA_VERSION (
+                    VERSION int(11) NOT NULL,
+                    NAME varchar(100) NOT NULL,
+                    APPLIED_AT datetime NOT NULL,
+                    PRIMARY KEY (VERSION)
+                )
+                ''')
+                version = current_version(cursor)
+                for number, name, module_name in discover():
+                    if number <= version or number > target:
+                        continue
+                    print(f"Applying schema migration {number}: {name}")
+                    importlib.import_module(module_name).upgrade(cursor)
+                    cursor.execute(
+                        "INSERT INTO SCHEMA_VERSION (VERSION, NAME, APPLIED_AT) VALUES (%s, %s, %s)",
+                        (number, name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+                    # DDL 은 암묵적으로 commit 되므로 버전 기록도 하나씩 commit 한다.
+                    if not sqlite:
+                        connection.commit()
+                    applied.append(number)
+                if sqlite:
+                    connection.commit()
+            finally:
+                if not sqlite:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    return applied
+
+
+def has_column(cursor, table, column):
+    if Query.dialect(cursor) == 'sqlite':
+        return column_type(cursor, table, column) is not None
+    cursor.execute(
+        "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column))
+    return cursor.fetchone() is not None
+
+
+def column_type(cursor, table, column):
+    if Query.dialect(cursor) == 'sqlite':
+        cursor.execute(f"PRAGMA table_info({table})")
+        for row in cursor.fetchall():
+            if row['name'].upper() == column.upper():
+                # 'varchar(20)' -> 'varchar' (information_schema 의 DATA_TYPE 과 같은 형식)
+                return row['type'].split('(')[0].strip().lower()
+        return None
+    cursor.execute(
+        "SELECT DATA_TYPE FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column))
+    row = cursor.fetchone()
+    return row['DATA_TYPE'].lower() if row else None
+
+
+def has_index(cursor, table, name):
+    if Query.dialect(cursor) == 'sqlite':
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s", (table, name))
+        return cursor.fetchone() is not None
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, name))
+    return cursor.fetchone() is not None
+
+
+def add_column(cursor, table, column, definition):
+    if not has_column(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def add_index(cursor, table, name, columns, unique=False):
+    # InnoDB online DDL: 인덱스를 만드는 동안에도 읽기/쓰기를 막지 않는다.
+    # 온라인으로 만들 수 없는 서버에서는 기본 방식으로 다시 시도한다.
+    if has_index(cursor, table, name):
+        return
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    if Query.dialect(cursor) == 'sqlite':
+        cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+        return
+    statement = f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)})"
+    try:
+        cursor.execute(statement + ", ALGORITHM=INPLACE, LOCK=NONE")
+    except pymysql.err.OperationalError:
+        cursor.execute(statement)
+
+
+def drop_index(cursor, table, name):
+    if not has_index(cursor, table, name):
+        return
+    if Query.dialect(cursor) == 'sqlite':
+        cursor.execute(f"DROP INDEX {name}")
+    else:
+        cursor.execute(f"ALTER TABLE {table} DROP INDEX {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply voting system schema migrations')
+    parser.add_argument('--status', action='store_true', help='only show the current and latest schema version')
+    parser.add_argument('--target', type=int, help='migrate up to this version')
+    args = parser.parse_args()
+
+    pool = Pool.get_pool()
+    try:
+        if args.status:
+            with pool.cursor() as cursor:
+                print(f"schema version {current_version(cursor)}, latest {latest_version()}")
+            return
+        applied = migrate(pool, args.target)
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    finally:
+        Pool.close_pool()
+
+
+if __name__ == '__main__':
+    main()
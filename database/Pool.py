@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+
+from database import Audit, Backend, Config, Metrics
+
+
+class PoolTimeout(pymysql.err.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections shared by every window.
+
+    Connections come from ``backend`` (see database.Backend); without one the
+    keyword arguments are passed to pymysql.connect. With a ``metrics``
+    registry every statement run on a pooled connection is timed (see
+    database.Metrics).
+    """
+
+    def __init__(self, min_size=1, max_size=10, timeout=5.0, ping_interval=1.0, backend=None, metrics=None,
+                 **connect_args):
+        if min_size > max_size:
+            raise ValueError("min_size must not be larger than max_size")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.backend = backend or Backend.MySQLBackend(**connect_args)
+        self.metrics = metrics
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, last_used)
+        self._size = 0
+        self._closed = False
+
+        # metrics
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.reconnects = 0
+
+        for _ in range(min_size):
+            self._idle.append((self._open(), time.monotonic()))
+            self._size += 1
+
+    def _open(self):
+        connection = self.backend.connect()
+        if self.metrics is not None:
+            connection = Metrics.InstrumentedConnection(connection, self.metrics)
+        return connection
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if self._closed:
+                raise pymysql.err.InterfaceError("connection pool is closed")
+            self.checkouts += 1
+            if not self._idle and self._size >= self.max_size:
+                self.waits += 1
+                started = time.monotonic()
+                deadline = started + timeout
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed:
+                        self.wait_time += time.monotonic() - started
+                        self.timeouts += 1
+                        raise PoolTimeout(f"no connection available within {timeout}s")
+                    self._lock.wait(remaining)
+                self.wait_time += time.monotonic() - started
+            if self._idle:
+                connection, last_used = self._idle.pop()
+            else:
+                connection, last_used = None, None
+                self._size += 1
+
+        try:
+            if connection is None:
+                connection = self._open()
+            elif time.monotonic() - last_used >= self.ping_interval:
+                self._check(connection)
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        return connection
+
+    def _check(self, connection):
+        # ping 이 실패하면 같은 연결 객체로 다시 접속한다.
+        try:
+            connection.ping(reconnect=False)
+        except pymysql.MySQLError:
+            self.reconnects += 1
+            connection.ping(reconnect=True)
+
+    def release(self, connection):
+        try:
+            # 다음 사용자가 이전 트랜잭션의 스냅샷을 보지 않도록 정리한다.
+            connection.rollback()
+            healthy = True
+        except pymysql.MySQLError:
+            healthy = False
+        with self._lock:
+            if healthy and not self._closed:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._size -= 1
+                try:
+                    connection.close()
+                except pymysql.MySQLError:
+                    pass
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        try:
+            connection = self.acquire(timeout)
+        except pymysql.MySQLError as e:
+            Audit.failure('db_error', e)
+            raise
+        try:
+            yield connection
+        except pymysql.MySQLError as e:
+            Audit.failure('db_error', e)
+            raise
+        finally:
+            self.release(connection)
+
+    @contextmanager
+    def cursor(self, timeout=None):
+        # 블록이 정상적으로 끝나면 commit, 예외가 나면 rollback 한다.
+        with self.connection(timeout) as connection:
+            with connection.cursor() as cursor:
+                try:
+                    yield cursor
+                except BaseException:
+                    connection.rollback()
+                    raise
+                connection.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'timeouts': self.timeouts,
+                'reconnects': self.reconnects,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._size -= 1
+                try:
+                    connection.close()
+                except pymysql.MySQLError:
+                    pass
+            self._lock.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            metrics = Metrics.registry if Config.QUERY_METRICS else None
+            _pool = ConnectionPool(backend=Backend.get_backend(), metrics=metrics, **Config.POOL_CONFIG)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
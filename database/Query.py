@@ -1,53 +1,156 @@
 import pymysql
 
+from database import Pool
+
+# 앱이 실행하는 SQL 은 모두 이 모듈에 둔다.
+# 문장은 호출마다 같은 문자열이어야 연결별 문장 캐시(SQLite)와 Metrics 의 정규화 캐시를 다시 쓴다.
+# 그래서 값은 항상 %s 로 넘기고, 조회할 컬럼은 * 대신 이름으로 적는다.
+
+# POLL 행 전체. (list_polls 와 /polls 가 돌려주는 모양)
+POLL_COLUMNS = "POLL_ID, START_DATE, END_DATE, ITEMCOUNT, QUESTION, POLLTOTAL, REGDATE, CREATED_BY, COUNTER_SHARDS, POLL_TYPE, SEATS"
+ITEM_COUNT_UPDATE = "UPDATE POLL SET ITEMCOUNT = (SELECT COUNT(*) FROM ITEM WHERE POLL_ID = %s) WHERE POLL_ID = %s"
+# 지금 투표할 수 있는 투표. 두 %s 모두 현재 시각이다. (POLL_PAGE, POLL_SELECT_ACTIVE)
+POLL_ACTIVE = "END_DATE > %s AND START_DATE <= %s"
+# 투표 상태별 조건. 모든 %s 는 현재 시각이고, 한 투표는 셋 중 하나에만 속한다.
+POLL_STATUS = {
+    'active': POLL_ACTIVE,
+    'upcoming': "END_DATE > %s AND START_DATE > %s",
+    'closed': "(END_DATE <= %s OR END_DATE IS NULL)",
+}
+
+
+def transaction():
+    # 공용 커넥션 풀에서 커서를 빌려 오고, 블록이 끝나면 commit 한다.
+    return Pool.get_pool().cursor()
+
+def dialect(cursor):
+    # 'mysql' 또는 'sqlite' (database/SQLite.py 의 연결은 dialect 속성을 가진다)
+    return getattr(cursor.connection, 'dialect', 'mysql')
+
 def POLL_CREATE(cursor):
     # query1 = "DROP TABLE IF EXISTS ITEM;"
     # cursor.execute(query1)
-    query2 = "DROP TABLE IF EXISTS POLL;"
-    cursor.execute(query2)
+    # query2 = "DROP TABLE IF EXISTS POLL;"
+    # cursor.execute(query2)
     query = '''
-    CREATE TABLE POLL (
+    CREATE TABLE IF NOT EXISTS POLL (
         POLL_ID int(11) NOT NULL AUTO_INCREMENT,
-        START_DATE varchar(50) NOT NULL,
-        END_DATE varchar(50),
+        START_DATE datetime NOT NULL,
+        END_DATE datetime,
         ITEMCOUNT int(11) NOT NULL DEFAULT 0,
         QUESTION varchar(30),
         POLLTOTAL int(11) NOT NULL DEFAULT 0,
-        REGDATE varchar(50),
-        PRIMARY KEY(POLL_ID)
+        REGDATE datetime,
+        CREATED_BY int(11),
+        PRIMARY KEY(POLL_ID),
+        FOREIGN KEY (CREATED_BY) REFERENCES ACCOUNT(ACCOUNT_ID)
     ) AUTO_INCREMENT=1
     '''
-    cursor.execute(query)
+    _create(cursor, 'POLL', query)
+
+def POLL_INSERT(cursor, START_DATE, END_DATE, QUESTION, ITEMCOUNT, POLLTOTAL, REGDATE, CREATED_BY=None):
+    # 새 POLL_ID 를 돌려준다.
+    query = "INSERT INTO POLL (START_DATE, END_DATE, QUESTION, ITEMCOUNT, POLLTOTAL, REGDATE, CREATED_BY) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    cursor.execute(query, (START_DATE, END_DATE, QUESTION, ITEMCOUNT, POLLTOTAL, REGDATE, CREATED_BY))
+    return cursor.lastrowid
+
+def POLL_SELECT_ALL(cursor):
+    cursor.execute(f"SELECT {POLL_COLUMNS} FROM POLL")
+    return cursor.fetchall()
+
+def POLL_IDS(cursor):
+    cursor.execute("SELECT POLL_ID FROM POLL ORDER BY POLL_ID")
+    return [_scalar(row, 'POLL_ID') for row in cursor.fetchall()]
+
+def POLL_QUESTIONS(cursor):
+    cursor.execute("SELECT POLL_ID, QUESTION FROM POLL ORDER BY POLL_ID")
+    return cursor.fetchall()
+
+def POLL_SELECT_BY_ID(cursor, poll_id):
+    cursor.execute(f"SELECT {POLL_COLUMNS} FROM POLL WHERE POLL_ID = %s", (poll_id,))
+    return cursor.fetchone()
+
+def POLL_SELECT_BY_QUESTION(cursor, question):
+    cursor.execute(f"SELECT {POLL_COLUMNS} FROM POLL WHERE QUESTION = %s", (question,))
+    return cursor.fetchone()
+
+def POLL_SELECT_TYPE(cursor, poll_id):
+    # POLL_TYPE, SEATS 만 읽는다. 없는 투표면 None
+    cursor.execute("SELECT POLL_TYPE, SEATS FROM POLL WHERE POLL_ID = %s", (poll_id,))
+    return cursor.fetchone()
 
-def POLL_INSERT(cursor, START_DATE, END_DATE, QUESTION, ITEMCOUNT, POLLTOTAL, REGDATE):
-    query = "INSERT INTO POLL (START_DATE, END_DATE, QUESTION, ITEMCOUNT, POLLTOTAL, REGDATE) VALUES (%s, %s, %s, %s, %s, %s)"
-    cursor.execute(query, (START_DATE, END_DATE, QUESTION, ITEMCOUNT, POLLTOTAL, REGDATE))
+def POLL_UPDATE(cursor, poll_id, START_DATE, END_DATE, QUESTION):
+    query = "UPDATE POLL SET START_DATE = %s, END_DATE = %s, QUESTION = %s WHERE POLL_ID = %s"
+    cursor.execute(query, (START_DATE, END_DATE, QUESTION, poll_id))
+
+def POLL_SET_TYPE(cursor, poll_id, POLL_TYPE, SEATS):
+    cursor.execute("UPDATE POLL SET POLL_TYPE = %s, SEATS = %s WHERE POLL_ID = %s", (POLL_TYPE, SEATS, poll_id))
+
+def POLL_SET_COUNTER_SHARDS(cursor, poll_id, COUNTER_SHARDS):
+    cursor.execute("UPDATE POLL SET COUNTER_SHARDS = %s WHERE POLL_ID = %s", (COUNTER_SHARDS, poll_id))
+
+def POLL_SET_SNAPSHOT_EVENT_ID(cursor, poll_id, SNAPSHOT_EVENT_ID):
+    cursor.execute("UPDATE POLL SET SNAPSHOT_EVENT_ID = %s WHERE POLL_ID = %s", (SNAPSHOT_EVENT_ID, poll_id))
 
 def ACCOUNT_CREATE(cursor):
     # query1 = "DROP TABLE IF EXISTS ACCOUNT;"
     # cursor.execute(query1)
     query = '''
-    CREATE TABLE ACCOUNT (
+    CREATE TABLE IF NOT EXISTS ACCOUNT (
         ACCOUNT_ID int(11) NOT NULL AUTO_INCREMENT,
         USERNAME varchar(20) NOT NULL,
         PASSWORD varchar(20) NOT NULL,
         IS_BANNED tinyint(1) NOT NULL DEFAULT '0',
         SESSION_IP varchar(20),
+        IS_ADMIN tinyint(1) NOT NULL DEFAULT '0',
         PRIMARY KEY(ACCOUNT_ID)
     ) AUTO_INCREMENT=1
     '''
-    cursor.execute(query)
+    _create(cursor, 'ACCOUNT', query)
 
 def ACCOUNT_INSERT(cursor, USERNAME, PASSWORD, IS_BANNED, SESSION_IP):
     query = "INSERT INTO ACCOUNT (USERNAME, PASSWORD, IS_BANNED, SESSION_IP) VALUES (%s, %s, %s, %s)"
     cursor.execute(query, (USERNAME, PASSWORD, IS_BANNED, SESSION_IP))
-    
+
+def ACCOUNT_LOGIN_LOOKUP(cursor, USERNAME, locking=False):
+    # IX_ACCOUNT_LOGIN (USERNAME, PASSWORD, IS_ADMIN) 만 읽는 조회
+    query = "SELECT ACCOUNT_ID, PASSWORD, IS_ADMIN FROM ACCOUNT WHERE USERNAME = %s"
+    if locking:
+        query += " FOR UPDATE"
+    cursor.execute(query, (USERNAME,))
+    return cursor.fetchone()
+
+def ACCOUNT_INSERT_IF_ABSENT(cursor, USERNAME, PASSWORD):
+    # UX_ACCOUNT_USERNAME 덕분에 동시에 등록해도 한 계정만 생긴다.
+    # 새로 만들었으면 ACCOUNT_ID, 이미 있으면 None
+    if dialect(cursor) == 'sqlite':
+        query = "INSERT INTO ACCOUNT (USERNAME, PASSWORD) VALUES (%s, %s) ON CONFLICT (USERNAME) DO NOTHING"
+    else:
+        query = "INSERT INTO ACCOUNT (USERNAME, PASSWORD) VALUES (%s, %s) ON DUPLICATE KEY UPDATE ACCOUNT_ID = ACCOUNT_ID"
+    cursor.execute(query, (USERNAME, PASSWORD))
+    return cursor.lastrowid if cursor.rowcount == 1 else None
+
+def ACCOUNT_IS_ADMIN(cursor, account_id):
+    # 관리자면 True, 아니면 False, 없는 계정이면 None
+    cursor.execute("SELECT IS_ADMIN FROM ACCOUNT WHERE ACCOUNT_ID = %s", (account_id,))
+    row = cursor.fetchone()
+    return None if row is None else _scalar(row, 'IS_ADMIN') == 1
+
+def ACCOUNT_SELECT_FIRST(cursor):
+    # 가장 먼저 만든 계정 (queryaudit 의 로그인 시나리오)
+    cursor.execute("SELECT USERNAME, PASSWORD FROM ACCOUNT ORDER BY ACCOUNT_ID LIMIT 1")
+    return cursor.fetchone()
+
+def ACCOUNT_COUNT(cursor):
+    cursor.execute("SELECT COUNT(*) AS ACCOUNTS FROM ACCOUNT")
+    return _scalar(cursor.fetchone(), 'ACCOUNTS')
+
 
 def ITEM_CREATE(cursor):
     # query1 = "DROP TABLE IF EXISTS ITEM;"
     # cursor.execute(query1)
     query = '''
-    CREATE TABLE ITEM (
+    CREATE TABLE IF NOT EXISTS ITEM (
         ITEM_ID int(11) NOT NULL AUTO_INCREMENT,
         POLL_ID int(11) NOT NULL,
         ITEM_TEXT varchar(255) NOT NULL,
@@ -56,18 +159,104 @@ def ITEM_CREATE(cursor):
         FOREIGN KEY (POLL_ID) REFERENCES POLL(POLL_ID)
     ) AUTO_INCREMENT=1
     '''
-    cursor.execute(query)
+    _create(cursor, 'ITEM', query)
+
+def USER_VOTE_CREATE(cursor):
+    query = '''
+    CREATE TABLE IF NOT EXISTS USER_VOTE (
+        VOTE_ID int(11) NOT NULL AUTO_INCREMENT,
+        POLL_ID int(11) NOT NULL,
+        USER_ID int(11) NOT NULL,
+        PRIMARY KEY (VOTE_ID),
+        FOREIGN KEY (POLL_ID) REFERENCES POLL(POLL_ID),
+        FOREIGN KEY (USER_ID) REFERENCES ACCOUNT(ACCOUNT_ID)
+    ) AUTO_INCREMENT=1
+    '''
+    _create(cursor, 'USER_VOTE', query)
 
 def ITEM_INSERT(cursor, POLL_ID, ITEM_TEXT, VOTE_COUNT):
     # 아이템을 추가
     query_insert_item = "INSERT INTO ITEM (POLL_ID, ITEM_TEXT, VOTE_COUNT) VALUES (%s, %s, %s)"
     cursor.execute(query_insert_item, (POLL_ID, ITEM_TEXT, VOTE_COUNT))
+    item_id = cursor.lastrowid
 
     # POLL_ID에 해당하는 ITEMCOUNT 업데이트
-    query_update_item_count = "UPDATE POLL SET ITEMCOUNT = (SELECT COUNT(*) FROM ITEM WHERE POLL_ID = %s) WHERE POLL_ID = %s"
-    cursor.execute(query_update_item_count, (POLL_ID, POLL_ID))
-    
+    cursor.execute(ITEM_COUNT_UPDATE, (POLL_ID, POLL_ID))
+    return item_id
+
+def ITEM_INSERT_BULK(cursor, POLL_ID, ITEM_TEXTS, VOTE_COUNT=0):
+    # 투표 행을 잠가서 동시에 항목을 추가하는 편집자끼리 ITEM_ID 가 겹치지 않게 한다.
+    cursor.execute("SELECT POLL_ID FROM POLL WHERE POLL_ID = %s FOR UPDATE", (POLL_ID,))
+    cursor.execute("SELECT MAX(ITEM_ID) AS MAX_ID FROM ITEM WHERE POLL_ID = %s", (POLL_ID,))
+    first_id = (_scalar(cursor.fetchone(), 'MAX_ID') or 0) + 1
+    item_ids = list(range(first_id, first_id + len(ITEM_TEXTS)))
+
+    # executemany 는 하나의 다중 행 INSERT 로 보낸다.
+    query_insert_item = "INSERT INTO ITEM (ITEM_ID, POLL_ID, ITEM_TEXT, VOTE_COUNT) VALUES (%s, %s, %s, %s)"
+    cursor.executemany(query_insert_item, [(item_id, POLL_ID, text, VOTE_COUNT) for item_id, text in zip(item_ids, ITEM_TEXTS)])
+
+    # ITEMCOUNT 는 배치마다 한 번만 갱신
+    cursor.execute(ITEM_COUNT_UPDATE, (POLL_ID, POLL_ID))
+    return item_ids
+
+def ITEM_RENAME(cursor, poll_id, item_id, ITEM_TEXT):
+    cursor.execute("UPDATE ITEM SET ITEM_TEXT = %s WHERE ITEM_ID = %s AND POLL_ID = %s", (ITEM_TEXT, item_id, poll_id))
+
+def ITEM_VOTE_ADD(cursor, poll_id, item_id, delta=1):
+    cursor.execute("UPDATE ITEM SET VOTE_COUNT = VOTE_COUNT + %s WHERE POLL_ID = %s AND ITEM_ID = %s", (delta, poll_id, item_id))
+
+def ITEM_SELECT_LAST(cursor):
+    # 가장 최근 투표의 항목 하나 (queryaudit 의 투표 시나리오)
+    cursor.execute("SELECT POLL_ID, ITEM_ID FROM ITEM ORDER BY POLL_ID DESC LIMIT 1")
+    return cursor.fetchone()
+
+def ITEM_SET_VOTE_COUNT(cursor, poll_id, item_id, VOTE_COUNT):
+    cursor.execute("UPDATE ITEM SET VOTE_COUNT = %s WHERE POLL_ID = %s AND ITEM_ID = %s", (VOTE_COUNT, poll_id, item_id))
+
+def ITEM_IDS(cursor, poll_id):
+    # IX_ITEM_POLL (POLL_ID, ITEM_ID) 만 읽는다.
+    cursor.execute("SELECT ITEM_ID FROM ITEM WHERE POLL_ID = %s ORDER BY ITEM_ID", (poll_id,))
+    return [_scalar(row, 'ITEM_ID') for row in cursor.fetchall()]
+
+def ITEM_SELECT_VOTABLE(cursor, ITEMS):
+    # ITEMS: (POLL_ID, ITEM_ID) 목록. 있는 항목만 투표의 SLOT 수, 투표 방식과 함께 돌려준다.
+    query = ("SELECT i.POLL_ID, i.ITEM_ID, p.COUNTER_SHARDS, p.POLL_TYPE FROM ITEM i JOIN POLL p ON p.POLL_ID = i.POLL_ID "
+             "WHERE (i.POLL_ID, i.ITEM_ID) IN ({})")
+    return _select_pairs(cursor, query, ITEMS)
+
+def USER_VOTE_EXISTS(cursor, poll_id, user_id):
+    cursor.execute("SELECT 1 FROM USER_VOTE WHERE POLL_ID = %s AND USER_ID = %s", (poll_id, user_id))
+    return cursor.fetchone() is not None
+
+def USER_VOTE_SELECT_EXISTING(cursor, BALLOTS):
+    # BALLOTS: (POLL_ID, USER_ID) 목록 중 이미 투표한 것을 한 번의 SELECT 로 찾는다.
+    return _select_pairs(cursor, "SELECT POLL_ID, USER_ID FROM USER_VOTE WHERE (POLL_ID, USER_ID) IN ({})", BALLOTS)
+
+def USER_VOTE_INSERT_IF_ABSENT(cursor, BALLOTS):
+    # BALLOTS: (POLL_ID, USER_ID) 목록, 하나의 다중 행 INSERT 로 보낸다.
+    # UX_USER_VOTE_POLL_USER 에 이미 있는 행은 건너뛴다. 실제로 넣은 행 수를 돌려준다.
+    # (INSERT IGNORE 는 외래 키 오류까지 경고로 바꾸므로 쓰지 않는다)
+    if dialect(cursor) == 'sqlite':
+        query = "INSERT INTO USER_VOTE (POLL_ID, USER_ID) VALUES (%s, %s) ON CONFLICT (POLL_ID, USER_ID) DO NOTHING"
+    else:
+        query = "INSERT INTO USER_VOTE (POLL_ID, USER_ID) VALUES (%s, %s) ON DUPLICATE KEY UPDATE VOTE_ID = VOTE_ID"
+    cursor.executemany(query, BALLOTS)
+    return cursor.rowcount
+
+def SAVEPOINT(cursor, name):
+    cursor.execute(f"SAVEPOINT {name}")
+
+def ROLLBACK_TO_SAVEPOINT(cursor, name):
+    cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+
 def POLL_DELETE_BY_ID(cursor, poll_id):
+    # 투표에 딸린 표와 기록도 함께 지운다. (USER_VOTE 는 POLL 을 외래 키로 참조한다)
+    # 지운 투표의 기록은 감사 로그의 poll_delete 이벤트로만 남는다.
+    cursor.execute("DELETE FROM USER_VOTE WHERE POLL_ID = %s", (poll_id,))
+    cursor.execute("DELETE FROM VOTE_EVENT WHERE POLL_ID = %s", (poll_id,))
+    cursor.execute("DELETE FROM VOTE_SNAPSHOT WHERE POLL_ID = %s", (poll_id,))
+    cursor.execute("DELETE FROM ITEM_COUNTER_SHARD WHERE POLL_ID = %s", (poll_id,))
+    cursor.execute("DELETE FROM RANKED_VOTE WHERE POLL_ID = %s", (poll_id,))
     query_delete_item = "DELETE FROM ITEM WHERE POLL_ID = %s"
     cursor.execute(query_delete_item, (poll_id,))
 
@@ -79,8 +268,316 @@ def ACCOUNT_DELETE_BY_ID(cursor, account_id):
     cursor.execute(query_delete_account, (account_id,))
 
 def ITEM_DELETE_BY_ID(cursor, item_id, poll_id):
+    cursor.execute("DELETE FROM ITEM_COUNTER_SHARD WHERE POLL_ID = %s AND ITEM_ID = %s", (poll_id, item_id))
     query_delete_item = "DELETE FROM ITEM WHERE ITEM_ID = %s AND POLL_ID = %s"
     cursor.execute(query_delete_item, (item_id, poll_id))
 
-    query_update_item_count = "UPDATE POLL SET ITEMCOUNT = (SELECT COUNT(*) FROM ITEM WHERE POLL_ID = %s) WHERE POLL_ID = %s"
-    cursor.execute(query_update_item_count, (poll_id, poll_id))
+    cursor.execute(ITEM_COUNT_UPDATE, (poll_id, poll_id))
+
+def DATA_VERSION_CREATE(cursor):
+    # 다른 클라이언트의 변경을 감지하기 위한 버전 카운터
+    # SCOPE 'POLL' (SCOPE_ID 0) 은 투표 목록, SCOPE 'ITEM' 은 POLL_ID 별 항목/득표 수
+    query = '''
+    CREATE TABLE IF NOT EXISTS DATA_VERSION (
+        SCOPE varchar(10) NOT NULL,
+        SCOPE_ID int(11) NOT NULL,
+        VERSION bigint NOT NULL DEFAULT 0,
+        PRIMARY KEY (SCOPE, SCOPE_ID)
+    )
+    '''
+    cursor.execute(query)
+
+def VOTE_EVENT_CREATE(cursor):
+    # 투표 한 건마다 한 행씩 쌓이기만 하는 기록. 득표 수는 이 기록으로 다시 계산할 수 있다.
+    # 투표를 지울 때만 그 투표의 기록을 함께 지운다. (POLL_DELETE_BY_ID)
+    query = '''
+    CREATE TABLE IF NOT EXISTS VOTE_EVENT (
+        EVENT_ID bigint NOT NULL AUTO_INCREMENT,
+        POLL_ID int(11) NOT NULL,
+        ITEM_ID int(11) NOT NULL,
+        USER_ID int(11) NOT NULL,
+        CREATED_AT datetime NOT NULL,
+        PRIMARY KEY (EVENT_ID)
+    )
+    '''
+    _create(cursor, 'VOTE_EVENT', query)
+
+def VOTE_SNAPSHOT_CREATE(cursor):
+    # EVENT_ID 까지의 기록을 항목별 득표 수로 접어 둔 것
+    query = '''
+    CREATE TABLE IF NOT EXISTS VOTE_SNAPSHOT (
+        POLL_ID int(11) NOT NULL,
+        EVENT_ID bigint NOT NULL,
+        ITEM_ID int(11) NOT NULL,
+        VOTE_COUNT int(11) NOT NULL,
+        CREATED_AT datetime NOT NULL,
+        PRIMARY KEY (POLL_ID, EVENT_ID, ITEM_ID)
+    )
+    '''
+    cursor.execute(query)
+
+def VOTE_EVENT_INSERT_BULK(cursor, VOTES, CREATED_AT):
+    # VOTES: (POLL_ID, ITEM_ID, USER_ID) 목록, 하나의 다중 행 INSERT 로 보낸다.
+    query = "INSERT INTO VOTE_EVENT (POLL_ID, ITEM_ID, USER_ID, CREATED_AT) VALUES (%s, %s, %s, %s)"
+    cursor.executemany(query, [(poll_id, item_id, user_id, CREATED_AT) for poll_id, item_id, user_id in VOTES])
+
+def VOTE_EVENT_TAIL(cursor, poll_id, after_id):
+    # after_id 뒤의 기록을 항목별로 센다. IX_VOTE_EVENT_POLL 범위 검색
+    query = ("SELECT ITEM_ID, COUNT(*) AS VOTES, MAX(EVENT_ID) AS LAST_ID FROM VOTE_EVENT "
+             "WHERE POLL_ID = %s AND EVENT_ID > %s GROUP BY ITEM_ID")
+    cursor.execute(query, (poll_id, after_id))
+    return cursor.fetchall()
+
+def VOTE_EVENT_POLLS_WITH_TAIL(cursor, min_tail):
+    # 마지막 스냅샷(POLL.SNAPSHOT_EVENT_ID) 뒤에 기록이 min_tail 건 이상 쌓인 투표.
+    # 투표마다 IX_VOTE_EVENT_POLL 에서 꼬리의 min_tail 번째 기록이 있는지만 본다. (투표당 최대 min_tail 행)
+    query = ("SELECT p.POLL_ID FROM POLL p WHERE (SELECT e.EVENT_ID FROM VOTE_EVENT e "
+             "WHERE e.POLL_ID = p.POLL_ID AND e.EVENT_ID > p.SNAPSHOT_EVENT_ID ORDER BY e.EVENT_ID LIMIT 1 OFFSET %s) IS NOT NULL")
+    cursor.execute(query, (max(min_tail, 1) - 1,))
+    return [_scalar(row, 'POLL_ID') for row in cursor.fetchall()]
+
+def VOTE_SNAPSHOT_LATEST_ID(cursor, poll_id):
+    # 스냅샷이 없으면 None
+    cursor.execute("SELECT MAX(EVENT_ID) AS EVENT_ID FROM VOTE_SNAPSHOT WHERE POLL_ID = %s", (poll_id,))
+    return _scalar(cursor.fetchone(), 'EVENT_ID')
+
+def VOTE_SNAPSHOT_SELECT(cursor, poll_id, event_id):
+    cursor.execute("SELECT ITEM_ID, VOTE_COUNT FROM VOTE_SNAPSHOT WHERE POLL_ID = %s AND EVENT_ID = %s", (poll_id, event_id))
+    return cursor.fetchall()
+
+def VOTE_SNAPSHOT_INSERT_BULK(cursor, poll_id, event_id, COUNTS, CREATED_AT):
+    # COUNTS: {ITEM_ID: VOTE_COUNT}
+    query = "INSERT INTO VOTE_SNAPSHOT (POLL_ID, EVENT_ID, ITEM_ID, VOTE_COUNT, CREATED_AT) VALUES (%s, %s, %s, %s, %s)"
+    cursor.executemany(query, [(poll_id, event_id, item_id, count, CREATED_AT) for item_id, count in COUNTS.items()])
+
+def VOTE_SNAPSHOT_IDS(cursor, poll_id):
+    # 최근 스냅샷부터
+    cursor.execute("SELECT DISTINCT EVENT_ID FROM VOTE_SNAPSHOT WHERE POLL_ID = %s ORDER BY EVENT_ID DESC", (poll_id,))
+    return [_scalar(row, 'EVENT_ID') for row in cursor.fetchall()]
+
+def VOTE_SNAPSHOT_DELETE_UPTO(cursor, poll_id, event_id):
+    cursor.execute("DELETE FROM VOTE_SNAPSHOT WHERE POLL_ID = %s AND EVENT_ID <= %s", (poll_id, event_id))
+
+def ITEM_COUNTER_SHARD_CREATE(cursor):
+    # 득표가 몰리는 투표에서 ITEM 행 하나에 잠금이 몰리지 않도록 득표 수를 SLOT 여러 개에 나눠 더한다.
+    # 실제 득표 수 = ITEM.VOTE_COUNT + 모든 SLOT 의 합 (database/Counter.py 가 주기적으로 ITEM 에 합친다)
+    query = '''
+    CREATE TABLE IF NOT EXISTS ITEM_COUNTER_SHARD (
+        POLL_ID int(11) NOT NULL,
+        ITEM_ID int(11) NOT NULL,
+        SLOT int(11) NOT NULL,
+        VOTE_COUNT int(11) NOT NULL DEFAULT 0,
+        PRIMARY KEY (POLL_ID, ITEM_ID, SLOT)
+    )
+    '''
+    cursor.execute(query)
+
+def COUNTER_SHARD_ADD(cursor, poll_id, item_id, slot, delta):
+    if dialect(cursor) == 'sqlite':
+        query = ("INSERT INTO ITEM_COUNTER_SHARD (POLL_ID, ITEM_ID, SLOT, VOTE_COUNT) VALUES (%s, %s, %s, %s) "
+                 "ON CONFLICT (POLL_ID, ITEM_ID, SLOT) DO UPDATE SET VOTE_COUNT = VOTE_COUNT + excluded.VOTE_COUNT")
+    else:
+        query = ("INSERT INTO ITEM_COUNTER_SHARD (POLL_ID, ITEM_ID, SLOT, VOTE_COUNT) VALUES (%s, %s, %s, %s) "
+                 "ON DUPLICATE KEY UPDATE VOTE_COUNT = VOTE_COUNT + VALUES(VOTE_COUNT)")
+    cursor.execute(query, (poll_id, item_id, slot, delta))
+
+def COUNTER_SHARD_SELECT_PENDING(cursor, poll_id):
+    # ITEM 에 아직 합치지 않은 SLOT 행을 잠그고 읽는다.
+    query = "SELECT ITEM_ID, SLOT, VOTE_COUNT FROM ITEM_COUNTER_SHARD WHERE POLL_ID = %s AND VOTE_COUNT <> 0 FOR UPDATE"
+    cursor.execute(query, (poll_id,))
+    return cursor.fetchall()
+
+def COUNTER_SHARD_SUBTRACT_BULK(cursor, poll_id, SLOTS):
+    # SLOTS: (ITEM_ID, SLOT, 뺄 값) 목록
+    query = "UPDATE ITEM_COUNTER_SHARD SET VOTE_COUNT = VOTE_COUNT - %s WHERE POLL_ID = %s AND ITEM_ID = %s AND SLOT = %s"
+    cursor.executemany(query, [(delta, poll_id, item_id, slot) for item_id, slot, delta in SLOTS])
+
+def COUNTER_SHARD_PENDING_POLLS(cursor):
+    cursor.execute("SELECT DISTINCT POLL_ID FROM ITEM_COUNTER_SHARD WHERE VOTE_COUNT <> 0")
+    return [_scalar(row, 'POLL_ID') for row in cursor.fetchall()]
+
+def RANKED_VOTE_CREATE(cursor):
+    # 순위 투표의 투표지. 한 사용자의 투표지는 RANK_NO 1, 2, ... 순서의 행들이다. (database/Ranked.py)
+    query = '''
+    CREATE TABLE IF NOT EXISTS RANKED_VOTE (
+        POLL_ID int(11) NOT NULL,
+        USER_ID int(11) NOT NULL,
+        RANK_NO int(11) NOT NULL,
+        ITEM_ID int(11) NOT NULL,
+        PRIMARY KEY (POLL_ID, USER_ID, RANK_NO)
+    )
+    '''
+    cursor.execute(query)
+
+def RANKED_VOTE_INSERT_BULK(cursor, POLL_ID, USER_ID, ITEM_IDS):
+    query = "INSERT INTO RANKED_VOTE (POLL_ID, USER_ID, RANK_NO, ITEM_ID) VALUES (%s, %s, %s, %s)"
+    cursor.executemany(query, [(POLL_ID, USER_ID, rank, item_id) for rank, item_id in enumerate(ITEM_IDS, 1)])
+
+# Export.stream 으로 chunk 단위로 읽는 문장 (서버 쪽 커서라 함수 대신 문자열로 넘긴다)
+# 기본 키 (POLL_ID, USER_ID, RANK_NO) 순서 그대로 읽는다.
+RANKED_VOTE_STREAM = "SELECT USER_ID, ITEM_ID FROM RANKED_VOTE WHERE POLL_ID = %s ORDER BY USER_ID, RANK_NO"
+# 분산 카운터 SLOT 까지 합친 항목 i 의 득표 수
+ITEM_VOTE_TOTAL = ("i.VOTE_COUNT + COALESCE((SELECT SUM(s.VOTE_COUNT) FROM ITEM_COUNTER_SHARD s "
+                   "WHERE s.POLL_ID = i.POLL_ID AND s.ITEM_ID = i.ITEM_ID), 0)")
+ITEM_COUNTS_STREAM = f"SELECT i.POLL_ID, i.ITEM_ID, {ITEM_VOTE_TOTAL} FROM ITEM i"
+USER_VOTE_STREAM = "SELECT POLL_ID, USER_ID FROM USER_VOTE"
+# database/Export 의 데이터셋. {where} 에는 투표 하나로 좁히는 조건(*_POLL_FILTER)이 들어간다.
+# 기본 키 / 인덱스 순서로 읽어서 정렬을 위한 임시 테이블이 생기지 않게 한다.
+RESULTS_EXPORT_STREAM = (f"SELECT p.POLL_ID, p.QUESTION, i.ITEM_ID, i.ITEM_TEXT, {ITEM_VOTE_TOTAL} AS VOTE_COUNT "
+                         "FROM ITEM i JOIN POLL p ON p.POLL_ID = i.POLL_ID {where} ORDER BY i.POLL_ID, i.ITEM_ID")
+RESULTS_POLL_FILTER = "WHERE i.POLL_ID = %s"
+BALLOTS_EXPORT_STREAM = "SELECT VOTE_ID, POLL_ID, USER_ID FROM USER_VOTE {where} ORDER BY VOTE_ID"
+EVENTS_EXPORT_STREAM = "SELECT EVENT_ID, POLL_ID, ITEM_ID, USER_ID, CREATED_AT FROM VOTE_EVENT {where} ORDER BY EVENT_ID"
+POLL_FILTER = "WHERE POLL_ID = %s"
+
+def ITEM_SELECT_WITH_COUNTS(cursor, poll_id):
+    # 나눠 더한 SLOT 까지 합친 득표 수로 항목을 읽는다.
+    query = """
+    SELECT i.ITEM_ID, i.POLL_ID, i.ITEM_TEXT, i.VOTE_COUNT + COALESCE(SUM(s.VOTE_COUNT), 0) AS VOTE_COUNT
+    FROM ITEM i LEFT JOIN ITEM_COUNTER_SHARD s ON s.POLL_ID = i.POLL_ID AND s.ITEM_ID = i.ITEM_ID
+    WHERE i.POLL_ID = %s
+    GROUP BY i.ITEM_ID, i.POLL_ID, i.ITEM_TEXT, i.VOTE_COUNT
+    ORDER BY i.ITEM_ID
+    """
+    cursor.execute(query, (poll_id,))
+    rows = cursor.fetchall()
+    for row in rows:
+        # MySQL 의 SUM 은 Decimal 을 돌려준다.
+        row['VOTE_COUNT'] = int(row['VOTE_COUNT'])
+    return rows
+
+def ITEM_VERSION_SCOPE(slot=None):
+    # 투표별 항목/득표 수 버전. SLOT 을 쓰는 투표는 'ITEM:<slot>' 행을 나눠서 올린다.
+    return 'ITEM' if slot is None else f'ITEM:{slot}'
+
+def ITEM_VERSION_GET(cursor, poll_id, locking=False):
+    # 'ITEM' 과 'ITEM:<slot>' 버전의 합. 버전은 늘어나기만 하므로 합도 바뀔 때마다 커진다.
+    # IX_DATA_VERSION_SCOPE_ID (SCOPE_ID, SCOPE) 범위 검색
+    query = "SELECT VERSION FROM DATA_VERSION WHERE SCOPE_ID = %s AND (SCOPE = 'ITEM' OR SCOPE LIKE 'ITEM:%%')"
+    if locking:
+        query += " FOR UPDATE"
+    cursor.execute(query, (poll_id,))
+    return sum(_scalar(row, 'VERSION') for row in cursor.fetchall())
+
+def VERSION_BUMP(cursor, scope, scope_id=0):
+    query = "INSERT INTO DATA_VERSION (SCOPE, SCOPE_ID, VERSION) VALUES (%s, %s, 1) ON DUPLICATE KEY UPDATE VERSION = VERSION + 1"
+    cursor.execute(query, (scope, scope_id))
+
+def VERSION_GET(cursor, scope, scope_id=0):
+    cursor.execute("SELECT VERSION FROM DATA_VERSION WHERE SCOPE = %s AND SCOPE_ID = %s", (scope, scope_id))
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+    return _scalar(row, 'VERSION')
+
+def POLL_PAGE(cursor, after_id, limit, now, status=None):
+    # POLL_ID 기준 keyset 페이지네이션. status 는 None 또는 POLL_STATUS 의 키
+    # STATUS 는 'active', 'upcoming', 'closed' 중 하나다.
+    query = (f"SELECT POLL_ID, QUESTION, ({POLL_ACTIVE}) AS IS_ACTIVE, "
+             f"CASE WHEN {POLL_ACTIVE} THEN 'active' WHEN {POLL_STATUS['closed']} THEN 'closed' ELSE 'upcoming' END AS STATUS "
+             f"FROM POLL WHERE POLL_ID > %s")
+    params = [now] * 5 + [after_id]
+    if status is not None:
+        condition = POLL_STATUS[status]
+        query += f" AND {condition}"
+        params += [now] * condition.count('%s')
+    query += " ORDER BY POLL_ID LIMIT %s"
+    params.append(limit)
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def POLL_IDS_BY_OWNER(cursor, account_id):
+    # IX_POLL_CREATED_BY 로 한 사용자가 만든 투표를 한 번에 읽는다.
+    cursor.execute("SELECT POLL_ID FROM POLL WHERE CREATED_BY = %s", (account_id,))
+    return [_scalar(row, 'POLL_ID') for row in cursor.fetchall()]
+
+def POLL_SELECT_ACTIVE(cursor, now):
+    # 지금 투표할 수 있는 투표: IX_POLL_END_START (END_DATE, START_DATE) 범위 검색
+    query = f"SELECT POLL_ID, QUESTION, START_DATE, END_DATE, ITEMCOUNT, POLLTOTAL FROM POLL WHERE {POLL_ACTIVE} ORDER BY END_DATE"
+    cursor.execute(query, (now, now))
+    return cursor.fetchall()
+
+def POLL_SELECT_CLOSED(cursor, since, now):
+    # since 이후 now 까지 마감된 투표, 최근 마감 순
+    query = "SELECT POLL_ID, QUESTION, START_DATE, END_DATE, ITEMCOUNT, POLLTOTAL FROM POLL WHERE END_DATE >= %s AND END_DATE <= %s ORDER BY END_DATE DESC"
+    cursor.execute(query, (since, now))
+    return cursor.fetchall()
+
+def _select_pairs(cursor, query, pairs):
+    # 자리표시자 수를 2의 거듭제곱으로 올리고 마지막 쌍을 반복해서 채운다. IN 의 결과는 같고,
+    # 배치 크기가 달라도 문장 문자열은 몇 가지뿐이라 연결별 문장 캐시에서 밀려나지 않는다.
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    size = 1 << (len(pairs) - 1).bit_length()
+    pairs += pairs[-1:] * (size - len(pairs))
+    cursor.execute(query.format(', '.join(['(%s, %s)'] * size)), [value for pair in pairs for value in pair])
+    return cursor.fetchall()
+
+def _scalar(row, column):
+    # DictCursor 와 기본 커서 결과를 모두 받는다.
+    return row[column] if isinstance(row, dict) else row[0]
+
+# SQLite 에는 AUTO_INCREMENT 가 없으므로 같은 테이블을 SQLite 문법으로 따로 정의한다.
+# ITEM 은 (ITEM_ID, POLL_ID) 복합 키라서 트리거로 ITEM_ID 를 rowid 로 채운다. (MySQL 의 전역 AUTO_INCREMENT 와 같은 동작)
+SQLITE_TABLES = {
+    'ACCOUNT': ['''
+    CREATE TABLE IF NOT EXISTS ACCOUNT (
+        ACCOUNT_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        USERNAME varchar(20) NOT NULL,
+        PASSWORD varchar(20) NOT NULL,
+        IS_BANNED tinyint(1) NOT NULL DEFAULT '0',
+        SESSION_IP varchar(20),
+        IS_ADMIN tinyint(1) NOT NULL DEFAULT '0'
+    )
+    '''],
+    'POLL': ['''
+    CREATE TABLE IF NOT EXISTS POLL (
+        POLL_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        START_DATE datetime NOT NULL,
+        END_DATE datetime,
+        ITEMCOUNT int(11) NOT NULL DEFAULT 0,
+        QUESTION varchar(30),
+        POLLTOTAL int(11) NOT NULL DEFAULT 0,
+        REGDATE datetime,
+        CREATED_BY int(11) REFERENCES ACCOUNT(ACCOUNT_ID)
+    )
+    '''],
+    'ITEM': ['''
+    CREATE TABLE IF NOT EXISTS ITEM (
+        ITEM_ID int(11),
+        POLL_ID int(11) NOT NULL REFERENCES POLL(POLL_ID),
+        ITEM_TEXT varchar(255) NOT NULL,
+        VOTE_COUNT int(11) NOT NULL DEFAULT 0,
+        PRIMARY KEY (ITEM_ID, POLL_ID)
+    )
+    ''', '''
+    CREATE TRIGGER IF NOT EXISTS ITEM_AUTO_ID AFTER INSERT ON ITEM WHEN NEW.ITEM_ID IS NULL
+    BEGIN
+        UPDATE ITEM SET ITEM_ID = NEW.rowid WHERE rowid = NEW.rowid;
+    END
+    '''],
+    'VOTE_EVENT': ['''
+    CREATE TABLE IF NOT EXISTS VOTE_EVENT (
+        EVENT_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        POLL_ID int(11) NOT NULL,
+        ITEM_ID int(11) NOT NULL,
+        USER_ID int(11) NOT NULL,
+        CREATED_AT datetime NOT NULL
+    )
+    '''],
+    'USER_VOTE': ['''
+    CREATE TABLE IF NOT EXISTS USER_VOTE (
+        VOTE_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        POLL_ID int(11) NOT NULL REFERENCES POLL(POLL_ID),
+        USER_ID int(11) NOT NULL REFERENCES ACCOUNT(ACCOUNT_ID)
+    )
+    '''],
+}
+
+def _create(cursor, table, query):
+    if dialect(cursor) == 'sqlite':
+        for statement in SQLITE_TABLES[table]:
+            cursor.execute(statement)
+    else:
+        cursor.execute(query)
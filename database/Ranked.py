@@ -0,0 +1,279 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+import pymysql
+
+from database import Export, Pool, Query
+from database.VoteQueue import ALREADY_VOTED, UNKNOWN_ITEM, VoteResult
+
+# 순위 투표 (POLL.POLL_TYPE = 'ranked'). 투표자는 항목에 선호 순서를 매기고 RANKED_VOTE 에 한 순위당 한 행이 들어간다.
+# 당선자가 한 명(POLL.SEATS = 1)이면 즉석 결선(IRV), 여러 명이면 Droop 쿼터와 잉여표 이양을 쓰는 STV 로 센다.
+# 1순위 표는 ITEM.VOTE_COUNT 와 VOTE_EVENT 에도 남으므로 열린 투표 창과 VoteLog 검증은 그대로 동작한다.
+#   python -m database.Ranked --poll 3
+#   python -m database.Ranked --poll 3 --json runoff.json
+# 투표지를 넣는 cast 는 numpy 가 필요 없으므로 numpy 는 개표하는 함수 안에서 읽는다. (GUI 시작 시간)
+
+RANKED = 'ranked'
+PLURALITY = 'plurality'
+
+INVALID_RANKING = 'invalid ranking'
+NOT_RANKED = 'not a ranked poll'
+
+
+def cast(cursor, poll_id, user_id, ranking):
+    # ranking: 선호 순서대로의 ITEM_ID 목록. VoteResult 를 돌려준다.
+    ranking = [int(item_id) for item_id in ranking or ()]
+    if not ranking or len(set(ranking)) != len(ranking):
+        return VoteResult(False, INVALID_RANKING)
+    poll = Query.POLL_SELECT_TYPE(cursor, poll_id)
+    if poll is None or poll['POLL_TYPE'] != RANKED:
+        return VoteResult(False, NOT_RANKED)
+    if not set(ranking) <= set(Query.ITEM_IDS(cursor, poll_id)):
+        return VoteResult(False, UNKNOWN_ITEM)
+
+    # VoteQueue 와 같은 순서로 버전 행을 먼저 잠근다.
+    # 중복 투표는 읽어서 확인하지 않는다. MySQL 의 REPEATABLE READ 에서는 앞의 SELECT 로 정해진 스냅샷이
+    # 방금 commit 된 표를 못 볼 수 있으므로, UX_USER_VOTE_POLL_USER 에 넣어지는지로 판단한다.
+    Query.VERSION_BUMP(cursor, 'ITEM', poll_id)
+    if Query.USER_VOTE_INSERT_IF_ABSENT(cursor, [(poll_id, user_id)]) != 1:
+        return VoteResult(False, ALREADY_VOTED)
+    Query.RANKED_VOTE_INSERT_BULK(cursor, poll_id, user_id, ranking)
+    Query.VOTE_EVENT_INSERT_BULK(cursor, [(poll_id, ranking[0], user_id)], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    Query.ITEM_VOTE_ADD(cursor, poll_id, ranking[0])
+    return VoteResult(True, None)
+
+
+class Ballots:
+    """Ranked ballots of one poll as a dense preference matrix.
+
+    Row ``i`` of ``rankings`` lists candidate indices (positions in
+    ``candidates``) in order of preference, padded with ``len(candidates)``.
+    Identical ballots are stored once with their count in ``weights``, so
+    the rounds work on distinct orderings rather than on every voter.
+    """
+
+    def __init__(self, candidates, rankings, weights):
+        self.candidates = candidates
+        self.rankings = rankings
+        self.weights = weights
+
+    @classmethod
+    def from_rows(cls, candidates, users, items):
+        # (USER_ID, ITEM_ID) 행은 USER_ID, RANK_NO 순으로 정렬되어 있어야 한다.
+        import numpy as np
+        candidates = np.asarray(candidates, dtype=np.int64)
+        k = len(candidates)
+        index = np.searchsorted(candidates, items)
+        known = index < k
+        known[known] = candidates[index[known]] == items[known]
+        # 지워진 항목은 없는 순위로 보고 다음 순위가 올라온다.
+        users, index = users[known], index[known]
+        if not len(users):
+            return cls(candidates, np.zeros((0, 1), dtype=np.int32), np.zeros(0))
+        first = np.append(True, users[1:] != users[:-1])
+        ballot = np.cumsum(first) - 1
+        starts = np.flatnonzero(first)
+        position = np.arange(len(users)) - starts[ballot]
+        rankings = np.full((len(starts), position.max() + 1), k, dtype=np.int32)
+        rankings[ballot, position] = index
+        rankings, weights = _distinct_rows(rankings)
+        return cls(candidates, rankings, weights.astype(np.float64))
+
+    @property
+    def count(self):
+        return int(self.weights.sum())
+
+
+def _distinct_rows(rankings):
+    # 같은 순서의 투표지를 한 행으로 합친다. np.unique(axis=0) 보다 빠르도록 행을 (k+1) 진법의
+    # 정수 하나로 만들어 비교하고, int64 를 넘는 크기면 행 바이트를 그대로 비교한다.
+    import numpy as np
+    base = int(rankings.max()) + 1
+    if rankings.shape[1] * np.log2(base) < 63:
+        keys = rankings.astype(np.int64) @ (base ** np.arange(rankings.shape[1] - 1, -1, -1, dtype=np.int64))
+    else:
+        rankings = np.ascontiguousarray(rankings)
+        keys = rankings.view(np.dtype((np.void, rankings.itemsize * rankings.shape[1]))).ravel()
+    _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    return rankings[first], counts
+
+
+def load_ballots(connection, poll_id, chunk_rows=Export.CHUNK_ROWS):
+    import numpy as np
+    with connection.cursor() as cursor:
+        candidates = Query.ITEM_IDS(cursor, poll_id)
+    users, items = [], []
+    for rows in Export.stream(connection, Query.RANKED_VOTE_STREAM, (poll_id,), chunk_rows):
+        columns = np.array(rows, dtype=np.int64)
+        users.append(columns[:, 0])
+        items.append(columns[:, 1])
+    empty = np.zeros(0, dtype=np.int64)
+    return Ballots.from_rows(candidates, np.concatenate(users) if users else empty,
+                             np.concatenate(items) if items else empty)
+
+
+def _votes(value):
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 4)
+
+
+def tabulate(ballots, seats=1):
+    # 라운드마다 득표, 당선/탈락, 옮겨 간 표를 기록한다. 한 라운드에서 표를 옮길 때는
+    # 탈락(또는 당선)한 후보를 가리키던 투표지만 다음 순위로 넘긴다.
+    import numpy as np
+    candidates, weights = ballots.candidates, ballots.weights.copy()
+    k = len(candidates)
+    # 마지막 열은 항상 k (더 이상 순위 없음)
+    rankings = np.hstack([ballots.rankings, np.full((len(weights), 1), k, dtype=np.int32)])
+    width = rankings.shape[1]
+    rows = np.arange(len(weights))
+
+    hopeful = np.ones(k + 1, dtype=bool)
+    hopeful[k] = False
+    position = np.zeros(len(weights), dtype=np.intp)
+    top = np.full(len(weights), k, dtype=np.int64)
+
+    def advance(selected):
+        # 지금 순위부터 아직 남아 있는 첫 후보로 옮긴다.
+        choices = rankings[selected]
+        open_choice = hopeful[choices] & (np.arange(width)[None, :] >= position[selected][:, None])
+        open_choice[:, -1] = True
+        position[selected] = open_choice.argmax(axis=1)
+        top[selected] = rankings[selected, position[selected]]
+
+    def transfers(selected):
+        moved = np.bincount(top[selected], weights=weights[selected], minlength=k + 1)
+        result = {int(candidates[c]): _votes(moved[c]) for c in np.flatnonzero(moved[:k])}
+        if moved[k]:
+            result['exhausted'] = _votes(moved[k])
+        return result
+
+    advance(rows)
+    first_round = np.bincount(top, weights=weights, minlength=k + 1)
+    valid = first_round[:k].sum()
+    # 한 명이면 남은 표의 과반, 여러 명이면 Droop 쿼터
+    quota = np.floor(valid / (seats + 1)) + 1 if seats > 1 else None
+
+    elected, rounds = [], []
+    while True:
+        tally = np.bincount(top, weights=weights, minlength=k + 1)
+        standing = np.flatnonzero(hopeful[:k])
+        record = {
+            'round': len(rounds) + 1,
+            'tallies': {int(candidates[c]): _votes(tally[c]) for c in standing},
+            'exhausted': _votes(tally[k]),
+            'elected': [],
+            'eliminated': [],
+            'transfers': {},
+        }
+        rounds.append(record)
+        if not len(standing) or not valid:
+            # 유효표가 없으면 아무도 당선되지 않는다. (동률 규칙으로 첫 항목을 뽑지 않도록)
+            break
+        if len(standing) <= seats - len(elected):
+            # 남은 자리만큼만 후보가 남았다.
+            elected.extend(int(candidates[c]) for c in standing[np.argsort(-tally[standing], kind='stable')])
+            record['elected'] = elected[-len(standing):]
+            break
+
+        if quota is None:
+            winners = standing[tally[standing] * 2 > tally[standing].sum()]
+        else:
+            winners = standing[tally[standing] >= quota]
+        if len(winners):
+            for winner in winners[np.argsort(-tally[winners], kind='stable')]:
+                elected.append(int(candidates[winner]))
+                record['elected'].append(int(candidates[winner]))
+                hopeful[winner] = False
+                if len(elected) == seats:
+                    break
+                # 쿼터를 넘은 잉여표만 다음 순위로 옮긴다. (Gregory 방식: 투표지 가중치를 비율만큼 줄인다)
+                # 같은 라운드에 먼저 당선된 후보의 잉여표가 들어왔을 수 있으므로 다시 합산한다.
+                selected = np.flatnonzero(top == winner)
+                total = weights[selected].sum()
+                weights[selected] *= (total - quota) / total
+                advance(selected)
+                record['transfers'][int(candidates[winner])] = transfers(selected)
+            if len(elected) == seats:
+                break
+            continue
+
+        # 최하위 탈락. 동률이면 1라운드 득표가 적은 쪽, 그것도 같으면 나중에 추가된 항목
+        loser = standing[np.lexsort((-standing, first_round[standing], tally[standing]))[0]]
+        hopeful[loser] = False
+        record['eliminated'].append(int(candidates[loser]))
+        selected = np.flatnonzero(top == loser)
+        advance(selected)
+        record['transfers'][int(candidates[loser])] = transfers(selected)
+
+    return {
+        'seats': seats,
+        'ballots': ballots.count,
+        'quota': _votes(quota) if quota is not None else None,
+        'winners': elected,
+        'rounds': rounds,
+    }
+
+
+def runoff(pool, poll_id):
+    with pool.connection() as connection:
+        with connection.cursor() as cursor:
+            poll = Query.POLL_SELECT_TYPE(cursor, poll_id)
+        if poll is None or poll['POLL_TYPE'] != RANKED:
+            connection.commit()
+            raise ValueError(f"poll {poll_id} is not a ranked poll")
+        ballots = load_ballots(connection, poll_id)
+        connection.commit()
+    return dict(tabulate(ballots, poll['SEATS']), poll_id=poll_id)
+
+
+def format_runoff(result, names=None):
+    # names: {ITEM_ID: ITEM_TEXT} 를 주면 항목 이름으로 표시한다.
+    def label(item_id):
+        return names.get(item_id, str(item_id)) if names and item_id != 'exhausted' else str(item_id)
+
+    lines = [f"Poll {result['poll_id']}: {result['ballots']:,} ballots, {result['seats']} seat(s)"
+             + (f", quota {result['quota']}" if result['quota'] is not None else '')]
+    for record in result['rounds']:
+        tallies = ', '.join(f"{label(item_id)}: {votes}" for item_id, votes in record['tallies'].items())
+        lines.append(f"Round {record['round']}: {tallies} (exhausted {record['exhausted']})")
+        for item_id in record['elected']:
+            lines.append(f"  elected {label(item_id)}")
+        for item_id in record['eliminated']:
+            lines.append(f"  eliminated {label(item_id)}")
+        for source, moved in record['transfers'].items():
+            lines.append(f"  from {label(source)}: " + ', '.join(f"{label(target)} +{votes}" for target, votes in moved.items()))
+    lines.append(f"Winners: {', '.join(label(item_id) for item_id in result['winners']) or 'none'}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count a ranked-choice poll round by round')
+    parser.add_argument('--poll', type=int, required=True)
+    parser.add_argument('--json', help='also write the rounds as JSON to this file')
+    args = parser.parse_args()
+
+    pool = Pool.get_pool()
+    started = time.perf_counter()
+    try:
+        result = runoff(pool, args.poll)
+    except pymysql.MySQLError as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        Pool.close_pool()
+    print(format_runoff(result))
+    print(f"Counted in {time.perf_counter() - started:.2f}s")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import re
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+
+import pymysql
+
+# pymysql 과 같은 모양의 SQLite 드라이버.
+# %s 자리표시자와 dict 행을 그대로 쓰고, 오류도 pymysql 예외로 바꿔서 올리므로
+# 기존 코드의 except pymysql.MySQLError 가 그대로 동작한다.
+
+DIALECT = 'sqlite'
+# 연결마다 컴파일해 둔 문장 수. Query 의 문장은 모두 고정 문자열이라 한 번 컴파일하면 계속 다시 쓴다.
+STATEMENT_CACHE = 256
+WRITE_START = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE)
+FOR_UPDATE = re.compile(r'\s+FOR\s+UPDATE\s*$', re.IGNORECASE)
+
+sqlite3.register_adapter(datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def _convert_datetime(value):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+sqlite3.register_converter('DATETIME', _convert_datetime)
+
+
+@lru_cache(maxsize=1024)
+def translate(query, has_args):
+    # MySQL 문법 중 이 프로젝트가 쓰는 것만 바꾼다. 결과는 문장별로 캐시된다.
+    sql = query
+    if has_args:
+        sql = sql.replace('%s', '?').replace('%%', '%')
+    locking = FOR_UPDATE.search(sql) is not None
+    if locking:
+        sql = FOR_UPDATE.sub('', sql)
+    sql = sql.replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET')
+    return sql, locking or WRITE_START.match(sql) is not None
+
+
+def _error(e):
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        return pymysql.err.IntegrityError(1062 if 'UNIQUE' in message else 1452, message)
+    if isinstance(e, sqlite3.OperationalError):
+        if message.startswith('no such table'):
+            return pymysql.err.ProgrammingError(1146, message)
+        if message.startswith('no such column'):
+            return pymysql.err.OperationalError(1054, message)
+        if 'syntax error' in message:
+            return pymysql.err.ProgrammingError(1064, message)
+        if 'locked' in message or 'busy' in message:
+            return pymysql.err.OperationalError(1205, message)
+        return pymysql.err.OperationalError(2013, message)
+    if isinstance(e, (sqlite3.ProgrammingError, sqlite3.InterfaceError)):
+        return pymysql.err.InterfaceError(0, message)
+    return pymysql.err.DatabaseError(0, message)
+
+
+def _params(args):
+    if args is None:
+        return ()
+    if isinstance(args, (list, tuple, dict)):
+        return args
+    return (args,)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class Cursor:
+    def __init__(self, connection, as_dict=True):
+        self.connection = connection
+        self._cursor = connection._db.cursor()
+        if not as_dict:
+            self._cursor.row_factory = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, args=None):
+        sql, writes = translate(query, args is not None)
+        try:
+            if writes:
+                self.connection._begin()
+            self._cursor.execute(sql, _params(args))
+        except sqlite3.Error as e:
+            raise _error(e) from e
+        return self._cursor.rowcount
+
+    def executemany(self, query, args):
+        sql, writes = translate(query, True)
+        try:
+            if writes:
+                self.connection._begin()
+            self._cursor.executemany(sql, [_params(row) for row in args])
+        except sqlite3.Error as e:
+            raise _error(e) from e
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Connection:
+    """One SQLite database file opened in WAL mode.
+
+    Transactions start lazily with BEGIN IMMEDIATE at the first write (or
+    SELECT ... FOR UPDATE), so readers never block and two writers never
+    deadlock upgrading a shared lock.
+    """
+
+    dialect = DIALECT
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE)
+        self._db.row_factory = _dict_row
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+
+    @property
+    def open(self):
+        return self._db is not None
+
+    def _begin(self):
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN IMMEDIATE")
+
+    def begin(self):
+        self._begin()
+
+    def cursor(self, cursor=None):
+        # pymysql 처럼 커서 클래스를 받는다. SQLite 커서는 원래 한 행씩 읽으므로
+        # SSCursor 도 같은 커서이고, dict 가 아닌 클래스면 튜플 행을 돌려준다.
+        if self._db is None:
+            raise pymysql.err.InterfaceError(0, "connection is closed")
+        return Cursor(self, cursor is None or issubclass(cursor, pymysql.cursors.DictCursorMixin))
+
+    def commit(self):
+        try:
+            if self._db.in_transaction:
+                self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def rollback(self):
+        if self._db is None:
+            raise pymysql.err.InterfaceError(0, "connection is closed")
+        if self._db.in_transaction:
+            self._db.execute("ROLLBACK")
+
+    def ping(self, reconnect=True):
+        if self._db is None:
+            raise pymysql.err.InterfaceError(0, "connection is closed")
+        return True
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def connect(path, timeout=5.0):
+    try:
+        return Connection(path, timeout)
+    except sqlite3.Error as e:
+        raise _error(e) from e
@@ -0,0 +1,248 @@
+from datetime import datetime
+
+from database import Audit, Auth, Cache, Config, Counter, Metrics, Query, Ranked, VoteLog, VoteQueue
+
+
+class LoginFailed(Exception):
+    pass
+
+
+class VotingService:
+    """Voting operations shared by the Qt client and the HTTP server."""
+
+    def __init__(self, pool, compact_interval=None):
+        self.pool = pool
+        self.repository = Cache.PollRepository(pool)
+        self.changes = Cache.ChangeFeed(self.repository)
+        self.credentials = Auth.CredentialCache()
+        self.sessions = Auth.SessionStore()
+        self.authorization = Auth.Authorization(pool)
+        self.vote_queue = VoteQueue.VoteQueue(pool, on_commit=self._votes_committed)
+        # SLOT 합치기는 서버 한 곳에서만 돌린다. (VoteServer --compact-interval, python -m database.Counter --compact)
+        self.compactor = None if compact_interval is None else Counter.ShardCompactor(pool, compact_interval)
+        self.exporter = None
+        if pool.metrics is not None and Config.METRICS_FILE:
+            self.exporter = Metrics.Exporter(pool.metrics, Config.METRICS_FILE, Config.METRICS_INTERVAL, pool)
+
+    def _votes_committed(self, poll_ids):
+        for poll_id in poll_ids:
+            self.repository.invalidate_items(poll_id)
+
+    def close(self):
+        self.vote_queue.close()
+        if self.compactor is not None:
+            self.compactor.close()
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def login(self, username, password):
+        # 없는 사용자면 계정을 새로 만들고 로그인한다.
+        if not username or not password:
+            raise ValueError("username and password are required")
+        # 최근에 같은 비밀번호로 확인된 사용자는 DB 를 거치지 않는다.
+        account = self.credentials.lookup(username, password)
+        if account is not None:
+            if not self.authorization.is_loaded(account['account_id']):
+                self.authorization.load(account['account_id'], account['is_admin'])
+            Audit.event('login', username=username, account_id=account['account_id'],
+                        is_admin=account['is_admin'], outcome='cached')
+            return account
+
+        created = False
+        with self.pool.cursor() as cursor:
+            user = Query.ACCOUNT_LOGIN_LOOKUP(cursor, username)
+            if user is None:
+                account_id = Query.ACCOUNT_INSERT_IF_ABSENT(cursor, username, password)
+                if account_id is not None:
+                    user = {'ACCOUNT_ID': account_id, 'PASSWORD': password, 'IS_ADMIN': 0}
+                    created = True
+                else:
+                    # 다른 클라이언트가 방금 같은 이름으로 등록했다. 스냅샷이 아닌 최신 행을 읽는다.
+                    user = Query.ACCOUNT_LOGIN_LOOKUP(cursor, username, locking=True)
+            if user['PASSWORD'] != password:
+                Audit.event('login', username=username, account_id=user['ACCOUNT_ID'], outcome='failed')
+                raise LoginFailed(f"Incorrect password for user '{username}'")
+        account = {
+            'account_id': user['ACCOUNT_ID'],
+            'username': username,
+            'is_admin': user['IS_ADMIN'] == 1,
+            'created': False,
+        }
+        self.credentials.store(username, password, account)
+        # 수정/삭제 권한 확인은 이후 메모리에서만 한다.
+        self.authorization.load(account['account_id'], account['is_admin'])
+        Audit.event('login', username=username, account_id=account['account_id'],
+                    is_admin=account['is_admin'], outcome='created' if created else 'ok')
+        return dict(account, created=created)
+
+    def can_modify_poll(self, account_id, poll_id):
+        return self.authorization.can_modify(account_id, poll_id)
+
+    # 목록과 항목은 캐시된 값을 공유하므로 호출한 쪽에서 수정하면 안 된다.
+    def list_polls(self):
+        return self.repository.polls()
+
+    def poll_page(self, after_id=0, limit=100, status=None):
+        if status is not None and status not in Query.POLL_STATUS:
+            raise ValueError(f"unknown poll status '{status}'")
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self.pool.cursor() as cursor:
+            return Query.POLL_PAGE(cursor, after_id, limit, now, status)
+
+    def active_polls(self, now=None):
+        with self.pool.cursor() as cursor:
+            return Query.POLL_SELECT_ACTIVE(cursor, now or datetime.now())
+
+    def closed_polls(self, since, now=None):
+        with self.pool.cursor() as cursor:
+            return Query.POLL_SELECT_CLOSED(cursor, since, now or datetime.now())
+
+    def get_items(self, poll_id):
+        return self.repository.items(poll_id)
+
+    def item_changes(self, poll_id, since=None):
+        # since 버전 이후 득표 수가 바뀐 항목만 돌려준다. 항목 구성이 바뀌었으면 full=True 로 전체 목록.
+        return self.changes.changes(poll_id, since)
+
+    def submit_vote(self, poll_id, item_id, user_id):
+        # 배치가 commit 되면 VoteResult 로 완료되는 Future 를 돌려준다.
+        if not user_id or item_id is None:
+            raise ValueError("user_id and item_id are required")
+        future = self.vote_queue.submit(poll_id, item_id, user_id)
+        # 기록은 배치가 끝난 뒤 쓰기 스레드에서 큐에 넣기만 하므로 투표를 늦추지 않는다.
+        future.add_done_callback(lambda done: _audit_vote(done, poll_id, item_id, user_id))
+        return future
+
+    def vote(self, poll_id, item_id, user_id):
+        return self.submit_vote(poll_id, item_id, user_id).result()
+
+    def get_poll(self, poll_id):
+        with self.pool.cursor() as cursor:
+            return Query.POLL_SELECT_BY_ID(cursor, poll_id)
+
+    def rank_vote(self, poll_id, ranking, user_id):
+        # 순위 투표지는 배치 큐를 거치지 않고 한 트랜잭션으로 넣는다.
+        if not user_id:
+            raise ValueError("user_id is required")
+        with self.pool.cursor() as cursor:
+            result = Ranked.cast(cursor, poll_id, user_id, ranking)
+        Audit.event('ranked_vote', poll_id=poll_id, user_id=user_id, ranking=list(ranking or ()),
+                    accepted=result.accepted, reason=result.reason)
+        if result.accepted:
+            self.repository.invalidate_items(poll_id)
+        return result
+
+    def runoff(self, poll_id):
+        return Ranked.runoff(self.pool, poll_id)
+
+    def create_poll(self, user_id, start_date, end_date, question, items=(), ranked=False, seats=1):
+        if not (start_date and end_date and question):
+            raise ValueError("start date, end date and question are required")
+        if seats < 1:
+            raise ValueError("seats must be at least 1")
+        with self.pool.cursor() as cursor:
+            poll_id = Query.POLL_INSERT(cursor, start_date, end_date, question, 0, 0,
+                                        datetime.now().strftime('%Y-%m-%d %H:%M:%S'), user_id)
+            if ranked or seats != 1:
+                Query.POLL_SET_TYPE(cursor, poll_id, Ranked.RANKED if ranked else Ranked.PLURALITY, seats)
+            # 항목도 같은 트랜잭션에서 한 번에 넣는다.
+            items = _clean_items(items)
+            if items:
+                Query.ITEM_INSERT_BULK(cursor, poll_id, items)
+                Query.VERSION_BUMP(cursor, 'ITEM', poll_id)
+            Query.VERSION_BUMP(cursor, 'POLL')
+        self.repository.invalidate_poll(poll_id)
+        self.authorization.poll_created(poll_id, user_id)
+        Audit.event('poll_create', poll_id=poll_id, user_id=user_id, question=question, items=len(items),
+                    ranked=ranked, seats=seats)
+        return poll_id
+
+    def add_items(self, poll_id, items, user_id=None):
+        items = _clean_items(items)
+        if not items:
+            raise ValueError("at least one item is required")
+        with self.pool.cursor() as cursor:
+            item_ids = Query.ITEM_INSERT_BULK(cursor, poll_id, items)
+            Query.VERSION_BUMP(cursor, 'POLL')
+            Query.VERSION_BUMP(cursor, 'ITEM', poll_id)
+        self.repository.invalidate_poll(poll_id)
+        Audit.event('item_add', poll_id=poll_id, user_id=user_id, item_ids=item_ids)
+        return item_ids
+
+    def update_poll(self, poll_id, start_date, end_date, question, user_id=None):
+        with self.pool.cursor() as cursor:
+            Query.POLL_UPDATE(cursor, poll_id, start_date, end_date, question)
+            Query.VERSION_BUMP(cursor, 'POLL')
+        self.repository.invalidate_catalog()
+        Audit.event('poll_update', poll_id=poll_id, user_id=user_id, start_date=start_date, end_date=end_date,
+                    question=question)
+
+    def delete_poll(self, poll_id, user_id=None):
+        with self.pool.cursor() as cursor:
+            Query.POLL_DELETE_BY_ID(cursor, poll_id)
+            Query.VERSION_BUMP(cursor, 'POLL')
+            Query.VERSION_BUMP(cursor, 'ITEM', poll_id)
+        self.repository.invalidate_poll(poll_id)
+        self.authorization.poll_deleted(poll_id)
+        self.changes.forget(poll_id)
+        Audit.event('poll_delete', poll_id=poll_id, user_id=user_id)
+
+    def set_counter_shards(self, poll_id, shards):
+        # 0 이면 끄고, N 이면 표를 SLOT N 개에 나눠 더한다.
+        with self.pool.cursor() as cursor:
+            Counter.set_shards(cursor, poll_id, shards)
+        self.repository.invalidate_poll(poll_id)
+
+    def rename_item(self, poll_id, item_id, text, user_id=None):
+        with self.pool.cursor() as cursor:
+            Query.ITEM_RENAME(cursor, poll_id, item_id, text)
+            Query.VERSION_BUMP(cursor, 'ITEM', poll_id)
+        self.repository.invalidate_items(poll_id)
+        Audit.event('item_rename', poll_id=poll_id, item_id=item_id, user_id=user_id, text=text)
+
+    def delete_item(self, poll_id, item_id, user_id=None):
+        with self.pool.cursor() as cursor:
+            Query.ITEM_DELETE_BY_ID(cursor, item_id, poll_id)
+            Query.VERSION_BUMP(cursor, 'POLL')
+            Query.VERSION_BUMP(cursor, 'ITEM', poll_id)
+        self.repository.invalidate_poll(poll_id)
+        Audit.event('item_delete', poll_id=poll_id, item_id=item_id, user_id=user_id)
+
+    def tally(self, poll_id):
+        items = self.get_items(poll_id)
+        return {
+            'poll_id': poll_id,
+            'total': sum(item['VOTE_COUNT'] for item in items),
+            'items': [{'item_id': item['ITEM_ID'], 'text': item['ITEM_TEXT'], 'votes': item['VOTE_COUNT']} for item in items],
+        }
+
+    def rebuild_tally(self, poll_id):
+        # ITEM.VOTE_COUNT 대신 투표 기록으로 다시 계산한 득표 수. 꼬리가 길면 스냅샷을 남긴다.
+        with self.pool.cursor() as cursor:
+            counts, _, tail = VoteLog.rebuild(cursor, poll_id)
+        if tail >= VoteLog.SNAPSHOT_INTERVAL:
+            with self.pool.cursor() as cursor:
+                VoteLog.snapshot(cursor, poll_id)
+        return {
+            'poll_id': poll_id,
+            'total': sum(counts.values()),
+            'items': [{'item_id': item_id, 'votes': votes} for item_id, votes in sorted(counts.items())],
+        }
+
+    def verify_tally(self, poll_id):
+        with self.pool.cursor() as cursor:
+            return VoteLog.differences(cursor, poll_id)
+
+
+def _audit_vote(future, poll_id, item_id, user_id):
+    error = future.exception()
+    if error is not None:
+        Audit.failure('vote', error, poll_id=poll_id, item_id=item_id, user_id=user_id)
+        return
+    result = future.result()
+    Audit.event('vote', poll_id=poll_id, item_id=item_id, user_id=user_id,
+                accepted=result.accepted, reason=result.reason)
+
+
+def _clean_items(items):
+    return [item.strip() for item in items or () if item and item.strip()]
@@ -0,0 +1,135 @@
+import argparse
+from datetime import datetime
+
+from database import Counter, Pool, Query
+
+# VOTE_EVENT 는 투표 한 건마다 쌓이는 기록이고 VOTE_SNAPSHOT 은 투표별로 그 기록을 접어 둔 것이다.
+# 득표 수 = 가장 최근 스냅샷 + 그 뒤의 기록(꼬리). 꼬리가 길어지면 새 스냅샷을 만든다.
+#   python -m database.VoteLog --verify       ITEM.VOTE_COUNT 와 기록으로 다시 계산한 값 비교
+#   python -m database.VoteLog --repair       다르면 기록 기준으로 VOTE_COUNT 를 고친다
+#   python -m database.VoteLog --snapshot     꼬리가 --min-tail 이상인 투표의 스냅샷을 만든다
+
+SNAPSHOT_INTERVAL = 1000
+KEEP_SNAPSHOTS = 2
+
+
+def latest_snapshot(cursor, poll_id):
+    event_id = Query.VOTE_SNAPSHOT_LATEST_ID(cursor, poll_id)
+    if event_id is None:
+        return 0, {}
+    return event_id, {row['ITEM_ID']: row['VOTE_COUNT'] for row in Query.VOTE_SNAPSHOT_SELECT(cursor, poll_id, event_id)}
+
+
+def rebuild(cursor, poll_id):
+    # 스냅샷 이후의 기록만 IX_VOTE_EVENT_POLL 범위로 읽으므로 시간은 꼬리 길이에 비례한다.
+    # (항목별 득표 수, 마지막 EVENT_ID, 꼬리 길이)
+    event_id, counts = latest_snapshot(cursor, poll_id)
+    last_id, tail = event_id, 0
+    for row in Query.VOTE_EVENT_TAIL(cursor, poll_id, event_id):
+        counts[row['ITEM_ID']] = counts.get(row['ITEM_ID'], 0) + row['VOTES']
+        last_id = max(last_id, row['LAST_ID'])
+        tail += row['VOTES']
+    return counts, last_id, tail
+
+
+def lock_poll(cursor, poll_id):
+    # 투표를 쓰는 쪽은 기록을 넣기 전에 DATA_VERSION 의 ('ITEM', poll_id) 행을 잠근다. (VoteQueue._write_batch)
+    # 같은 행을 잠그면 아직 commit 되지 않은 기록이 없으므로 스냅샷이 표를 빠뜨리지 않는다.
+    # 분산 카운터를 쓰는 투표는 'ITEM:<slot>' 행까지 모두 잠근다.
+    Query.ITEM_VERSION_GET(cursor, poll_id, locking=True)
+
+
+def snapshot(cursor, poll_id):
+    # 같은 트랜잭션에서 잠근 뒤 다시 계산해서 저장한다. 새 스냅샷의 EVENT_ID 를 돌려준다.
+    lock_poll(cursor, poll_id)
+    counts, last_id, tail = rebuild(cursor, poll_id)
+    if tail == 0:
+        return last_id
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    Query.VOTE_SNAPSHOT_INSERT_BULK(cursor, poll_id, last_id, counts, now)
+    Query.POLL_SET_SNAPSHOT_EVENT_ID(cursor, poll_id, last_id)
+    prune(cursor, poll_id)
+    return last_id
+
+
+def prune(cursor, poll_id, keep=KEEP_SNAPSHOTS):
+    old = Query.VOTE_SNAPSHOT_IDS(cursor, poll_id)[keep:]
+    if old:
+        Query.VOTE_SNAPSHOT_DELETE_UPTO(cursor, poll_id, old[0])
+
+
+def stored_counts(cursor, poll_id):
+    return {row['ITEM_ID']: row['VOTE_COUNT'] for row in Query.ITEM_SELECT_WITH_COUNTS(cursor, poll_id)}
+
+
+def differences(cursor, poll_id):
+    # 현재 있는 항목 중 VOTE_COUNT 가 기록과 다른 것: {ITEM_ID: (저장된 값, 기록 기준 값)}
+    counts, _, _ = rebuild(cursor, poll_id)
+    return {item_id: (stored, counts.get(item_id, 0))
+            for item_id, stored in stored_counts(cursor, poll_id).items()
+            if stored != counts.get(item_id, 0)}
+
+
+def repair(cursor, poll_id):
+    lock_poll(cursor, poll_id)
+    # SLOT 에 나눠 둔 값을 먼저 합쳐야 ITEM.VOTE_COUNT 만 고쳐서 맞출 수 있다.
+    Counter.fold(cursor, poll_id)
+    changed = differences(cursor, poll_id)
+    for item_id, (_, expected) in changed.items():
+        Query.ITEM_SET_VOTE_COUNT(cursor, poll_id, item_id, expected)
+    if changed:
+        Query.VERSION_BUMP(cursor, 'ITEM', poll_id)
+    return changed
+
+
+def polls_with_tail(cursor, min_tail):
+    # 스냅샷 뒤에 기록이 min_tail 건 이상 쌓인 투표. 읽는 양은 전체 기록이 아니라 투표 수와 꼬리에 비례한다.
+    return Query.VOTE_EVENT_POLLS_WITH_TAIL(cursor, min_tail)
+
+
+def compact(pool=None, min_tail=SNAPSHOT_INTERVAL):
+    pool = pool or Pool.get_pool()
+    with pool.cursor() as cursor:
+        poll_ids = polls_with_tail(cursor, min_tail)
+    # 투표마다 짧은 트랜잭션으로 나눠서 투표 쓰기를 오래 막지 않는다.
+    for poll_id in poll_ids:
+        with pool.cursor() as cursor:
+            snapshot(cursor, poll_id)
+    return poll_ids
+
+
+def all_poll_ids(cursor):
+    return Query.POLL_IDS(cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify, repair and snapshot tallies from the vote event log')
+    parser.add_argument('--verify', action='store_true', help='compare ITEM.VOTE_COUNT with the rebuilt tallies')
+    parser.add_argument('--repair', action='store_true', help='rewrite ITEM.VOTE_COUNT from the rebuilt tallies')
+    parser.add_argument('--snapshot', action='store_true', help='snapshot polls with a long log tail')
+    parser.add_argument('--min-tail', type=int, default=SNAPSHOT_INTERVAL)
+    parser.add_argument('--poll', type=int, action='append', help='limit to these poll ids')
+    args = parser.parse_args()
+
+    pool = Pool.get_pool()
+    try:
+        if args.snapshot:
+            print(f"Snapshotted polls: {compact(pool, args.min_tail)}")
+        if args.verify or args.repair:
+            with pool.cursor() as cursor:
+                poll_ids = args.poll or all_poll_ids(cursor)
+            mismatched = 0
+            for poll_id in poll_ids:
+                with pool.cursor() as cursor:
+                    changed = repair(cursor, poll_id) if args.repair else differences(cursor, poll_id)
+                for item_id, (stored, expected) in changed.items():
+                    mismatched += 1
+                    print(f"poll {poll_id} item {item_id}: VOTE_COUNT {stored}, log {expected}")
+            action = 'Repaired' if args.repair else 'Found'
+            print(f"{action} {mismatched} mismatched counts in {len(poll_ids)} polls")
+    finally:
+        Pool.close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import random
+import threading
+import queue
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+from datetime import datetime
+
+from database import Query
+
+# 투표 결과: accepted 가 False 이면 reason 에 거절 사유가 들어간다.
+VoteResult = namedtuple('VoteResult', ['accepted', 'reason'])
+
+ALREADY_VOTED = 'already voted'
+UNKNOWN_ITEM = 'unknown item'
+RANKED_POLL = 'ranked ballot required'
+
+_STOP = object()
+
+
+class VoteQueue:
+    """Queues votes and writes them in batches, one transaction per flush."""
+
+    def __init__(self, pool, batch_size=200, max_latency=0.02, on_commit=None):
+        self.pool = pool
+        # on_commit(poll_ids) 는 배치가 commit 된 뒤 득표 수가 바뀐 투표 ID 들로 호출된다.
+        self.on_commit = on_commit
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.queue = queue.Queue()
+        self.closed = False
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name='VoteQueue', daemon=True)
+        self.thread.start()
+
+    def submit(self, poll_id, item_id, user_id):
+        future = Future()
+        # 닫은 뒤에 넣은 표는 쓰기 스레드가 읽지 않으므로 Future 가 끝나지 않는다.
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("vote queue is closed")
+            self.queue.put((poll_id, item_id, user_id, future))
+        return future
+
+    def vote(self, poll_id, item_id, user_id, timeout=None):
+        return self.submit(poll_id, item_id, user_id).result(timeout)
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(_STOP)
+        self.thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    vote = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if vote is _STOP:
+                    stopping = True
+                    break
+                batch.append(vote)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        results = {}
+        try:
+            with self.pool.cursor() as cursor:
+                accepted = self._write_batch(cursor, batch, results)
+        except Exception as e:
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        if accepted and self.on_commit:
+            self.on_commit({vote[0] for vote in accepted})
+        for vote in accepted:
+            results[id(vote)] = VoteResult(True, None)
+        for vote in batch:
+            vote[3].set_result(results[id(vote)])
+
+    def _write_batch(self, cursor, batch, results):
+        # Ranked 가 이 모듈의 VoteResult 를 가져다 쓰므로 모듈 위에서 읽으면 순환 import 가 된다.
+        from database import Ranked
+        # 같은 배치 안에서 한 사용자가 같은 투표에 여러 번 투표한 경우 첫 표만 남긴다.
+        ballots = {}
+        for vote in batch:
+            poll_id, item_id, user_id, _ = vote
+            if (poll_id, user_id) in ballots:
+                results[id(vote)] = VoteResult(False, ALREADY_VOTED)
+            else:
+                ballots[(poll_id, user_id)] = vote
+        if not ballots:
+            return []
+
+        # 이미 투표한 사용자를 한 번의 SELECT 로 미리 걸러낸다.
+        # 잠그지 않는 읽기라서 다른 프로세스가 방금 넣은 표는 못 볼 수 있다. 최종 확인은 INSERT 에서 한다.
+        for row in Query.USER_VOTE_SELECT_EXISTING(cursor, list(ballots)):
+            key = _pair(row, 'POLL_ID', 'USER_ID')
+            vote = ballots.pop(key, None)
+            if vote is not None:
+                results[id(vote)] = VoteResult(False, ALREADY_VOTED)
+        if not ballots:
+            return []
+
+        # 존재하지 않는 항목에 대한 표를 걸러낸다.
+        # 같은 조회에서 투표별 분산 카운터 SLOT 수도 읽는다. (database/Counter.py)
+        rows = Query.ITEM_SELECT_VOTABLE(cursor, list({(vote[0], vote[1]) for vote in ballots.values()}))
+        known = set()
+        shards = {}
+        ranked = set()
+        for row in rows:
+            poll_id, item_id = _pair(row, 'POLL_ID', 'ITEM_ID')
+            known.add((poll_id, item_id))
+            shards[poll_id] = row['COUNTER_SHARDS'] if isinstance(row, dict) else row[2]
+            if (row['POLL_TYPE'] if isinstance(row, dict) else row[3]) == Ranked.RANKED:
+                ranked.add(poll_id)
+        accepted = []
+        for vote in ballots.values():
+            if (vote[0], vote[1]) not in known:
+                results[id(vote)] = VoteResult(False, UNKNOWN_ITEM)
+            elif vote[0] in ranked:
+                # 순위 투표는 Ranked.cast 로만 받는다.
+                results[id(vote)] = VoteResult(False, RANKED_POLL)
+            else:
+                accepted.append(vote)
+        if not accepted:
+            return []
+
+        # 기록을 넣기 전에 투표별 버전 행을 먼저 잠근다. (VoteLog.snapshot 이 같은 행을 잠근다)
+        # 여러 투표를 잠글 때 교착 상태가 생기지 않도록 항상 POLL_ID 순서로 잠근다.
+        # 분산 카운터를 쓰는 투표는 배치마다 SLOT 하나를 골라 그 SLOT 의 버전 행만 잠근다.
+        slots = {}
+        for poll_id in sorted({vote[0] for vote in accepted}):
+            if shards.get(poll_id):
+                slots[poll_id] = random.randrange(shards[poll_id])
+            Query.VERSION_BUMP(cursor, Query.ITEM_VERSION_SCOPE(slots.get(poll_id)), poll_id)
+
+        accepted = self._insert_ballots(cursor, accepted, results)
+        if not accepted:
+            return []
+        Query.VOTE_EVENT_INSERT_BULK(cursor, [vote[:3] for vote in accepted], datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+        # 항목별로 득표 수를 합산해서 항목당 UPDATE 한 번만 실행한다.
+        deltas = {}
+        for vote in accepted:
+            deltas[(vote[0], vote[1])] = deltas.get((vote[0], vote[1]), 0) + 1
+        for (poll_id, item_id), delta in sorted(deltas.items()):
+            if poll_id in slots:
+                Query.COUNTER_SHARD_ADD(cursor, poll_id, item_id, slots[poll_id], delta)
+            else:
+                Query.ITEM_VOTE_ADD(cursor, poll_id, item_id, delta)
+        return accepted
+
+    def _insert_ballots(self, cursor, votes, results):
+        # UX_USER_VOTE_POLL_USER 가 중복 표를 막는다. 대개는 다중 행 INSERT 한 번으로 끝나고,
+        # 그 사이 다른 프로세스가 넣은 표가 있으면 한 행씩 다시 넣어서 어느 표인지 찾는다.
+        Query.SAVEPOINT(cursor, 'BALLOTS')
+        if Query.USER_VOTE_INSERT_IF_ABSENT(cursor, [(vote[0], vote[2]) for vote in votes]) == len(votes):
+            return votes
+        Query.ROLLBACK_TO_SAVEPOINT(cursor, 'BALLOTS')
+        inserted = []
+        for vote in votes:
+            if Query.USER_VOTE_INSERT_IF_ABSENT(cursor, [(vote[0], vote[2])]) == 1:
+                inserted.append(vote)
+            else:
+                results[id(vote)] = VoteResult(False, ALREADY_VOTED)
+        return inserted
+
+
+def _pair(row, first, second):
+    if isinstance(row, dict):
+        return row[first], row[second]
+    return row[0], row[1]
@@ -0,0 +1,14 @@
+from database import Migration, Query
+
+
+def upgrade(cursor):
+    # Query.py 의 테이블 정의를 기준 스키마로 삼는다.
+    Query.ACCOUNT_CREATE(cursor)
+    Query.POLL_CREATE(cursor)
+    Query.ITEM_CREATE(cursor)
+    Query.USER_VOTE_CREATE(cursor)
+    Query.DATA_VERSION_CREATE(cursor)
+
+    # createtemp.py 로 만든 예전 DB 에는 없는 컬럼
+    Migration.add_column(cursor, 'ACCOUNT', 'IS_ADMIN', "tinyint(1) NOT NULL DEFAULT '0'")
+    Migration.add_column(cursor, 'POLL', 'CREATED_BY', 'int(11)')
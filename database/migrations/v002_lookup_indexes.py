@@ -0,0 +1,8 @@
+from database import Migration
+
+
+def upgrade(cursor):
+    # queryaudit.py 가 전체 스캔으로 보고한 조회에 인덱스를 추가한다.
+    Migration.add_index(cursor, 'USER_VOTE', 'IX_USER_VOTE_POLL_USER', ['POLL_ID', 'USER_ID'])
+    Migration.add_index(cursor, 'ITEM', 'IX_ITEM_POLL', ['POLL_ID', 'ITEM_ID'])
+    Migration.add_index(cursor, 'ACCOUNT', 'IX_ACCOUNT_USERNAME', ['USERNAME'])
@@ -0,0 +1,31 @@
+from database import Migration
+
+DATE_COLUMNS = [('START_DATE', "'1970-01-01 00:00:00'"), ('END_DATE', 'NULL'), ('REGDATE', 'NULL')]
+
+
+def converted(column, fallback):
+    # 'YYYY-MM-DD HH:MM:SS' 와 createtemp.py 가 넣던 'YYYY-MM-DD' 를 변환하고
+    # 해석할 수 없는 값은 fallback 으로 둔다.
+    return f"""
+    CASE
+        WHEN {column} REGEXP '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}} [0-9]{{2}}:[0-9]{{2}}:[0-9]{{2}}$' THEN STR_TO_DATE({column}, '%Y-%m-%d %H:%i:%s')
+        WHEN {column} REGEXP '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}$' THEN STR_TO_DATE({column}, '%Y-%m-%d')
+        ELSE {fallback}
+    END"""
+
+
+def upgrade(cursor):
+    pending = [(column, fallback) for column, fallback in DATE_COLUMNS
+               if Migration.column_type(cursor, 'POLL', column) != 'datetime']
+    if pending:
+        # 새 DATETIME 컬럼에 변환한 값을 채운 뒤 예전 varchar 컬럼과 바꾼다.
+        cursor.execute("ALTER TABLE POLL " + ', '.join(f"ADD COLUMN {column}_NEW datetime NULL" for column, _ in pending))
+        cursor.execute("UPDATE POLL SET " + ', '.join(f"{column}_NEW = {converted(column, fallback)}" for column, fallback in pending))
+        changes = []
+        for column, _ in pending:
+            definition = 'datetime NOT NULL' if column == 'START_DATE' else 'datetime NULL'
+            changes.append(f"DROP COLUMN {column}")
+            changes.append(f"CHANGE COLUMN {column}_NEW {column} {definition}")
+        cursor.execute("ALTER TABLE POLL " + ', '.join(changes))
+
+    Migration.add_index(cursor, 'POLL', 'IX_POLL_END_START', ['END_DATE', 'START_DATE'])
@@ -0,0 +1,19 @@
+from database import Migration
+
+
+def upgrade(cursor):
+    # 동시에 처음 로그인하면 같은 USERNAME 계정이 둘 생길 수 있었다.
+    # 가장 먼저 만든 계정은 그대로 두고 나머지는 '<이름>~<ACCOUNT_ID>' 로 바꿔서 투표 기록을 보존한다.
+    cursor.execute("SELECT USERNAME, MIN(ACCOUNT_ID) AS KEEP_ID FROM ACCOUNT GROUP BY USERNAME HAVING COUNT(*) > 1")
+    for row in cursor.fetchall():
+        cursor.execute("SELECT ACCOUNT_ID FROM ACCOUNT WHERE USERNAME = %s AND ACCOUNT_ID <> %s",
+                       (row['USERNAME'], row['KEEP_ID']))
+        for duplicate in cursor.fetchall():
+            suffix = f"~{duplicate['ACCOUNT_ID']}"
+            cursor.execute("UPDATE ACCOUNT SET USERNAME = %s WHERE ACCOUNT_ID = %s",
+                           (row['USERNAME'][:20 - len(suffix)] + suffix, duplicate['ACCOUNT_ID']))
+
+    Migration.add_index(cursor, 'ACCOUNT', 'UX_ACCOUNT_USERNAME', ['USERNAME'], unique=True)
+    # 로그인 조회(ACCOUNT_ID, PASSWORD, IS_ADMIN)를 인덱스만 읽고 끝내는 커버링 인덱스
+    Migration.add_index(cursor, 'ACCOUNT', 'IX_ACCOUNT_LOGIN', ['USERNAME', 'PASSWORD', 'IS_ADMIN'])
+    Migration.drop_index(cursor, 'ACCOUNT', 'IX_ACCOUNT_USERNAME')
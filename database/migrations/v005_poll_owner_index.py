@@ -0,0 +1,7 @@
+from database import Migration
+
+
+def upgrade(cursor):
+    # 로그인할 때 사용자가 만든 투표를 한 번에 읽는다. (Auth.Authorization)
+    # MySQL 에서는 외래 키용으로 자동 생성된 인덱스를 이 인덱스가 대신한다.
+    Migration.add_index(cursor, 'POLL', 'IX_POLL_CREATED_BY', ['CREATED_BY'])
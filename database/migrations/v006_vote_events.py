@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from database import Migration, Query
+
+
+def upgrade(cursor):
+    Query.VOTE_EVENT_CREATE(cursor)
+    Query.VOTE_SNAPSHOT_CREATE(cursor)
+    # 한 투표의 기록 꼬리를 EVENT_ID 순으로 읽는 커버링 인덱스
+    Migration.add_index(cursor, 'VOTE_EVENT', 'IX_VOTE_EVENT_POLL', ['POLL_ID', 'EVENT_ID', 'ITEM_ID'])
+
+    # 지금까지의 표는 기록이 없으므로 현재 VOTE_COUNT 를 EVENT_ID 0 의 첫 스냅샷으로 남긴다.
+    cursor.execute("SELECT 1 FROM VOTE_SNAPSHOT LIMIT 1")
+    if cursor.fetchone() is None:
+        cursor.execute(
+            "INSERT INTO VOTE_SNAPSHOT (POLL_ID, EVENT_ID, ITEM_ID, VOTE_COUNT, CREATED_AT) "
+            "SELECT POLL_ID, 0, ITEM_ID, VOTE_COUNT, %s FROM ITEM WHERE VOTE_COUNT > 0",
+            (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
@@ -0,0 +1,9 @@
+from database import Migration, Query
+
+
+def upgrade(cursor):
+    Query.ITEM_COUNTER_SHARD_CREATE(cursor)
+    # 0 이면 ITEM.VOTE_COUNT 를 바로 올리고, N 이면 SLOT N 개에 나눠 더한다.
+    Migration.add_column(cursor, 'POLL', 'COUNTER_SHARDS', "int(11) NOT NULL DEFAULT 0")
+    # 한 투표의 'ITEM' / 'ITEM:<slot>' 버전을 함께 읽는다.
+    Migration.add_index(cursor, 'DATA_VERSION', 'IX_DATA_VERSION_SCOPE_ID', ['SCOPE_ID', 'SCOPE'])
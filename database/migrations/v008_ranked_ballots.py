@@ -0,0 +1,8 @@
+from database import Migration, Query
+
+
+def upgrade(cursor):
+    Query.RANKED_VOTE_CREATE(cursor)
+    # 'plurality' 는 항목 하나에 투표, 'ranked' 는 순위를 매겨 결선으로 센다. SEATS 는 뽑을 항목 수
+    Migration.add_column(cursor, 'POLL', 'POLL_TYPE', "varchar(10) NOT NULL DEFAULT 'plurality'")
+    Migration.add_column(cursor, 'POLL', 'SEATS', "int(11) NOT NULL DEFAULT 1")
@@ -0,0 +1,15 @@
+from database import Migration
+
+
+def upgrade(cursor):
+    # 여러 프로세스의 VoteQueue 가 동시에 "아직 투표 안 함" 을 보고 같은 사용자의 표를 둘 다 넣을 수 있었다.
+    # 가장 먼저 들어간 행만 남긴다. (득표 수는 그대로 두므로 python -m database.VoteLog --verify 로 확인한다)
+    cursor.execute("SELECT POLL_ID, USER_ID, MIN(VOTE_ID) AS KEEP_ID FROM USER_VOTE "
+                   "GROUP BY POLL_ID, USER_ID HAVING COUNT(*) > 1")
+    for row in cursor.fetchall():
+        cursor.execute("DELETE FROM USER_VOTE WHERE POLL_ID = %s AND USER_ID = %s AND VOTE_ID <> %s",
+                       (row['POLL_ID'], row['USER_ID'], row['KEEP_ID']))
+
+    # 한 사용자는 한 투표에 한 번만. 이제 중복 확인은 이 인덱스가 최종적으로 한다.
+    Migration.add_index(cursor, 'USER_VOTE', 'UX_USER_VOTE_POLL_USER', ['POLL_ID', 'USER_ID'], unique=True)
+    Migration.drop_index(cursor, 'USER_VOTE', 'IX_USER_VOTE_POLL_USER')
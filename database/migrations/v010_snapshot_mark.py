@@ -0,0 +1,8 @@
+from database import Migration
+
+
+def upgrade(cursor):
+    # 투표별 마지막 스냅샷의 EVENT_ID. 스냅샷할 투표를 찾을 때 VOTE_EVENT 전체 대신 이 뒤의 꼬리만 읽는다.
+    Migration.add_column(cursor, 'POLL', 'SNAPSHOT_EVENT_ID', "bigint NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE POLL SET SNAPSHOT_EVENT_ID = COALESCE("
+                   "(SELECT MAX(s.EVENT_ID) FROM VOTE_SNAPSHOT s WHERE s.POLL_ID = POLL.POLL_ID), 0)")
@@ -0,0 +1,289 @@
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+
+import pymysql
+
+from database import Config, Query, Service
+
+# 앱이 실행하는 SQL 을 모아서 EXPLAIN 으로 실행 계획을 점검한다.
+#   python queryaudit.py                         보고서 출력
+#   python queryaudit.py --write-baseline a.json 현재 결과를 기준으로 저장
+#   python queryaudit.py --baseline a.json       기준보다 나빠지면 종료 코드 1
+# EXPLAIN 의 예상 행 수가 의미 있으려면 데이터가 채워진 DB 에서 실행해야 한다.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_SOURCES = ['VotingSystem.py']
+SQL_START = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT)\b')
+EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT\s+INTO\s+\w+\s*(\([^)]*\))?\s*SELECT)\b', re.IGNORECASE)
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+def call_site():
+    # 이 파일과 라이브러리를 제외한 가장 가까운 호출 위치
+    frame = sys._getframe(2)
+    while frame:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(ROOT) and filename != os.path.abspath(__file__):
+            return f"{os.path.relpath(filename, ROOT)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'queryaudit.py'
+
+
+class RecordingCursor:
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def _record(self, query, args):
+        self._statements.setdefault(normalize(query), {'sql': query, 'params': args, 'origin': call_site()})
+
+    def execute(self, query, args=None):
+        self._record(query, args)
+        return self._cursor.execute(query, args)
+
+    def executemany(self, query, args):
+        args = list(args)
+        if args:
+            self._record(query, args[0])
+        return self._cursor.executemany(query, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class RecordingPool:
+    """Pool stand-in that runs everything on one connection and never commits."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.max_size = 1
+        self.statements = {}
+        # 문장은 RecordingCursor 가 모으므로 database.Metrics 는 쓰지 않는다.
+        self.metrics = None
+
+    @contextmanager
+    def cursor(self, timeout=None):
+        with self.connection.cursor() as cursor:
+            yield RecordingCursor(cursor, self.statements)
+
+
+def run_scenario(pool):
+    # 서비스 계층과 Query 함수를 한 번씩 실행해서 실제 SQL 과 파라미터를 모은다.
+    # 모든 변경은 마지막에 rollback 한다.
+    service = Service.VotingService(pool)
+    try:
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with pool.cursor() as cursor:
+            account = Query.ACCOUNT_SELECT_FIRST(cursor)
+            item = Query.ITEM_SELECT_LAST(cursor)
+        pool.statements.clear()
+        if account is None or item is None:
+            raise SystemExit("The audit needs a seeded database (accounts, polls and items).")
+        poll_id, item_id = item['POLL_ID'], item['ITEM_ID']
+
+        user = service.login(account['USERNAME'], account['PASSWORD'])
+        service.login('audit_new_user', 'audit')
+        service.list_polls()
+        for status in (None, 'active', 'upcoming', 'closed'):
+            service.poll_page(0, 100, status)
+        service.active_polls()
+        service.closed_polls(datetime(2000, 1, 1))
+        service.get_items(poll_id)
+        service.tally(poll_id)
+        with pool.cursor() as cursor:
+            service.vote_queue._write_batch(cursor, [(poll_id, item_id, user['account_id'], Future())], {})
+
+        new_poll_id = service.create_poll(user['account_id'], now, now, 'audit poll', ['a', 'b'])
+        service.update_poll(new_poll_id, now, now, 'audit poll 2')
+        service.rename_item(new_poll_id, 1, 'c')
+        service.delete_item(new_poll_id, 2)
+        service.delete_poll(new_poll_id)
+
+        with pool.cursor() as cursor:
+            Query.ACCOUNT_INSERT(cursor, 'audit_user', 'audit', 0, '127.0.0.1')
+            Query.ACCOUNT_DELETE_BY_ID(cursor, cursor.lastrowid)
+            audit_poll_id = Query.POLL_INSERT(cursor, now, now, 'audit poll', 0, 0, now)
+            Query.POLL_SELECT_BY_QUESTION(cursor, 'audit poll')
+            audit_item_id = Query.ITEM_INSERT(cursor, audit_poll_id, 'audit item', 0)
+            Query.ITEM_DELETE_BY_ID(cursor, audit_item_id, audit_poll_id)
+            Query.POLL_DELETE_BY_ID(cursor, audit_poll_id)
+    finally:
+        pool.connection.rollback()
+        service.close()
+
+
+def static_statements(statements):
+    # GUI 에서만 실행되는 SQL 은 소스의 문자열 상수에서 찾는다.
+    for source in STATIC_SOURCES:
+        path = os.path.join(ROOT, source)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        joined = {id(value) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for value in node.values}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in joined:
+                if SQL_START.match(node.value):
+                    # 문자열 파라미터는 숫자 컬럼과 비교해도 인덱스를 쓸 수 있다.
+                    params = ('1',) * node.value.count('%s')
+                    statements.setdefault(normalize(node.value), {'sql': node.value, 'params': params, 'origin': f"{source}:{node.lineno}"})
+
+
+def table_indexes(cursor, table, cache):
+    if table not in cache:
+        cursor.execute(f"SHOW INDEX FROM `{table}`")
+        indexes = {}
+        for row in cursor.fetchall():
+            indexes.setdefault(row['Key_name'], []).append((row['Seq_in_index'], row['Column_name'].upper()))
+        cache[table] = [[column for _, column in sorted(columns)] for columns in indexes.values()]
+    return cache[table]
+
+
+def predicate_columns(sql, table):
+    # table 이 나오는 FROM/UPDATE 절 뒤의 WHERE 에서 동등 조건과 범위 조건 컬럼을 찾는다.
+    match = re.search(rf'(FROM|UPDATE)\s+{table}\b(.*)', sql, re.IGNORECASE | re.DOTALL)
+    if not match:
+        return [], [], []
+    rest = match.group(2)
+    where = re.search(r'\bWHERE\b(.*?)(\bORDER\s+BY\b|\bGROUP\s+BY\b|\bLIMIT\b|\)\s*(WHERE|$)|$)', rest, re.IGNORECASE | re.DOTALL)
+    clause = where.group(1) if where else ''
+    equality, ranges = [], []
+    for columns in re.findall(r'\(([\w\s,]+)\)\s+IN\b', clause, re.IGNORECASE):
+        equality.extend(column.strip().upper() for column in columns.split(','))
+    for column, op in re.findall(r'\b([A-Za-z_]\w*)\s*(=|<=|>=|<|>|\bIN\b|\bIS\b)', clause, re.IGNORECASE):
+        column = column.upper()
+        if column in ('AND', 'OR', 'NOT', 'WHERE'):
+            continue
+        target = equality if op.upper() in ('=', 'IN', 'IS') else ranges
+        if column not in equality and column not in ranges:
+            target.append(column)
+    order = re.search(r'\bORDER\s+BY\s+([\w\s,]+?)(\bLIMIT\b|$)', rest, re.IGNORECASE)
+    order_by = [column.split()[0].upper() for column in order.group(1).split(',')] if order else []
+    return equality, ranges, order_by
+
+
+def propose_index(table, equality, ranges, order_by, indexes):
+    columns = list(equality)
+    if ranges:
+        columns.append(ranges[0])
+    elif order_by:
+        columns.extend(column for column in order_by if column not in columns)
+    if not columns:
+        return None
+    for index in indexes:
+        if index[:len(columns)] == columns:
+            return None
+    return f"CREATE INDEX IX_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+
+
+def audit(connection, statements, min_rows):
+    findings = []
+    reports = []
+    index_cache = {}
+    with connection.cursor() as cursor:
+        for key, statement in sorted(statements.items(), key=lambda item: item[1]['origin']):
+            report = {'sql': key, 'origin': statement['origin'], 'plan': [], 'issues': []}
+            reports.append(report)
+            if not EXPLAINABLE.match(statement['sql']):
+                continue
+            try:
+                cursor.execute('EXPLAIN ' + statement['sql'], statement['params'])
+                plan = cursor.fetchall()
+            except pymysql.MySQLError as e:
+                report['error'] = str(e)
+                continue
+            for row in plan:
+                table = row.get('table')
+                rows = row.get('rows') or 0
+                extra = row.get('Extra') or ''
+                report['plan'].append({'table': table, 'type': row.get('type'), 'key': row.get('key'), 'rows': rows, 'extra': extra})
+                if not table or table.startswith('<'):
+                    continue
+                problems = []
+                if row.get('type') in ('ALL', 'index'):
+                    problems.append('full table scan' if row['type'] == 'ALL' else 'full index scan')
+                if 'Using filesort' in extra:
+                    problems.append('filesort')
+                if 'Using temporary' in extra:
+                    problems.append('temporary table')
+                if not problems or rows < min_rows:
+                    continue
+                equality, ranges, order_by = predicate_columns(statement['sql'], table)
+                suggestion = propose_index(table, equality, ranges, order_by, table_indexes(cursor, table, index_cache))
+                issue = {'table': table, 'problems': problems, 'rows': rows, 'suggestion': suggestion}
+                report['issues'].append(issue)
+                findings.append({'sql': key, 'table': table, 'problems': problems})
+    return reports, findings
+
+
+def print_report(reports):
+    for report in reports:
+        if not report['plan'] and 'error' not in report:
+            continue
+        print(f"-- {report['origin']}")
+        print(f"   {report['sql']}")
+        if 'error' in report:
+            print(f"   EXPLAIN failed: {report['error']}")
+        for step in report['plan']:
+            print(f"   {step['table'] or '-':<12} type={step['type'] or '-':<7} key={step['key'] or '-':<20} rows={step['rows']:<10} {step['extra']}")
+        for issue in report['issues']:
+            print(f"   !! {issue['table']}: {', '.join(issue['problems'])} (~{issue['rows']} rows)")
+            if issue['suggestion']:
+                print(f"      suggest: {issue['suggestion']};")
+        print()
+
+    suggestions = sorted({issue['suggestion'] for report in reports for issue in report['issues'] if issue['suggestion']})
+    issues = sum(len(report['issues']) for report in reports)
+    print(f"{len(reports)} statements, {issues} plan issues")
+    if suggestions:
+        print("Proposed indexes:")
+        for suggestion in suggestions:
+            print(f"  {suggestion};")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN every SQL statement the voting system issues')
+    parser.add_argument('--min-rows', type=int, default=100, help='ignore scans estimated below this many rows')
+    parser.add_argument('--json', help='write the full report as JSON')
+    parser.add_argument('--baseline', help='fail if there are findings that are not in this baseline file')
+    parser.add_argument('--write-baseline', help='save the current findings as the baseline')
+    args = parser.parse_args()
+
+    connection = pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **Config.DB_CONFIG)
+    try:
+        pool = RecordingPool(connection)
+        run_scenario(pool)
+        statements = dict(pool.statements)
+        static_statements(statements)
+        reports, findings = audit(connection, statements, args.min_rows)
+    finally:
+        connection.close()
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2, default=str)
+    if args.write_baseline:
+        with open(args.write_baseline, 'w', encoding='utf-8') as f:
+            json.dump(findings, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            known = {(finding['sql'], finding['table'], tuple(finding['problems'])) for finding in json.load(f)}
+        regressions = [finding for finding in findings if (finding['sql'], finding['table'], tuple(finding['problems'])) not in known]
+        if regressions:
+            print(f"\n{len(regressions)} plan regressions compared to {args.baseline}:")
+            for finding in regressions:
+                print(f"  {finding['table']}: {', '.join(finding['problems'])} in {finding['sql']}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()